@@ -5,6 +5,7 @@ from sqlalchemy import pool
 
 from alembic import context
 from backend.db import Base
+from backend.online_migrations import set_lock_timeout
 import backend.config as dbConfig
 
 from backend.tasks.model import Task
@@ -71,6 +72,7 @@ def run_migrations_online():
     )
 
     with connectable.connect() as connection:
+        set_lock_timeout(connection)
         context.configure(
             connection=connection, target_metadata=target_metadata
         )
@@ -0,0 +1,62 @@
+"""Intern task tags as integer ids
+
+Revision ID: 8c2d4e6f1a3b
+Revises: 5699622a4603
+Create Date: 2025-11-12 10:04:51.218734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from backend.online_migrations import backfill_in_batches, create_index_concurrently, drop_index_concurrently
+
+# revision identifiers, used by Alembic.
+revision = '8c2d4e6f1a3b'
+down_revision = '5699622a4603'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS intarray')
+
+    # Tag dictionary
+    op.create_table('tag',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.add_column('task', sa.Column('tag_ids', postgresql.ARRAY(sa.Integer()), nullable=True, server_default='{}'))
+
+    # Backfill the dictionary and the integer arrays from the text arrays
+    op.execute('INSERT INTO tag (name) SELECT DISTINCT unnest(tags) FROM task ON CONFLICT DO NOTHING')
+    backfill_in_batches(
+        'task',
+        'tag_ids = ARRAY('
+        'SELECT tag.id FROM unnest(task.tags) WITH ORDINALITY AS t(name, n) '
+        'JOIN tag ON tag.name = t.name ORDER BY t.n)',
+        "tags IS NOT NULL AND tags <> '{}'"
+    )
+
+    drop_index_concurrently('idx_tasks_tags', 'task')
+    op.drop_column('task', 'tags')
+    create_index_concurrently('idx_tasks_tag_ids', 'task', ['tag_ids'], unique=False,
+                              postgresql_using='gin', postgresql_ops={'tag_ids': 'gin__int_ops'})
+
+
+def downgrade() -> None:
+    op.add_column('task', sa.Column('tags', postgresql.ARRAY(sa.String()), nullable=True, server_default='{}'))
+    backfill_in_batches(
+        'task',
+        'tags = ARRAY('
+        'SELECT tag.name FROM unnest(task.tag_ids) WITH ORDINALITY AS t(id, n) '
+        'JOIN tag ON tag.id = t.id ORDER BY t.n)',
+        "tag_ids IS NOT NULL AND tag_ids <> '{}'"
+    )
+    create_index_concurrently('idx_tasks_tags', 'task', ['tags'], unique=False, postgresql_using='gin')
+
+    drop_index_concurrently('idx_tasks_tag_ids', 'task')
+    op.drop_column('task', 'tag_ids')
+    op.drop_table('tag')
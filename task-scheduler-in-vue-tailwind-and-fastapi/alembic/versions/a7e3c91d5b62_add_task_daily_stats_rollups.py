@@ -0,0 +1,36 @@
+"""Add daily task stats rollups
+
+Revision ID: a7e3c91d5b62
+Revises: f1b6d2a9c4e8
+Create Date: 2025-12-01 08:55:31.774210
+
+The table starts empty; run ``python -m backend.tasks.rollups`` once after
+upgrading to fill it from the existing tasks.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a7e3c91d5b62'
+down_revision = 'f1b6d2a9c4e8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('task_daily_stats',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('dimension', sa.String(length=16), nullable=False),
+    sa.Column('value', sa.String(length=50), nullable=False),
+    sa.Column('created', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('completed', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('completion_seconds', sa.Float(), nullable=False, server_default='0'),
+    sa.Column('open_due', sa.Integer(), nullable=False, server_default='0'),
+    # Stats queries filter by dimension first, then scan a day range
+    sa.PrimaryKeyConstraint('dimension', 'day', 'value')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('task_daily_stats')
@@ -0,0 +1,38 @@
+"""Add type-ahead indexes on task titles and tag names
+
+Revision ID: b47e91c3d5a2
+Revises: 8c2d4e6f1a3b
+Create Date: 2025-11-20 14:32:07.409115
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from backend.online_migrations import create_index_concurrently, drop_index_concurrently
+
+# revision identifiers, used by Alembic.
+revision = 'b47e91c3d5a2'
+down_revision = '8c2d4e6f1a3b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    # Prefix matches: lower(x) LIKE 'abc%' regardless of the database collation
+    create_index_concurrently('idx_tasks_title_prefix', 'task', [sa.text('lower(title) text_pattern_ops')])
+    create_index_concurrently('idx_tag_name_prefix', 'tag', [sa.text('lower(name) text_pattern_ops')])
+
+    # Fuzzy matches: lower(x) % 'abc'
+    create_index_concurrently('idx_tasks_title_trgm', 'task', [sa.text('lower(title) gin_trgm_ops')],
+                              postgresql_using='gin')
+    create_index_concurrently('idx_tag_name_trgm', 'tag', [sa.text('lower(name) gin_trgm_ops')],
+                              postgresql_using='gin')
+
+
+def downgrade() -> None:
+    drop_index_concurrently('idx_tag_name_trgm', 'tag')
+    drop_index_concurrently('idx_tasks_title_trgm', 'task')
+    drop_index_concurrently('idx_tag_name_prefix', 'tag')
+    drop_index_concurrently('idx_tasks_title_prefix', 'task')
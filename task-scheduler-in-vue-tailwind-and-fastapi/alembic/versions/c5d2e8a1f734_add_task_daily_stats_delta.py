@@ -0,0 +1,36 @@
+"""Add the task daily stats delta table
+
+Revision ID: c5d2e8a1f734
+Revises: a7e3c91d5b62
+Create Date: 2025-12-04 10:12:47.310962
+
+Task writes append rollup changes here instead of updating task_daily_stats
+in place; see backend/tasks/rollups.py.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c5d2e8a1f734'
+down_revision = 'a7e3c91d5b62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('task_daily_stats_delta',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('dimension', sa.String(length=16), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('value', sa.String(length=50), nullable=False),
+    sa.Column('created', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('completed', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('completion_seconds', sa.Float(), nullable=False, server_default='0'),
+    sa.Column('open_due', sa.Integer(), nullable=False, server_default='0'),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('task_daily_stats_delta')
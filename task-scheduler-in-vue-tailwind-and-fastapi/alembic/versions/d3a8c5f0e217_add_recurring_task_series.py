@@ -0,0 +1,57 @@
+"""Add recurring task series
+
+Revision ID: d3a8c5f0e217
+Revises: b47e91c3d5a2
+Create Date: 2025-11-27 09:41:22.630518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from backend.online_migrations import (
+    add_constraint_not_valid, create_index_concurrently, drop_index_concurrently, validate_constraint,
+)
+
+# revision identifiers, used by Alembic.
+revision = 'd3a8c5f0e217'
+down_revision = 'b47e91c3d5a2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    priority_enum = postgresql.ENUM('low', 'medium', 'high', 'urgent', name='priorityenum', create_type=False)
+    op.create_table('task_series',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('createdDate', sa.DateTime(), nullable=True),
+    sa.Column('title', sa.String(length=50), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('status', sa.String(length=50), nullable=True),
+    sa.Column('priority', priority_enum, nullable=False, server_default='medium'),
+    sa.Column('tag_ids', postgresql.ARRAY(sa.Integer()), nullable=True, server_default='{}'),
+    sa.Column('rrule', sa.String(length=255), nullable=False),
+    sa.Column('dtstart', sa.DateTime(), nullable=False),
+    sa.Column('until', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # Series overlapping a listing or calendar window
+    op.create_index('idx_task_series_window', 'task_series', ['dtstart', 'until'])
+
+    # Materialized occurrences: nullable columns without defaults, no rewrite
+    op.add_column('task', sa.Column('series_id', sa.Integer(), nullable=True))
+    op.add_column('task', sa.Column('occurrence_date', sa.DateTime(), nullable=True))
+    add_constraint_not_valid('task_series_id_fkey', 'task',
+                             'FOREIGN KEY (series_id) REFERENCES task_series (id) ON DELETE SET NULL')
+    validate_constraint('task_series_id_fkey', 'task')
+    create_index_concurrently('idx_tasks_series_occurrence', 'task', ['series_id', 'occurrence_date'],
+                              unique=True, postgresql_where=sa.text('series_id IS NOT NULL'))
+
+
+def downgrade() -> None:
+    drop_index_concurrently('idx_tasks_series_occurrence', 'task')
+    op.drop_constraint('task_series_id_fkey', 'task', type_='foreignkey')
+    op.drop_column('task', 'occurrence_date')
+    op.drop_column('task', 'series_id')
+    op.drop_index('idx_task_series_window', table_name='task_series')
+    op.drop_table('task_series')
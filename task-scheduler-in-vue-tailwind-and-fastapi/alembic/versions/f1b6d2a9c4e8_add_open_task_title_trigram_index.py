@@ -0,0 +1,28 @@
+"""Add trigram index on open task titles for duplicate detection
+
+Revision ID: f1b6d2a9c4e8
+Revises: d3a8c5f0e217
+Create Date: 2025-11-29 10:12:45.218903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from backend.online_migrations import create_index_concurrently, drop_index_concurrently
+
+# revision identifiers, used by Alembic.
+revision = 'f1b6d2a9c4e8'
+down_revision = 'd3a8c5f0e217'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Completed tasks are never duplicate candidates, so they stay out of the index
+    create_index_concurrently('idx_tasks_open_title_trgm', 'task', [sa.text('lower(title) gin_trgm_ops')],
+                              postgresql_using='gin',
+                              postgresql_where=sa.text("status <> 'completed'"))
+
+
+def downgrade() -> None:
+    drop_index_concurrently('idx_tasks_open_title_trgm', 'task')
@@ -0,0 +1,190 @@
+import asyncio
+import itertools
+import math
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from backend.metrics import metrics
+
+
+ADMISSION_CONTROL_ENABLED = os.getenv("ADMISSION_CONTROL", "false").lower() in ("1", "true", "yes")
+
+# Lower value wins a freed slot first
+READ, WRITE, HEAVY = "read", "write", "heavy"
+PRIORITIES = {READ: 0, WRITE: 1, HEAVY: 2}
+
+# Share of the adaptive limit each class may occupy, so heavy calls never crowd out reads
+CLASS_SHARES = {READ: 1.0, WRITE: 0.8, HEAVY: float(os.getenv("ADMISSION_HEAVY_SHARE", "0.5"))}
+
+ROUTE_CLASSES: List[Tuple[str, "re.Pattern", str]] = [
+    ("GET", re.compile(r"^/tasks/?$"), HEAVY),
+    ("GET", re.compile(r"^/tasks/(calendar|board|stats)$"), HEAVY),
+    ("POST", re.compile(r"^/tasks/bulk-update-by-filter$"), HEAVY),
+    ("GET", re.compile(r"^/tasks/(suggest|batch)$"), READ),
+    # Looks tasks up by id, it changes nothing
+    ("POST", re.compile(r"^/tasks/batch$"), READ),
+    ("GET", re.compile(r"^/tasks/"), READ),
+    ("*", re.compile(r"^/tasks/"), WRITE),
+]
+
+
+def classify(method: str, path: str) -> Optional[str]:
+    """Admission class for a request, or None when it bypasses admission control"""
+    for route_method, pattern, admission_class in ROUTE_CLASSES:
+        if route_method in ("*", method) and pattern.match(path):
+            return admission_class
+    return None
+
+
+class AdaptiveLimiter:
+    """Concurrency limit that follows measured latency.
+
+    The limit grows while request latency stays close to the best recently
+    seen and shrinks in proportion when it climbs, so queueing moves out of
+    the database and into a short, bounded wait here. Freed slots go to the
+    highest-priority waiter whose class still has room under its share.
+    All methods run on the event loop, so no locking is needed.
+    """
+
+    def __init__(self, initial_limit: int = 20, min_limit: int = 4, max_limit: int = 200,
+                 max_queue: int = 50, max_wait: float = 2.0, tolerance: float = 2.0,
+                 smoothing: float = 0.2, probe_interval: int = 500):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.probe_interval = probe_interval
+        self.in_flight: Dict[str, int] = {admission_class: 0 for admission_class in PRIORITIES}
+        self._waiters: List[Tuple[int, int, str, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._latency: Optional[float] = None
+        self._min_latency = math.inf
+        self._samples = 0
+
+    def capacity(self, admission_class: str) -> int:
+        return max(1, int(self.limit * CLASS_SHARES[admission_class]))
+
+    def _has_room(self, admission_class: str) -> bool:
+        return (sum(self.in_flight.values()) < int(self.limit)
+                and self.in_flight[admission_class] < self.capacity(admission_class))
+
+    async def acquire(self, admission_class: str) -> bool:
+        """Take a slot, waiting up to ``max_wait``; False means shed the request"""
+        priority = PRIORITIES[admission_class]
+        # Only waiters of equal or higher priority may be overtaken
+        if self._has_room(admission_class) and not any(waiter[0] <= priority for waiter in self._waiters):
+            self.in_flight[admission_class] += 1
+            return True
+        if len(self._waiters) >= self.max_queue:
+            return False
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = (priority, next(self._sequence), admission_class, future)
+        self._waiters.append(waiter)
+        self._waiters.sort()
+        metrics.increment("admission.queued")
+        try:
+            return await asyncio.wait_for(future, self.max_wait)
+        except asyncio.TimeoutError:
+            return False
+        except asyncio.CancelledError:
+            # A slot granted just before cancellation must be handed back
+            if future.done() and not future.cancelled():
+                self.in_flight[admission_class] -= 1
+                self._wake()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self, admission_class: str, latency: float) -> None:
+        self.in_flight[admission_class] -= 1
+        self._update_limit(latency)
+        self._wake()
+
+    def _wake(self) -> None:
+        for waiter in list(self._waiters):
+            admission_class, future = waiter[2], waiter[3]
+            if future.done():
+                continue
+            if self._has_room(admission_class):
+                self._waiters.remove(waiter)
+                self.in_flight[admission_class] += 1
+                future.set_result(True)
+
+    def _update_limit(self, latency: float) -> None:
+        self._samples += 1
+        if self._samples % self.probe_interval == 0:
+            # Forget the old floor now and then so a slower baseline is relearned
+            self._min_latency = math.inf
+        self._min_latency = min(self._min_latency, latency)
+        self._latency = latency if self._latency is None else \
+            self._latency + self.smoothing * (latency - self._latency)
+
+        gradient = max(0.5, min(1.0, self.tolerance * self._min_latency / max(self._latency, 1e-6)))
+        target = self.limit * gradient + math.sqrt(self.limit)
+        self.limit = min(self.max_limit, max(self.min_limit,
+                                             (1 - self.smoothing) * self.limit + self.smoothing * target))
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue should have drained"""
+        latency = self._latency or 1.0
+        return max(1, math.ceil(latency * (len(self._waiters) + 1) / max(self.limit, 1)))
+
+    def snapshot(self) -> Dict:
+        return {
+            "limit": round(self.limit, 2),
+            "inFlight": dict(self.in_flight),
+            "queued": len(self._waiters),
+            "latency": self._latency,
+            "minLatency": None if self._min_latency == math.inf else self._min_latency,
+        }
+
+
+limiter = AdaptiveLimiter(
+    initial_limit=int(os.getenv("ADMISSION_INITIAL_LIMIT", "20")),
+    min_limit=int(os.getenv("ADMISSION_MIN_LIMIT", "4")),
+    max_limit=int(os.getenv("ADMISSION_MAX_LIMIT", "200")),
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "50")),
+    max_wait=float(os.getenv("ADMISSION_MAX_WAIT", "2.0")),
+)
+
+
+class AdmissionControlMiddleware:
+    """Sheds load with 503 + Retry-After once the limiter is saturated"""
+
+    def __init__(self, app: ASGIApp, limiter: AdaptiveLimiter = limiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        admission_class = classify(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if admission_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        waited = time.monotonic()
+        if not await self.limiter.acquire(admission_class):
+            metrics.increment(f"admission.rejected.{admission_class}")
+            response = JSONResponse(
+                {"detail": "Server is busy, please retry"},
+                status_code=503,
+                headers={"Retry-After": str(self.limiter.retry_after())},
+            )
+            await response(scope, receive, send)
+            return
+
+        started = time.monotonic()
+        metrics.observe(f"admission.wait.{admission_class}", started - waited)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release(admission_class, time.monotonic() - started)
@@ -1,8 +1,13 @@
-from sqlalchemy import create_engine, MetaData
+import os
+
+from sqlalchemy import create_engine, event, MetaData, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 import backend.config as config
+from backend.metrics import record_compiled_cache
+from backend.query_stats import record_statements
+from backend.tracing import instrument_engine
 
 DATABASE_USERNAME = config.DATABASE_USERNAME
 DATABASE_PASSWORD = config.DATABASE_PASSWORD
@@ -11,15 +16,56 @@ DATABASE_NAME = config.DATABASE_NAME
 
 SQLALCHEMY_DATABASE_URL = f"postgresql://{DATABASE_USERNAME}:{DATABASE_PASSWORD}@{DATABASE_HOST}/{DATABASE_NAME}"
 
+# Upper bound for statements run by request sessions; routes can lower it with
+# backend.deadlines. Scripts, migrations and background jobs are not capped.
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
+# Session.info key holding the statement_timeout of the session's transactions
+STATEMENT_TIMEOUT = "statement_timeout_ms"
+
 engine = create_engine(SQLALCHEMY_DATABASE_URL)
 
+instrument_engine(engine)
+record_statements(engine)
+record_compiled_cache(engine)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 metadata = MetaData()
 
+def warm_pool(connections: int = None):
+    """Open pool connections up front so first requests skip the connect"""
+    connections = connections or engine.pool.size()
+    opened = []
+    try:
+        for _ in range(connections):
+            connection = engine.connect()
+            connection.execute(text("SELECT 1"))
+            opened.append(connection)
+    finally:
+        for connection in opened:
+            connection.close()
+    return len(opened)
+
+
+@event.listens_for(Session, "after_begin")
+def _apply_statement_timeout(session, transaction, connection):
+    timeout_ms = session.info.get(STATEMENT_TIMEOUT)
+    if timeout_ms is None or connection.dialect.name != "postgresql":
+        return
+    # SET LOCAL semantics: the timeout ends with the transaction, not the pooled connection
+    connection.execute(text("SELECT set_config('statement_timeout', :timeout, true)"),
+                       {"timeout": str(timeout_ms)})
+
+
+def request_session() -> Session:
+    """A session whose transactions run with the request ``statement_timeout``"""
+    return SessionLocal(info={STATEMENT_TIMEOUT: STATEMENT_TIMEOUT_MS})
+
+
 def get_db():
-    db = SessionLocal()
+    db = request_session()
     try:
         yield db
     finally:
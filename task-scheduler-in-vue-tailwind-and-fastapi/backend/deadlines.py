@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import os
+from typing import Any, Callable, Optional
+
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from backend import db
+from backend.metrics import metrics
+from backend.profiling import profiled_thread
+
+
+logger = logging.getLogger(__name__)
+
+# Per-route statement_timeout values; other requests get db.STATEMENT_TIMEOUT_MS
+LIST_TIMEOUT_MS = int(os.getenv("TASK_LIST_TIMEOUT_MS", "5000"))
+AGGREGATE_TIMEOUT_MS = int(os.getenv("TASK_AGGREGATE_TIMEOUT_MS", "10000"))
+
+QUERY_CANCELED = "57014"
+CLIENT_CLOSED_REQUEST = 499
+
+_DBAPI_CONNECTION = "dbapi_connection"
+_ABANDONED = "query_abandoned"
+
+
+def session_with_deadline(timeout_ms: Optional[int]) -> Callable:
+    """``get_db`` variant whose transactions run with ``statement_timeout``.
+
+    None lifts the request default, for work bounded some other way.
+    """
+    def get_db(database: Session = Depends(db.get_db)) -> Session:
+        database.info[db.STATEMENT_TIMEOUT] = timeout_ms
+        return database
+    return get_db
+
+
+@event.listens_for(Session, "after_begin")
+def _remember_connection(session, transaction, connection):
+    if connection.dialect.name == "postgresql":
+        session.info[_DBAPI_CONNECTION] = connection.connection.dbapi_connection
+
+
+def is_query_canceled(error: Exception) -> bool:
+    return isinstance(error, OperationalError) and getattr(error.orig, "pgcode", None) == QUERY_CANCELED
+
+
+def cancel_session_query(session: Session) -> bool:
+    """Ask Postgres to cancel whatever the session's connection is running.
+
+    psycopg2's ``cancel()`` sends the cancel request on its own socket, so it
+    is safe to call while another thread is blocked in ``execute()``.
+    """
+    connection = session.info.get(_DBAPI_CONNECTION)
+    if connection is None or connection.closed:
+        return False
+    connection.cancel()
+    return True
+
+
+def abandon_query(session: Session) -> bool:
+    """Cancel the session's running query because nobody wants its result any more"""
+    session.info[_ABANDONED] = True
+    return cancel_session_query(session)
+
+
+async def _wait_for_disconnect(request: Request) -> None:
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def run_cancellable(request: Request, session: Session, work: Callable, *args) -> Any:
+    """Run blocking DB ``work`` off the event loop, cancelling it if the client leaves.
+
+    Deadline hits surface as 504; work abandoned by the client as 499.
+    """
+    task = asyncio.ensure_future(run_in_threadpool(profiled_thread(work), *args))
+    watcher = asyncio.ensure_future(_wait_for_disconnect(request))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        if not task.done():
+            if abandon_query(session):
+                metrics.increment("db.cancel.disconnect")
+                logger.info("Cancelled query for %s after client disconnect", request.url.path)
+            # The session must not be closed while the worker thread still uses it
+            await asyncio.wait({task})
+        return task.result()
+    except OperationalError as e:
+        if not is_query_canceled(e):
+            raise
+        if session.info.get(_ABANDONED):
+            raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+        metrics.increment("db.cancel.deadline")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Query exceeded its {session.info.get(db.STATEMENT_TIMEOUT)} ms deadline"
+        )
+    finally:
+        watcher.cancel()
@@ -0,0 +1,67 @@
+import threading
+import time
+from collections import defaultdict
+from typing import Dict
+
+
+class MetricsRegistry:
+    """Process-local counters and timings exposed on ``/metrics``"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._timings: Dict[str, Dict[str, float]] = {}
+
+    def increment(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record one duration sample for ``name``"""
+        with self._lock:
+            timing = self._timings.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+            timing["count"] += 1
+            timing["total"] += seconds
+            timing["max"] = max(timing["max"], seconds)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "timings": {name: dict(timing) for name, timing in self._timings.items()},
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+
+
+metrics = MetricsRegistry()
+
+
+def record_compiled_cache(engine) -> None:
+    """Count the engine's compiled cache hits and misses and time each compile.
+
+    The time runs from ``before_execute``, just before SQLAlchemy looks the
+    statement up, until the compiled form was generated, so it is only
+    recorded for misses.
+    """
+    from sqlalchemy import event
+    from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+
+    @event.listens_for(engine, "before_execute")
+    def _start_compile(conn, clauseelement, multiparams, params, execution_options):
+        conn.info["compile_started"] = time.perf_counter()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _record_compile(conn, cursor, statement, parameters, context, executemany):
+        if context is None or context.compiled is None:
+            return
+        if context.cache_hit is CACHE_HIT:
+            metrics.increment("db.compiled_cache.hits")
+        elif context.cache_hit is CACHE_MISS:
+            metrics.increment("db.compiled_cache.misses")
+            started = conn.info.pop("compile_started", None)
+            if started is not None:
+                metrics.observe("db.compile", context.compiled._gen_time - started)
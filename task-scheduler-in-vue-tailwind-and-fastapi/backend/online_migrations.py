@@ -0,0 +1,231 @@
+"""Migration helpers that keep the ``task`` table available while it changes
+
+Use these from Alembic revisions instead of the plain ``op`` calls that take
+long table locks:
+
+    from backend.online_migrations import create_index_concurrently, backfill_in_batches
+
+Dry run with ``alembic upgrade head --sql``: nothing is executed, the SQL is
+printed, and each helper adds comments with the locks it takes and an
+estimated duration based on the live table statistics.
+
+``alembic.context`` and ``alembic.op`` only work inside a running migration,
+so they are imported in the helpers; the estimates can be imported anywhere.
+"""
+import logging
+import math
+import os
+import time
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import text
+
+
+logger = logging.getLogger(__name__)
+
+LOCK_TIMEOUT = os.getenv("MIGRATION_LOCK_TIMEOUT", "5s")
+
+# Rough rows per second, used only for dry-run estimates
+THROUGHPUT = {
+    "btree": float(os.getenv("MIGRATION_BTREE_ROWS_PER_SEC", "500000")),
+    "gin": float(os.getenv("MIGRATION_GIN_ROWS_PER_SEC", "100000")),
+    "scan": float(os.getenv("MIGRATION_SCAN_ROWS_PER_SEC", "2000000")),
+    "update": float(os.getenv("MIGRATION_UPDATE_ROWS_PER_SEC", "20000")),
+}
+
+# Lock mode taken by each operation and what it means for concurrent traffic
+LOCKS = {
+    "create_index_concurrently": ("SHARE UPDATE EXCLUSIVE",
+                                  "reads and writes continue; waits for transactions older than the build"),
+    "drop_index_concurrently": ("SHARE UPDATE EXCLUSIVE", "reads and writes continue"),
+    "backfill": ("ROW EXCLUSIVE", "row locks on one batch at a time"),
+    "add_constraint_not_valid": ("ACCESS EXCLUSIVE", "held only for the catalog update, no table scan"),
+    "validate_constraint": ("SHARE UPDATE EXCLUSIVE", "reads and writes continue during the scan"),
+    "set_not_null": ("ACCESS EXCLUSIVE", "no scan once a validated IS NOT NULL check exists"),
+}
+
+
+class TableStats(NamedTuple):
+    rows: float
+    size_bytes: int
+
+
+def table_stats(connection, table_name: str) -> Optional[TableStats]:
+    """Planner row estimate and on-disk size of a table"""
+    row = connection.execute(
+        text("SELECT reltuples, pg_total_relation_size(oid) FROM pg_class WHERE oid = to_regclass(:table)"),
+        {"table": table_name},
+    ).first()
+    if row is None:
+        return None
+    # reltuples is -1 for a table that was never analyzed
+    return TableStats(rows=max(row[0], 0), size_bytes=row[1])
+
+
+def matching_rows(connection, table_name: str, where_clause: str) -> float:
+    """Planner estimate of the rows a backfill will touch"""
+    plan = connection.execute(
+        text(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {table_name} WHERE {where_clause}")
+    ).scalar()
+    return float(plan[0]["Plan"]["Plan Rows"])
+
+
+def estimate_seconds(operation: str, rows: float, using: str = "btree",
+                     batch_size: int = 1000, pause: float = 0.0) -> float:
+    if operation == "create_index_concurrently":
+        # A concurrent build scans the table twice
+        return 2 * rows / THROUGHPUT.get(using, THROUGHPUT["btree"])
+    if operation == "validate_constraint":
+        return rows / THROUGHPUT["scan"]
+    if operation == "backfill":
+        return rows / THROUGHPUT["update"] + math.ceil(rows / batch_size) * pause
+    return 0.0
+
+
+def describe(operation: str, table_name: str, stats: Optional[TableStats], rows: Optional[float] = None,
+             **estimate) -> List[str]:
+    """Dry-run report lines for one operation"""
+    lock, impact = LOCKS[operation]
+    lines = [f"{operation} on {table_name}: {lock} lock, {impact}"]
+    if stats is None:
+        lines.append("  table statistics unavailable")
+        return lines
+    rows = stats.rows if rows is None else rows
+    lines.append(f"  ~{stats.rows:,.0f} rows, {stats.size_bytes / 1024 ** 2:,.1f} MiB"
+                 + (f", ~{rows:,.0f} rows affected" if rows != stats.rows else ""))
+    seconds = estimate_seconds(operation, rows, **estimate)
+    if seconds:
+        lines.append(f"  estimated duration ~{seconds:,.1f}s")
+    return lines
+
+
+def _report(operation: str, table_name: str, where_clause: str = None, **estimate) -> None:
+    from alembic import context, op
+
+    if not context.is_offline_mode():
+        return
+    try:
+        from backend import db
+        with db.engine.connect() as connection:
+            stats = table_stats(connection, table_name)
+            rows = matching_rows(connection, table_name, where_clause) if stats and where_clause else None
+    except Exception as e:
+        logger.warning("Could not read statistics for %s: %s", table_name, e)
+        stats, rows = None, None
+    lines = describe(operation, table_name, stats, rows, **estimate)
+    op.get_context().impl.static_output("\n".join(f"-- {line}" for line in lines))
+
+
+def set_lock_timeout(connection) -> None:
+    """Fail fast instead of queueing every query behind a blocked DDL statement"""
+    connection.execute(text(f"SET lock_timeout = '{LOCK_TIMEOUT}'"))
+
+
+def _index_validity(index_name: str) -> Optional[bool]:
+    from alembic import op
+
+    return op.get_bind().execute(
+        text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:index)"),
+        {"index": index_name},
+    ).scalar()
+
+
+def create_index_concurrently(index_name: str, table_name: str, columns: List[str], **kw) -> None:
+    """``CREATE INDEX CONCURRENTLY`` outside the migration transaction.
+
+    An invalid index left behind by an interrupted build is dropped and
+    rebuilt; a valid one is kept, so the step can be re-run.
+    """
+    from alembic import context, op
+
+    _report("create_index_concurrently", table_name, using=kw.get("postgresql_using", "btree"))
+    with op.get_context().autocommit_block():
+        if not context.is_offline_mode():
+            valid = _index_validity(index_name)
+            if valid:
+                return
+            if valid is False:
+                op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+        op.create_index(index_name, table_name, columns, postgresql_concurrently=True, **kw)
+
+
+def drop_index_concurrently(index_name: str, table_name: str) -> None:
+    from alembic import op
+
+    _report("drop_index_concurrently", table_name)
+    with op.get_context().autocommit_block():
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+
+
+def backfill_in_batches(table_name: str, set_clause: str, where_clause: str,
+                        batch_size: int = 1000, pause: float = 0.05, key: str = "id") -> int:
+    """Run ``UPDATE table SET set_clause WHERE where_clause`` in committed, keyed batches.
+
+    Each batch is its own transaction, and ``pause`` seconds between batches
+    leave room for replication and regular traffic. Returns the rows updated.
+    """
+    from alembic import context, op
+
+    _report("backfill", table_name, where_clause, batch_size=batch_size, pause=pause)
+    statement = (
+        f"WITH batch AS (SELECT {key} FROM {table_name} WHERE ({where_clause}) AND {key} > :last_key "
+        f"ORDER BY {key} LIMIT :batch_size) "
+        f"UPDATE {table_name} SET {set_clause} FROM batch WHERE {table_name}.{key} = batch.{key} "
+        f"RETURNING {table_name}.{key}"
+    )
+    if context.is_offline_mode():
+        op.get_context().impl.static_output(
+            f"-- repeat with last_key = max returned {key} until no rows are returned, "
+            f"starting at 0, batch_size = {batch_size}\n{statement};\n"
+        )
+        return 0
+
+    updated, batches, last_key = 0, 0, 0
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        while True:
+            keys = connection.execute(text(statement), {"last_key": last_key, "batch_size": batch_size}).scalars().all()
+            if not keys:
+                break
+            updated += len(keys)
+            batches += 1
+            last_key = max(keys)
+            if batches % 100 == 0:
+                logger.info("Backfill of %s: %d rows in %d batches, up to %s %s",
+                            table_name, updated, batches, key, last_key)
+            time.sleep(pause)
+    logger.info("Backfill of %s finished: %d rows in %d batches", table_name, updated, batches)
+    return updated
+
+
+def add_constraint_not_valid(constraint_name: str, table_name: str, definition: str) -> None:
+    """Add a CHECK or FOREIGN KEY constraint without scanning existing rows"""
+    from alembic import op
+
+    _report("add_constraint_not_valid", table_name)
+    op.execute(f"ALTER TABLE {table_name} ADD CONSTRAINT {constraint_name} {definition} NOT VALID")
+
+
+def validate_constraint(constraint_name: str, table_name: str) -> None:
+    """Check existing rows against a NOT VALID constraint while writes continue.
+
+    Runs in its own transaction so the brief ACCESS EXCLUSIVE lock taken when
+    the constraint was added is not held for the scan.
+    """
+    from alembic import op
+
+    _report("validate_constraint", table_name)
+    with op.get_context().autocommit_block():
+        op.execute(f"ALTER TABLE {table_name} VALIDATE CONSTRAINT {constraint_name}")
+
+
+def set_not_null(table_name: str, column_name: str) -> None:
+    """``SET NOT NULL`` backed by a validated check, so Postgres skips the full-table scan"""
+    from alembic import op
+
+    constraint_name = f"{table_name}_{column_name}_not_null"
+    add_constraint_not_valid(constraint_name, table_name, f"CHECK ({column_name} IS NOT NULL)")
+    validate_constraint(constraint_name, table_name)
+    _report("set_not_null", table_name)
+    op.alter_column(table_name, column_name, nullable=False)
+    op.drop_constraint(constraint_name, table_name, type_="check")
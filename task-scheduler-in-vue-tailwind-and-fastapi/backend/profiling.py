@@ -0,0 +1,214 @@
+"""Opt-in sampling profiler for single requests
+
+A request is profiled when it carries ``X-Profile: <PROFILE_ADMIN_TOKEN>`` or
+is picked by ``PROFILE_SAMPLE_RATE``. While it runs, a sampler thread records
+the stacks of the event-loop thread and of any worker thread running DB work
+for the request. Samples are written as collapsed stacks (one
+``frame;frame;frame count`` line per stack), which speedscope and
+flamegraph.pl open directly, into a ring of at most ``PROFILE_RING_SIZE``
+files. Other requests running on the loop at the same time show up in the
+samples too, so profile on a quiet worker when the numbers matter.
+"""
+import contextvars
+import hmac
+import os
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import FileResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.metrics import metrics
+
+
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "2")) / 1000
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "/tmp/scheduler-profiles"))
+PROFILE_RING_SIZE = int(os.getenv("PROFILE_RING_SIZE", "50"))
+
+CAPTURE_SUFFIX = ".collapsed"
+_CAPTURE_NAME = re.compile(r"^[\w.-]+\.collapsed$")
+
+_active_profile: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar(
+    "active_profile", default=None
+)
+
+
+class RequestProfile:
+    """Samples the stacks of the threads working on one request"""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._threads: Set[int] = {threading.get_ident()}
+        self._stopped = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._sampler.join()
+
+    def add_thread(self, thread_id: int) -> None:
+        self._threads.add(thread_id)
+
+    def discard_thread(self, thread_id: int) -> None:
+        self._threads.discard(thread_id)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in list(self._threads):
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self.stacks[collapse(frame)] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def collapse(frame) -> str:
+    """Root-first ``function (file:line)`` frames joined with ``;``"""
+    names: List[str] = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def profiled_thread(work: Callable) -> Callable:
+    """Wrap ``work`` so the thread running it is sampled by the current request's profile"""
+    profile = _active_profile.get()
+    if profile is None:
+        return work
+
+    @wraps(work)
+    def run(*args, **kwargs):
+        thread_id = threading.get_ident()
+        profile.add_thread(thread_id)
+        try:
+            return work(*args, **kwargs)
+        finally:
+            profile.discard_thread(thread_id)
+    return run
+
+
+def _is_admin(token: Optional[str]) -> bool:
+    return bool(PROFILE_ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, PROFILE_ADMIN_TOKEN)
+
+
+class CaptureRing:
+    """Keeps the newest ``size`` captures in ``directory``"""
+
+    def __init__(self, directory: Path = PROFILE_DIR, size: int = PROFILE_RING_SIZE):
+        self.directory = directory
+        self.size = size
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_name(method: str, path: str) -> str:
+        slug = re.sub(r"[^\w]+", "-", path).strip("-") or "root"
+        return f"{time.strftime('%Y%m%dT%H%M%S')}-{secrets.token_hex(3)}-{method}-{slug}{CAPTURE_SUFFIX}"
+
+    def write(self, name: str, content: str) -> None:
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            (self.directory / name).write_text(content)
+            for stale in self._captures()[self.size:]:
+                stale.unlink(missing_ok=True)
+
+    def _captures(self) -> List[Path]:
+        if not self.directory.is_dir():
+            return []
+        return sorted(self.directory.glob(f"*{CAPTURE_SUFFIX}"), key=lambda path: path.stat().st_mtime, reverse=True)
+
+    def list(self) -> List[Dict]:
+        return [{"name": path.name, "size": path.stat().st_size, "createdAt": path.stat().st_mtime}
+                for path in self._captures()]
+
+    def path(self, name: str) -> Optional[Path]:
+        if not _CAPTURE_NAME.match(name):
+            return None
+        path = self.directory / name
+        return path if path.is_file() else None
+
+
+capture_ring = CaptureRing()
+
+
+class ProfilingMiddleware:
+    """Profiles requests that ask for it with the admin token, or a random sample"""
+
+    def __init__(self, app: ASGIApp, ring: CaptureRing = capture_ring, sample_rate: float = PROFILE_SAMPLE_RATE):
+        self.app = app
+        self.ring = ring
+        self.sample_rate = sample_rate
+
+    def _wants_profile(self, scope: Scope) -> bool:
+        if _is_admin(Headers(scope=scope).get("x-profile")):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith("/admin/profiles") or not self._wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        capture = self.ring.new_name(scope["method"], scope["path"])
+
+        async def send_with_capture_header(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Profile-Capture", capture)
+            await send(message)
+
+        token = _active_profile.set(profile)
+        started = time.monotonic()
+        profile.start()
+        try:
+            await self.app(scope, receive, send_with_capture_header)
+        finally:
+            profile.stop()
+            _active_profile.reset(token)
+            self.ring.write(capture, profile.collapsed())
+            metrics.increment("profiling.captures")
+            metrics.observe("profiling.profiled_requests", time.monotonic() - started)
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    if not PROFILE_ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Admin endpoints are disabled")
+    if not _is_admin(x_admin_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin token required")
+
+
+router = APIRouter(tags=["Admin"], prefix="/admin/profiles", dependencies=[Depends(require_admin)])
+
+
+@router.get("/")
+def list_captures():
+    return {"captures": capture_ring.list()}
+
+
+@router.get("/{name}")
+def download_capture(name: str):
+    path = capture_ring.path(name)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Capture {name} not found")
+    return FileResponse(path, media_type="text/plain", filename=name)
@@ -0,0 +1,147 @@
+"""Per-request statement counts
+
+Engine events count the statements each request executes, the rows the
+driver reports for them (fetched for queries, affected for writes) and the
+time spent waiting on the database. With ``QUERY_STATS_HEADERS=true``, meant
+for development and test deployments rather than production, every
+response carries them:
+
+    X-DB-Statements: 2
+    X-DB-Rows: 40
+    X-DB-Time-Ms: 3.1
+    Server-Timing: db;dur=3.1
+
+Tests use ``capture()`` to hold endpoints to a statement budget, see
+``tests/integration/test_query_budgets.py``.
+"""
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+QUERY_STATS_HEADERS = os.getenv("QUERY_STATS_HEADERS", "false").lower() in ("1", "true", "yes")
+
+QUERY_STATS_HEADER_NAMES = ["X-DB-Statements", "X-DB-Rows", "X-DB-Time-Ms", "Server-Timing"]
+
+_STARTED = "query_stats_started"
+
+
+class QueryStats:
+    """Statements, rows and database time of one request or capture block"""
+
+    def __init__(self, keep_statements: bool = False):
+        self.statements = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self.executed: Optional[List[str]] = [] if keep_statements else None
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, rows: int, seconds: float) -> None:
+        with self._lock:
+            self.statements += 1
+            self.rows += rows
+            self.seconds += seconds
+            if self.executed is not None:
+                self.executed.append(statement)
+
+    def headers(self) -> Dict[str, str]:
+        db_ms = f"{self.seconds * 1000:.1f}"
+        return {
+            "X-DB-Statements": str(self.statements),
+            "X-DB-Rows": str(self.rows),
+            "X-DB-Time-Ms": db_ms,
+            "Server-Timing": f"db;dur={db_ms}",
+        }
+
+
+# A mutable object, so statements run in threadpool copies of the context still count
+_request_stats: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar(
+    "query_stats", default=None)
+
+_captures: List[QueryStats] = []
+_captures_lock = threading.Lock()
+
+
+@contextmanager
+def capture(keep_statements: bool = True) -> Iterator[QueryStats]:
+    """Record every statement on the instrumented engines while the block runs.
+
+    Unlike the per-request stats this sees every thread, so it also counts
+    requests made through ``TestClient``.
+    """
+    stats = QueryStats(keep_statements=keep_statements)
+    with _captures_lock:
+        _captures.append(stats)
+    try:
+        yield stats
+    finally:
+        with _captures_lock:
+            _captures.remove(stats)
+
+
+def _collectors() -> List[QueryStats]:
+    request_stats = _request_stats.get()
+    collectors = list(_captures)
+    if request_stats is not None:
+        collectors.append(request_stats)
+    return collectors
+
+
+def record_statements(engine) -> None:
+    """Feed every statement the engine executes into the active collectors"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_statement(conn, cursor, statement, parameters, context, executemany):
+        if _captures or _request_stats.get() is not None:
+            conn.info.setdefault(_STARTED, []).append(time.perf_counter())
+
+    def _finish_statement(conn, statement: str, rows: int) -> None:
+        started = conn.info.get(_STARTED)
+        if not started:
+            return
+        seconds = time.perf_counter() - started.pop()
+        for stats in _collectors():
+            stats.record(statement, rows, seconds)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _end_statement(conn, cursor, statement, parameters, context, executemany):
+        _finish_statement(conn, statement, max(cursor.rowcount, 0))
+
+    @event.listens_for(engine, "handle_error")
+    def _statement_failed(exception_context):
+        if exception_context.connection is not None:
+            _finish_statement(exception_context.connection, exception_context.statement or "", 0)
+
+
+class QueryStatsMiddleware:
+    """Adds the request's statement count, rows and database time as response headers"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+
+        async def send_with_stats(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                for name, value in stats.headers().items():
+                    headers.append(name, value)
+            await send(message)
+
+        token = _request_stats.set(stats)
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _request_stats.reset(token)
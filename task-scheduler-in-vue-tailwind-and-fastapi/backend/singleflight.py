@@ -0,0 +1,67 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from backend.metrics import metrics
+
+
+class SingleFlight:
+    """Lets concurrent callers with the same key share one in-flight execution.
+
+    The first caller for a key runs ``work``; callers arriving before it
+    finishes await the same result, or the same exception. A follower whose
+    leader failed in a way that was specific to the leader (``retry_on``, or
+    cancellation) runs the work again instead.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.executed = 0
+        self.coalesced = 0
+        self._flights: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, work: Callable[[], Awaitable],
+                 retry_on: Optional[Callable[[BaseException], bool]] = None) -> Any:
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            metrics.increment(f"{self.name}.coalesced")
+            try:
+                # shield: a follower going away must not cancel the shared flight
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise
+            except Exception as e:
+                if retry_on is None or not retry_on(e):
+                    raise
+            return await self.do(key, work, retry_on)
+
+        self.executed += 1
+        metrics.increment(f"{self.name}.executed")
+        flight = asyncio.get_running_loop().create_future()
+        # Mark failures as retrieved so a flight nobody joined does not log a warning
+        flight.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._flights[key] = flight
+        try:
+            result = await work()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as e:
+            flight.set_exception(e)
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def snapshot(self) -> Dict[str, Any]:
+        requests = self.executed + self.coalesced
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "ratio": round(self.coalesced / requests, 4) if requests else 0.0,
+            "inFlight": len(self._flights),
+        }
@@ -0,0 +1,187 @@
+"""Built-in serving of the built Vue client
+
+With ``SERVE_CLIENT=true`` the API also serves ``client/dist``, so a single
+container can run the whole app without the nginx front end:
+
+- ``.br`` and ``.gz`` files next to an asset are sent instead of it when the
+  client accepts that encoding. Create them after ``npm run build`` with
+  ``python -m backend.static client/dist``.
+- Vite's content-hashed files under ``assets/`` are cached for a year as
+  ``immutable``; everything else, ``index.html`` included, is revalidated
+  with its ETag on every use.
+- Paths that are not files fall back to ``index.html`` for client-side routing.
+- Files are sent with the ASGI zero-copy extension when the server offers
+  it, otherwise in chunks.
+- ``/api/...`` requests reach the API with the prefix removed, as the nginx
+  ``/api/`` location does, so the client build works unchanged.
+"""
+import gzip
+import mimetypes
+import os
+import re
+import stat
+import sys
+from typing import Dict, List, Optional
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional; only needed to create .br files
+    brotli = None
+
+
+STATIC_SERVING_ENABLED = os.getenv("SERVE_CLIENT", "false").lower() in ("1", "true", "yes")
+STATIC_DIR = os.getenv("CLIENT_DIST_DIR", "client/dist")
+
+# Preferred first when the client accepts both
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+# Vite's default asset names: assets/<name>-<8 character hash>.<ext>
+HASHED_ASSET = re.compile(r"^assets/.+-[\w-]{8}\.\w+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+COMPRESSIBLE_SUFFIXES = (".html", ".js", ".mjs", ".css", ".json", ".svg", ".txt", ".xml", ".map", ".ico", ".wasm")
+MIN_COMPRESS_BYTES = 1024
+
+
+def accepted_encodings(header: Optional[str]) -> Dict[str, float]:
+    """``Accept-Encoding`` as a mapping of coding to q-value"""
+    accepted: Dict[str, float] = {}
+    for item in (header or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip() == "q":
+            try:
+                q = float(value)
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def cache_control(path: str) -> str:
+    return IMMUTABLE if HASHED_ASSET.match(path.replace(os.sep, "/")) else REVALIDATE
+
+
+class ApiPrefixMiddleware:
+    """Strips the ``/api`` prefix the client puts in front of API paths"""
+
+    def __init__(self, app: ASGIApp, prefix: str = "/api"):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        path = scope.get("path", "")
+        if scope["type"] == "http" and (path == self.prefix or path.startswith(self.prefix + "/")):
+            scope = {**scope, "path": path[len(self.prefix):] or "/"}
+            scope.pop("raw_path", None)
+        await self.app(scope, receive, send)
+
+
+class SendfileResponse(FileResponse):
+    """FileResponse that hands the file to the server for zero-copy sending when it can"""
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.send_header_only or "http.response.zerocopysend" not in scope.get("extensions", {}):
+            await super().__call__(scope, receive, send)
+            return
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        with open(self.path, "rb") as file:
+            await send({"type": "http.response.zerocopysend", "file": file.fileno(),
+                        "count": os.fstat(file.fileno()).st_size})
+
+
+class ClientStaticFiles(StaticFiles):
+    """StaticFiles with precompressed variants, cache headers and an SPA fallback"""
+
+    def __init__(self, directory: str = STATIC_DIR, **kwargs):
+        super().__init__(directory=directory, html=True, **kwargs)
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        try:
+            return await super().get_response(path, scope)
+        except HTTPException as e:
+            # Client-side routes have no file; anything with an extension is a real 404
+            if e.status_code != 404 or os.path.splitext(path)[1]:
+                raise
+        full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, "index.html")
+        if stat_result is None:
+            raise HTTPException(status_code=404)
+        return self.file_response(full_path, stat_result, scope)
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        relative = os.path.relpath(full_path, os.path.realpath(self.directory))
+        headers = {"Cache-Control": cache_control(relative)}
+
+        served_path, served_stat = full_path, stat_result
+        variant = self._variant(full_path, request_headers)
+        if variant is not None:
+            served_path, served_stat, headers["Content-Encoding"] = variant
+        if variant is not None or self._has_variants(full_path):
+            headers["Vary"] = "Accept-Encoding"
+
+        # The media type comes from the original name, not from the .br/.gz file
+        response = SendfileResponse(served_path, status_code=status_code, stat_result=served_stat,
+                                    method=scope["method"], headers=headers,
+                                    media_type=mimetypes.guess_type(full_path)[0] or "text/plain")
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    @staticmethod
+    def _variant(full_path: str, request_headers: Headers):
+        accepted = accepted_encodings(request_headers.get("accept-encoding"))
+        for coding, suffix in ENCODINGS:
+            if accepted.get(coding, accepted.get("*", 0)) <= 0:
+                continue
+            try:
+                variant_stat = os.stat(full_path + suffix)
+            except OSError:
+                continue
+            if stat.S_ISREG(variant_stat.st_mode):
+                return full_path + suffix, variant_stat, coding
+        return None
+
+    @staticmethod
+    def _has_variants(full_path: str) -> bool:
+        return any(os.path.isfile(full_path + suffix) for _, suffix in ENCODINGS)
+
+
+def precompress(directory: str = STATIC_DIR) -> List[str]:
+    """Write .gz (and .br, when brotli is installed) next to every compressible file"""
+    written = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            if not name.endswith(COMPRESSIBLE_SUFFIXES) or os.path.getsize(path) < MIN_COMPRESS_BYTES:
+                continue
+            with open(path, "rb") as source:
+                content = source.read()
+            variants = {".gz": gzip.compress(content, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants[".br"] = brotli.compress(content, quality=11)
+            for suffix, compressed in variants.items():
+                # Only keep variants that are actually smaller
+                if len(compressed) < len(content):
+                    with open(path + suffix, "wb") as target:
+                        target.write(compressed)
+                    written.append(path + suffix)
+    return written
+
+
+if __name__ == "__main__":
+    if brotli is None:
+        print("brotli is not installed; writing gzip variants only", file=sys.stderr)
+    files = precompress(sys.argv[1] if len(sys.argv) > 1 else STATIC_DIR)
+    print(f"Wrote {len(files)} precompressed files")
@@ -0,0 +1,72 @@
+import threading
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import Integer, and_, asc, bindparam, desc, func, select
+from sqlalchemy.orm import Session, aliased
+
+from . import model
+from .filter_schema import TaskFilterParams
+from .statements import (
+    SORT_COLUMNS, canonical_fields, filter_conditions, filter_params, filter_shape, projection, sparse_rows,
+)
+
+
+_statements: Dict[Tuple, Any] = {}
+_statements_lock = threading.Lock()
+
+
+def board_statement(shape: Tuple[str, ...], sort_by: str, sort_order: str, fields: Tuple[str, ...]):
+    """First ``:per_column`` tasks of every status plus per-status totals.
+
+    ``row_number()`` and ``count(*)`` over ``PARTITION BY status`` rank and
+    count every column in one pass, so the board costs a single query
+    instead of a count and a page query per column.
+    """
+    fields = canonical_fields(fields)
+    key = (shape, sort_by, sort_order, fields)
+    statement = _statements.get(key)
+    if statement is not None:
+        return statement
+
+    sort_column = SORT_COLUMNS.get(sort_by, model.Task.createdDate)
+    ranked = select(
+        *projection(fields),
+        model.Task.status.label("board_status"),
+        func.row_number().over(
+            partition_by=model.Task.status,
+            order_by=(desc(sort_column) if sort_order == "desc" else asc(sort_column), model.Task.id)
+        ).label("board_position"),
+        func.count().over(partition_by=model.Task.status).label("board_total"),
+    )
+    ranked = ranked.where(and_(model.Task.status.isnot(None), *filter_conditions(shape))).subquery("ranked")
+
+    if fields:
+        columns = [ranked.c[field] for field in fields]
+    else:
+        columns = [aliased(model.Task, ranked)]
+    statement = (
+        select(*columns, ranked.c.board_status, ranked.c.board_total)
+        .where(ranked.c.board_position <= bindparam("per_column", type_=Integer))
+        .order_by(ranked.c.board_status, ranked.c.board_position)
+    )
+    with _statements_lock:
+        return _statements.setdefault(key, statement)
+
+
+def task_board(filters: TaskFilterParams, per_column: int, db: Session) -> List[Dict[str, Any]]:
+    """Board columns in status order, each with its total and first tasks"""
+    fields = tuple(filters.fields or ())
+    statement = board_statement(filter_shape(filters), filters.sort_by, filters.sort_order, fields)
+    rows = db.execute(statement, {**filter_params(filters, db), "per_column": per_column}).all()
+
+    tasks = sparse_rows(rows, db, fields) if fields else [row[0] for row in rows]
+    columns: Dict[str, Dict[str, Any]] = {}
+    for row, task in zip(rows, tasks):
+        column = columns.setdefault(
+            row.board_status, {"status": row.board_status, "total": row.board_total, "tasks": []}
+        )
+        column["tasks"].append(task)
+    # Requested statuses get a column even when nothing matches
+    for task_status in filters.status or []:
+        columns.setdefault(task_status, {"status": task_status, "total": 0, "tasks": []})
+    return list(columns.values())
@@ -0,0 +1,96 @@
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict
+
+from sqlalchemy import Integer, and_, bindparam, func, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from . import model
+from .rollups import FACT_COLUMNS, ROLLUPS_ENABLED, record_task_changes, task_facts
+from .filter_schema import TaskFilterParams
+from .statements import filter_conditions, filter_params, filter_shape
+from .tags import tag_dictionary
+
+
+logger = logging.getLogger(__name__)
+
+BULK_UPDATE_BATCH_SIZE = int(os.getenv("TASK_BULK_UPDATE_BATCH_SIZE", "500"))
+
+
+def patch_values(patch, db: Session) -> Dict[str, Any]:
+    """SET clause for a bulk patch, mirroring update_task_by_id"""
+    values: Dict[Any, Any] = {}
+    for field in ("title", "description", "status", "priority", "dueDate"):
+        value = getattr(patch, field)
+        if value:
+            values[getattr(model.Task, field)] = value
+    if patch.tags:
+        values[model.Task.tag_ids] = tag_dictionary.intern(db, patch.tags)
+    else:
+        tag_ids = model.Task.tag_ids
+        if patch.addTags:
+            # intarray: | merges and - removes elements
+            tag_ids = tag_ids.op("|")(bindparam("add_tag_ids", tag_dictionary.intern(db, patch.addTags),
+                                                type_=ARRAY(Integer)))
+        if patch.removeTags:
+            tag_ids = tag_ids.op("-")(bindparam("remove_tag_ids", tag_dictionary.ids_for(db, patch.removeTags),
+                                                type_=ARRAY(Integer)))
+        if patch.addTags or patch.removeTags:
+            values[model.Task.tag_ids] = tag_ids
+    if patch.status == "completed":
+        values[model.Task.completedDate] = func.coalesce(model.Task.completedDate, datetime.now())
+    return values
+
+
+def bulk_update(filters: TaskFilterParams, patch, db: Session, batch_size: int) -> Dict[str, Any]:
+    """Apply ``patch`` to every task matching ``filters`` in id-ordered batches.
+
+    Each batch updates at most ``batch_size`` matching rows in its own
+    transaction, so row locks are held briefly and progress survives a
+    failure part way through. The batch's rollup changes commit with it.
+    """
+    shape = filter_shape(filters)
+    conditions = filter_conditions(shape)
+    params = filter_params(filters, db)
+    values = patch_values(patch, db)
+
+    # Upper id bound of the next batch of matching rows
+    boundary = (
+        select(model.Task.id)
+        .where(and_(model.Task.id > bindparam("last_id", type_=Integer), *conditions))
+        .order_by(model.Task.id)
+        .offset(batch_size - 1)
+        .limit(1)
+    )
+    in_batch = and_(model.Task.id > bindparam("last_id", type_=Integer),
+                    model.Task.id <= bindparam("upper_id", type_=Integer),
+                    *conditions)
+    statement = update(model.Task).where(in_batch).values(values).execution_options(synchronize_session=False)
+    current = select(model.Task.id, *FACT_COLUMNS).where(in_batch).with_for_update()
+    max_id = db.execute(select(func.max(model.Task.id)).where(*conditions), params).scalar()
+    last_id, updated, batches = 0, 0, 0
+    while max_id is not None and last_id < max_id:
+        upper_id = db.execute(boundary, {**params, "last_id": last_id}).scalar() or max_id
+        batch = {**params, "last_id": last_id, "upper_id": upper_id}
+        if ROLLUPS_ENABLED:
+            updated += _update_recording_rollups(statement, current, batch, db)
+        else:
+            updated += db.execute(statement, batch).rowcount
+        db.commit()
+        batches += 1
+        last_id = upper_id
+        logger.info("Bulk update batch %d: %d rows updated, up to task %d of %d",
+                    batches, updated, last_id, max_id)
+
+    return {"updatedCount": updated, "batches": batches, "lastId": last_id or None}
+
+
+def _update_recording_rollups(statement, current, params: Dict[str, Any], db: Session) -> int:
+    """Run one batch update, adding the rollup changes of its rows to the transaction"""
+    before = {row.id: task_facts(row) for row in db.execute(current, params)}
+    after = db.execute(statement.returning(model.Task.id, *FACT_COLUMNS), params).all()
+    # Rows that started matching after the lock was taken are left to the nightly reconciliation
+    record_task_changes(db, [(before[row.id], task_facts(row)) for row in after if row.id in before])
+    return len(after)
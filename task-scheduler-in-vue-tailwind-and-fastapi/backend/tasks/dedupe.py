@@ -0,0 +1,89 @@
+"""Near-duplicate detection for new tasks
+
+With ``TASK_DEDUPE=true`` every create first looks for open tasks whose title
+is trigram-similar to the new one, using the partial ``gin_trgm_ops`` index
+on open tasks. Matches scoring at least ``TASK_DEDUPE_THRESHOLD`` are
+returned with the created task as ``possibleDuplicates``. A match scoring at
+least ``TASK_DEDUPE_REJECT_THRESHOLD`` rejects the create with 409 unless
+the client passes ``allow_duplicate=true``.
+
+The lookup runs on its own connection with a short statement timeout. A
+lookup that times out or fails lets the create through unchecked.
+"""
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Float, Integer, String, bindparam, func, select, text
+from sqlalchemy.orm import Session
+
+from backend.metrics import metrics
+from . import model
+from .suggest import MIN_TRIGRAM_LENGTH, normalize_query
+
+
+logger = logging.getLogger(__name__)
+
+DEDUPE_ENABLED = os.getenv("TASK_DEDUPE", "false").lower() in ("1", "true", "yes")
+DEDUPE_THRESHOLD = float(os.getenv("TASK_DEDUPE_THRESHOLD", "0.6"))
+# Unset or above 1.0: report candidates but never reject
+DEDUPE_REJECT_THRESHOLD = float(os.getenv("TASK_DEDUPE_REJECT_THRESHOLD", "1.1"))
+DEDUPE_MAX_CANDIDATES = int(os.getenv("TASK_DEDUPE_MAX_CANDIDATES", "5"))
+DEDUPE_TIMEOUT_MS = int(os.getenv("TASK_DEDUPE_TIMEOUT_MS", "20"))
+
+# pg_trgm's default pg_trgm.similarity_threshold, applied by the % operator
+TRGM_OPERATOR_THRESHOLD = 0.3
+
+
+def duplicate_statement():
+    """Open tasks whose title is at least ``:threshold`` similar to ``:title``.
+
+    ``%`` lets Postgres use the trigram index; the explicit similarity
+    condition then narrows its matches to the configured threshold.
+    """
+    lowered = func.lower(model.Task.title)
+    title = bindparam("title", type_=String)
+    score = func.similarity(lowered, title)
+    return (
+        select(model.Task.id, model.Task.title, model.Task.status, score.label("score"))
+        .where(lowered.op("%")(title))
+        .where(model.Task.status != "completed")
+        .where(score >= bindparam("threshold", type_=Float))
+        .order_by(score.desc(), model.Task.id)
+        .limit(bindparam("limit", type_=Integer))
+    )
+
+
+_STATEMENT = duplicate_statement()
+
+
+def find_duplicates(title: str, db: Session, threshold: float = DEDUPE_THRESHOLD,
+                    limit: int = DEDUPE_MAX_CANDIDATES) -> List[Dict[str, Any]]:
+    """Most similar open tasks first, as ``{"id", "title", "status", "score"}``"""
+    title = normalize_query(title)
+    if len(title) < MIN_TRIGRAM_LENGTH:
+        return []
+    params = {"title": title, "threshold": max(threshold, TRGM_OPERATOR_THRESHOLD), "limit": limit}
+    try:
+        # Own transaction, so the short timeout does not apply to the insert
+        with db.get_bind().begin() as connection:
+            connection.execute(text("SELECT set_config('statement_timeout', :timeout, true)"),
+                               {"timeout": str(DEDUPE_TIMEOUT_MS)})
+            rows = connection.execute(_STATEMENT, params).all()
+    except Exception as e:
+        metrics.increment("tasks.dedupe.skipped")
+        logger.warning("Duplicate check skipped: %s", e)
+        return []
+    metrics.increment("tasks.dedupe.checks")
+    if rows:
+        metrics.increment("tasks.dedupe.candidates_found")
+    return [{"id": row.id, "title": row.title, "status": row.status, "score": round(row.score, 3)}
+            for row in rows]
+
+
+def rejecting_duplicate(candidates: List[Dict[str, Any]],
+                        reject_threshold: float = DEDUPE_REJECT_THRESHOLD) -> Optional[Dict[str, Any]]:
+    """The candidate that should block the create, if any"""
+    if candidates and candidates[0]["score"] >= reject_threshold:
+        return candidates[0]
+    return None
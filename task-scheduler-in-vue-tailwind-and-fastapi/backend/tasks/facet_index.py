@@ -0,0 +1,370 @@
+import bisect
+import heapq
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.metrics import metrics
+from . import model
+from .filter_schema import TaskFilterParams
+from .idset import IdSet
+from .tags import tag_dictionary
+from .task_cache import ALL, remote_target
+
+
+logger = logging.getLogger(__name__)
+
+FACET_INDEX_ENABLED = os.getenv("TASK_FACET_INDEX", "false").lower() in ("1", "true", "yes")
+# Other workers' writes arrive through the task_cache channel and are reloaded
+# on the next read. Rebuild from Postgres in the background anyway when older
+# than this many seconds (0 = never), in case a notification is lost.
+FACET_INDEX_MAX_AGE = float(os.getenv("TASK_FACET_INDEX_MAX_AGE", "300"))
+
+SORTABLE_FIELDS = ("createdDate", "dueDate")
+
+_FACET_COLUMNS = (model.Task.id, model.Task.status, model.Task.priority, model.Task.tag_ids,
+                  model.Task.createdDate, model.Task.dueDate)
+
+
+def _as_datetime(value: date) -> datetime:
+    # Postgres compares a date against a timestamp as midnight of that day
+    if isinstance(value, datetime):
+        return value
+    return datetime(value.year, value.month, value.day)
+
+
+def _priority_value(priority) -> str:
+    return getattr(priority, "value", priority)
+
+
+class FacetIndex:
+    """In-process sets of task ids per status, priority and tag.
+
+    The sets are compressed ``IdSet``s, so filters intersect and unite them
+    chunk by chunk. Created and due dates are kept as sorted ``(value, id)``
+    arrays for range filters and ordering. Only ids come out of the index;
+    the final page of rows is still loaded from Postgres.
+
+    ``rebuild`` reads and builds a new index without the lock and swaps it
+    in whole, so reads keep being answered from the old one meanwhile.
+    ``FacetIndexBuilder`` runs it off the request path.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Tasks written since they were indexed; ALL marks every task
+        self._changed: set = set()
+        self._rebuilding = False
+        # Whether invalidate() was called since the running rebuild began
+        self._invalidated = False
+        # Set when the index should be rebuilt; FacetIndexBuilder waits on it
+        self.rebuild_wanted = threading.Event()
+        self.ready = False
+        self.built_at = 0.0
+        self._install(self._build([]))
+
+    @staticmethod
+    def _build(rows) -> Tuple:
+        """Index structures for ``rows`` of ``_FACET_COLUMNS``"""
+        facts: Dict[int, Tuple[Optional[str], str, List[int], Optional[datetime], Optional[datetime]]] = {}
+        by_status: Dict[str, List[int]] = {}
+        by_priority: Dict[str, List[int]] = {}
+        by_tag: Dict[int, List[int]] = {}
+        dated: Dict[str, List[Tuple[datetime, int]]] = {field: [] for field in SORTABLE_FIELDS}
+        undated: Dict[str, set] = {field: set() for field in SORTABLE_FIELDS}
+        for task_id, task_status, priority, tag_ids, created, due in rows:
+            priority = _priority_value(priority)
+            facts[task_id] = (task_status, priority, list(tag_ids or []), created, due)
+            if task_status is not None:
+                by_status.setdefault(task_status, []).append(task_id)
+            by_priority.setdefault(priority, []).append(task_id)
+            for tag_id in tag_ids or []:
+                by_tag.setdefault(tag_id, []).append(task_id)
+            for field, value in (("createdDate", created), ("dueDate", due)):
+                if value is None:
+                    undated[field].add(task_id)
+                else:
+                    dated[field].append((value, task_id))
+        for values in dated.values():
+            values.sort()
+        return (
+            facts,
+            IdSet.from_ids(facts),
+            {key: IdSet.from_ids(ids) for key, ids in by_status.items()},
+            {key: IdSet.from_ids(ids) for key, ids in by_priority.items()},
+            {key: IdSet.from_ids(ids) for key, ids in by_tag.items()},
+            dated,
+            undated,
+        )
+
+    def _install(self, structures: Tuple) -> None:
+        (self._rows, self._all, self._by_status, self._by_priority, self._by_tag,
+         self._sorted, self._undated) = structures
+
+    def rebuild(self, db: Session) -> None:
+        """Load every task's facet columns from Postgres and swap the new index in"""
+        with self._lock:
+            # Changes announced while the query runs may be missing from it
+            self._changed = set()
+            self._rebuilding = True
+            self._invalidated = False
+        try:
+            structures = self._build(db.execute(select(*_FACET_COLUMNS)).all())
+        except BaseException:
+            with self._lock:
+                self._rebuilding = False
+                self._changed.add(ALL)
+            raise
+        with self._lock:
+            self._install(structures)
+            self._rebuilding = False
+            self.built_at = time.monotonic()
+            # Rows changed wholesale after the query ran; wait for the next rebuild
+            self.ready = not self._invalidated
+        metrics.increment("tasks.facet_index.rebuilds")
+
+    def is_stale(self) -> bool:
+        return ALL in self._changed or (
+            FACET_INDEX_MAX_AGE > 0 and time.monotonic() - self.built_at > FACET_INDEX_MAX_AGE)
+
+    def refresh(self, db: Session) -> None:
+        """Catch up with writes to known tasks before a read.
+
+        A stale index only asks ``FacetIndexBuilder`` for a rebuild; reads are
+        answered from it until the new one is swapped in.
+        """
+        if self.is_stale():
+            self.rebuild_wanted.set()
+        with self._lock:
+            task_ids = {task_id for task_id in self._changed if task_id != ALL}
+            self._changed -= task_ids
+        if not task_ids:
+            return
+        rows = db.execute(select(*_FACET_COLUMNS).where(model.Task.id.in_(task_ids))).all()
+        with self._lock:
+            for task_id in task_ids:
+                self.remove(task_id)
+            for row in rows:
+                self.add(row)
+
+    # Notifications from other processes, see task_cache.InvalidationListener
+
+    def receive(self, payload: str) -> None:
+        target = remote_target(payload)
+        if not self.ready or target is None:
+            return
+        if target == ALL:
+            self.clear()
+        elif target.isdigit():
+            with self._lock:
+                self._changed.add(int(target))
+
+    def clear(self) -> None:
+        """Rebuild in the background, answering from the current index until then"""
+        with self._lock:
+            self._changed.add(ALL)
+        self.rebuild_wanted.set()
+
+    def invalidate(self) -> None:
+        """This process changed tasks wholesale: answer from Postgres until a rebuild swaps in"""
+        with self._lock:
+            self.ready = False
+            self._invalidated = True
+            self._changed.add(ALL)
+        self.rebuild_wanted.set()
+
+    # Write path
+
+    def add(self, task: model.Task) -> None:
+        """Index a created or updated task"""
+        with self._lock:
+            if self._rebuilding:
+                # The rebuild's query may have run before this write
+                self._changed.add(task.id)
+            if not self.ready:
+                return
+            self.remove(task.id)
+            priority = _priority_value(task.priority)
+            tag_ids = list(task.tag_ids or [])
+            self._rows[task.id] = (task.status, priority, tag_ids, task.createdDate, task.dueDate)
+            self._all.add(task.id)
+            if task.status is not None:
+                self._by_status.setdefault(task.status, IdSet()).add(task.id)
+            self._by_priority.setdefault(priority, IdSet()).add(task.id)
+            for tag_id in tag_ids:
+                self._by_tag.setdefault(tag_id, IdSet()).add(task.id)
+            for field, value in (("createdDate", task.createdDate), ("dueDate", task.dueDate)):
+                if value is None:
+                    self._undated[field].add(task.id)
+                else:
+                    bisect.insort(self._sorted[field], (value, task.id))
+
+    def remove(self, task_id: int) -> None:
+        """Drop a task from the index"""
+        with self._lock:
+            if self._rebuilding:
+                self._changed.add(task_id)
+            if not self.ready:
+                return
+            row = self._rows.pop(task_id, None)
+            if row is None:
+                return
+            task_status, priority, tag_ids, created, due = row
+            self._all.discard(task_id)
+            if task_status is not None:
+                self._by_status[task_status].discard(task_id)
+            self._by_priority[priority].discard(task_id)
+            for tag_id in tag_ids:
+                self._by_tag[tag_id].discard(task_id)
+            for field, value in (("createdDate", created), ("dueDate", due)):
+                if value is None:
+                    self._undated[field].discard(task_id)
+                    continue
+                values = self._sorted[field]
+                position = bisect.bisect_left(values, (value, task_id))
+                if position < len(values) and values[position] == (value, task_id):
+                    del values[position]
+
+    # Read path
+
+    def _due_between(self, start: Optional[datetime], end: Optional[datetime], inclusive_end: bool = True) -> IdSet:
+        values = self._sorted["dueDate"]
+        low = 0 if start is None else bisect.bisect_left(values, (start,))
+        if end is None:
+            high = len(values)
+        elif inclusive_end:
+            high = bisect.bisect_left(values, (end, float("inf")))
+        else:
+            high = bisect.bisect_left(values, (end,))
+        return IdSet.from_ids(task_id for _, task_id in values[low:high])
+
+    def supports(self, filters: TaskFilterParams) -> bool:
+        """Whether the filters are pure facet filters the index can answer"""
+        return self.ready and not filters.search and filters.sort_by in SORTABLE_FIELDS
+
+    def lookup(self, db: Session, filters: TaskFilterParams) -> Tuple[List[int], int]:
+        """Ids of the requested page and the total number of matches"""
+        with self._lock:
+            matched = self.match(db, filters)
+            return self.page(matched, filters), self.count(matched)
+
+    def match(self, db: Session, filters: TaskFilterParams) -> IdSet:
+        """Ids of the tasks matching the facet filters.
+
+        Without filters this is the index's own set; read it under the lock,
+        as ``lookup`` does.
+        """
+        with self._lock:
+            ids = self._all
+            if filters.status:
+                ids = ids & self._union(self._by_status, filters.status)
+            if filters.priority:
+                ids = ids & self._union(self._by_priority, [_priority_value(p) for p in filters.priority])
+            if filters.tags:
+                ids = ids & self._union(self._by_tag, tag_dictionary.ids_for(db, filters.tags))
+            if filters.due_date_from or filters.due_date_to:
+                ids = ids & self._due_between(
+                    _as_datetime(filters.due_date_from) if filters.due_date_from else None,
+                    _as_datetime(filters.due_date_to) if filters.due_date_to else None,
+                )
+            if filters.overdue_only:
+                not_completed = self._union(
+                    self._by_status, [key for key in self._by_status if key != "completed"]
+                )
+                ids = ids & self._due_between(None, datetime.utcnow(), inclusive_end=False) & not_completed
+            if filters.completed_only:
+                ids = ids & self._by_status.get("completed", IdSet())
+            return ids
+
+    @staticmethod
+    def _union(sets: Dict, keys: Iterable) -> IdSet:
+        found = [sets[key] for key in keys if key in sets]
+        # Only ever intersected, which copies, so a single set need not be
+        return found[0] if len(found) == 1 else IdSet.union(found)
+
+    def page(self, ids: IdSet, filters: TaskFilterParams) -> List[int]:
+        """Ordered ids for the requested page of a match"""
+        offset = (filters.page - 1) * filters.page_size
+        wanted = offset + filters.page_size
+        descending = filters.sort_order == "desc"
+        with self._lock:
+            values = self._sorted[filters.sort_by]
+            # Postgres sorts NULLs first in descending and last in ascending order
+            undated = sorted(task_id for task_id in self._undated[filters.sort_by] if task_id in ids)
+            result = undated[:wanted] if descending else []
+            needed = wanted - len(result)
+            matched = len(ids)
+            # A scan stops after about needed * len(values) / matched dates, selecting costs matched
+            if needed > 0 and matched * matched < needed * len(values):
+                column = 3 if filters.sort_by == "createdDate" else 4
+                dated = [(self._rows[task_id][column], task_id) for task_id in ids
+                         if self._rows[task_id][column] is not None]
+                select_top = heapq.nlargest if descending else heapq.nsmallest
+                result.extend(task_id for _, task_id in select_top(needed, dated))
+            elif needed > 0:
+                for _, task_id in (reversed(values) if descending else values):
+                    if task_id in ids:
+                        result.append(task_id)
+                        if len(result) >= wanted:
+                            break
+            if not descending:
+                result.extend(undated[:wanted - len(result)])
+        return result[offset:wanted]
+
+    def count(self, ids: IdSet) -> int:
+        return len(ids)
+
+    def facet_counts(self) -> Dict[str, Dict]:
+        """Per-value counts for the filter sidebar"""
+        with self._lock:
+            counts = {}
+            for name, sets in (("statuses", self._by_status), ("priorities", self._by_priority),
+                               ("tags", self._by_tag)):
+                sizes = {key: len(ids) for key, ids in sets.items()}
+                counts[name] = {key: size for key, size in sizes.items() if size}
+            return counts
+
+
+class FacetIndexBuilder:
+    """Builds the facet index off the request path and rebuilds it when it goes stale"""
+
+    def __init__(self, index: FacetIndex, poll_interval: float = 5.0, retry_delay: float = 5.0):
+        self.index = index
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="task-facet-index", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.index.rebuild_wanted.set()
+
+    def _run(self) -> None:
+        from backend import db
+
+        while not self._stopped.is_set():
+            self.index.rebuild_wanted.clear()
+            if not self.index.ready or self.index.is_stale():
+                try:
+                    with db.SessionLocal() as session:
+                        self.index.rebuild(session)
+                except Exception as e:
+                    metrics.increment("tasks.facet_index.rebuild_errors")
+                    logger.warning("Facet index rebuild failed: %s", e)
+                    self._stopped.wait(self.retry_delay)
+                    continue
+            self.index.rebuild_wanted.wait(self.poll_interval)
+
+
+facet_index = FacetIndex()
+facet_index_builder = FacetIndexBuilder(facet_index)
@@ -9,6 +9,12 @@ class PriorityEnum(str, Enum):
     HIGH = "high"
     URGENT = "urgent"
 
+# Task fields that can be requested through sparse fieldsets
+TASK_FIELDS = (
+    "id", "title", "description", "status", "priority", "tags",
+    "createdDate", "dueDate", "completedDate", "seriesId", "occurrenceDate",
+)
+
 class TaskFilterParams(BaseModel):
     search: Optional[str] = Field(None, max_length=200)
     status: Optional[List[str]] = Field(None, min_items=1)
@@ -24,6 +30,7 @@ class TaskFilterParams(BaseModel):
     sort_order: str = Field("desc", regex="^(asc|desc)$")
     page: int = Field(1, ge=1)
     page_size: int = Field(20, ge=1, le=100)
+    fields: Optional[List[str]] = Field(None, min_items=1)
 
     @validator('due_date_to')
     def validate_date_range(cls, v, values):
@@ -39,5 +46,15 @@ class TaskFilterParams(BaseModel):
                 raise ValueError('End date cannot be before start date')
         return v
 
+    @validator('fields')
+    def validate_fields(cls, v):
+        if v:
+            unknown = [field for field in v if field not in TASK_FIELDS]
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+            # Always include the id, keep the requested order without duplicates
+            v = list(dict.fromkeys(["id", *v]))
+        return v
+
     class Config:
         orm_mode = True
\ No newline at end of file
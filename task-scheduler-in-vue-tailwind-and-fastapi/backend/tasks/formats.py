@@ -0,0 +1,189 @@
+"""Binary encodings of task lists for machine-to-machine clients
+
+The list and batch endpoints answer in JSON unless ``Accept`` prefers one of:
+
+- ``application/msgpack``: the JSON envelope (``totalCount``, ``missing``
+  and so on) plus ``columns``, the task field names, and ``rows``, one array
+  per task. Datetimes are MessagePack timestamps; naive values are encoded
+  as if they were UTC, so they decode to the same wall-clock time.
+- ``application/vnd.apache.arrow.stream``: one Arrow IPC record batch with a
+  column per task field; the envelope is in the schema metadata as JSON
+  values.
+
+The task listing and the filtered listing's SQL path encode their rows
+straight from the projected tuples, without pydantic models or JSON-ready
+dicts; batch results and pages answered from the facet index or merged with
+series occurrences are turned into tuples by ``task_tuples``. Both libraries are in requirements.txt; a format
+whose library is missing anyway is never chosen, so such requests get JSON.
+"""
+import calendar
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Dict, List, Optional, Sequence
+
+from fastapi.responses import Response
+from sqlalchemy.orm import Session
+
+from .statements import FIELD_COLUMNS
+from .tags import tag_dictionary
+
+try:
+    import msgpack
+except ImportError:  # optional; only needed for MessagePack responses
+    msgpack = None
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:  # optional; only needed for Arrow responses
+    pyarrow = None
+
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+
+# Accepted spellings of each binary format
+MEDIA_TYPES = {
+    MSGPACK: MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+    ARROW: ARROW,
+}
+
+WIRE_FIELDS = list(FIELD_COLUMNS)
+
+
+def available_formats() -> List[str]:
+    return [media_type for media_type, library in ((MSGPACK, msgpack), (ARROW, pyarrow)) if library is not None]
+
+
+def accepted_media_types(header: Optional[str]) -> Dict[str, float]:
+    """``Accept`` as a mapping of media type to q-value"""
+    accepted: Dict[str, float] = {}
+    for item in (header or "").split(","):
+        media_type, *params = item.strip().split(";")
+        if not media_type:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[media_type.strip().lower()] = q
+    return accepted
+
+
+def negotiate(header: Optional[str]) -> str:
+    """The binary format the client prefers over JSON, or JSON"""
+    accepted = accepted_media_types(header)
+    best, best_q = JSON, accepted.get(JSON, 0.0)
+    available = available_formats()
+    for name, q in accepted.items():
+        media_type = MEDIA_TYPES.get(name)
+        # Ties go to JSON and then to the first listed format
+        if media_type in available and q > best_q:
+            best, best_q = media_type, q
+    return best
+
+
+def wire_rows(rows: Sequence, columns: Sequence[str], db: Optional[Session]) -> List[tuple]:
+    """Projected rows as tuples of API values: priority names and tag names"""
+    priority_at = columns.index("priority") if "priority" in columns else None
+    tags_at = columns.index("tags") if "tags" in columns else None
+    if tags_at is None and priority_at is None:
+        return [tuple(row) for row in rows]
+    if tags_at is not None:
+        # One lookup for every tag on the page
+        tag_dictionary.names_by_id(db, list({tag_id for row in rows for tag_id in row[tags_at] or []}))
+    result = []
+    for row in rows:
+        values = list(row)
+        if priority_at is not None and values[priority_at] is not None:
+            values[priority_at] = getattr(values[priority_at], "value", values[priority_at])
+        if tags_at is not None:
+            values[tags_at] = tag_dictionary.names_for(None, values[tags_at] or [])
+        result.append(tuple(values))
+    return result
+
+
+def task_tuples(tasks: Sequence, columns: Sequence[str] = WIRE_FIELDS) -> List[tuple]:
+    """Loaded tasks, or sparse task dicts, as wire tuples"""
+    if tasks and isinstance(tasks[0], dict):
+        return [tuple(task.get(column) for column in columns) for task in tasks]
+    result = []
+    for task in tasks:
+        values = []
+        for column in columns:
+            value = getattr(task, column)
+            values.append(value.value if isinstance(value, Enum) else value)
+        result.append(tuple(values))
+    return result
+
+
+def _msgpack_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        seconds = calendar.timegm(value.utctimetuple())
+        return msgpack.Timestamp(seconds, value.microsecond * 1000)
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Cannot encode {type(value).__name__} as MessagePack")
+
+
+def encode_msgpack(envelope: Dict[str, Any], columns: Sequence[str], rows: List[tuple]) -> bytes:
+    return msgpack.packb({**envelope, "columns": list(columns), "rows": rows},
+                         default=_msgpack_default, use_bin_type=True)
+
+
+def _arrow_types() -> Dict[str, Any]:
+    return {
+        "id": pyarrow.int64(),
+        "title": pyarrow.string(),
+        "description": pyarrow.string(),
+        "status": pyarrow.string(),
+        "priority": pyarrow.dictionary(pyarrow.int32(), pyarrow.string()),
+        "tags": pyarrow.list_(pyarrow.string()),
+        "createdDate": pyarrow.timestamp("us"),
+        "dueDate": pyarrow.timestamp("us"),
+        "completedDate": pyarrow.timestamp("us"),
+        "seriesId": pyarrow.int64(),
+        "occurrenceDate": pyarrow.timestamp("us"),
+    }
+
+
+def encode_arrow(envelope: Dict[str, Any], columns: Sequence[str], rows: List[tuple]) -> bytes:
+    types = _arrow_types()
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    schema = pyarrow.schema([pyarrow.field(column, types[column]) for column in columns],
+                            metadata={key: json.dumps(value) for key, value in envelope.items()})
+    arrays = []
+    for column, column_values in zip(columns, values):
+        if pyarrow.types.is_dictionary(types[column]):
+            arrays.append(pyarrow.array(column_values, type=pyarrow.string()).dictionary_encode())
+        else:
+            arrays.append(pyarrow.array(column_values, type=types[column]))
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(pyarrow.record_batch(arrays, schema=schema))
+    return sink.getvalue().to_pybytes()
+
+
+ENCODERS = {MSGPACK: encode_msgpack, ARROW: encode_arrow}
+
+
+def binary_response(media_type: str, envelope: Dict[str, Any], columns: Sequence[str],
+                    rows: List[tuple]) -> Response:
+    return Response(content=ENCODERS[media_type](envelope, columns, rows), media_type=media_type,
+                    headers={"Vary": "Accept"})
+
+
+def tasks_response(media_type: str, result: Dict[str, Any], columns: Sequence[str] = WIRE_FIELDS) -> Response:
+    """A ``{"tasks": [...], ...}`` service result in a binary format"""
+    envelope = {key: value for key, value in result.items() if key != "tasks"}
+    return binary_response(media_type, envelope, columns, task_tuples(result["tasks"], columns))
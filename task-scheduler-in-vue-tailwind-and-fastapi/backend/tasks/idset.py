@@ -0,0 +1,197 @@
+"""Compressed sets of task ids for the facet index
+
+Ids are split into chunks of 2**16 by their high bits, as in Roaring
+bitmaps. A chunk holds a sorted ``array('H')`` of its low bits while it has
+at most ``ARRAY_MAX`` members and an 8 KiB bitmap once it is denser. A value
+held by a few tasks costs a few bytes wherever their ids fall, and a common
+value at most one bit per id in the chunks it touches.
+"""
+import bisect
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+CHUNK_BITS = 16
+LOW_MASK = (1 << CHUNK_BITS) - 1
+BITMAP_BYTES = (1 << CHUNK_BITS) // 8
+# Above this many members a bitmap is smaller than the array
+ARRAY_MAX = 4096
+
+Container = Union[array, bytearray]
+
+try:
+    _popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def _popcount(bits: int) -> int:
+        return bin(bits).count("1")
+
+# Bit positions set in each byte value
+_BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+
+def _bitmap_of(lows: Iterable[int]) -> bytearray:
+    bitmap = bytearray(BITMAP_BYTES)
+    for low in lows:
+        bitmap[low >> 3] |= 1 << (low & 7)
+    return bitmap
+
+
+def _lows_of(bitmap: bytearray) -> array:
+    lows = array("H")
+    for position, byte in enumerate(bitmap):
+        if byte:
+            lows.extend((position << 3) + bit for bit in _BYTE_BITS[byte])
+    return lows
+
+
+def _bit_count(bitmap: bytearray) -> int:
+    return _popcount(int.from_bytes(bitmap, "little"))
+
+
+def _from_bits(bits: int) -> Optional[Container]:
+    """A container for a chunk's bits as an integer; None when empty"""
+    if not bits:
+        return None
+    bitmap = bytearray(bits.to_bytes(BITMAP_BYTES, "little"))
+    return _lows_of(bitmap) if _popcount(bits) <= ARRAY_MAX else bitmap
+
+
+def _from_lows(lows: List[int]) -> Optional[Container]:
+    """A container for sorted, distinct low bits; None when empty"""
+    if not lows:
+        return None
+    return _bitmap_of(lows) if len(lows) > ARRAY_MAX else array("H", lows)
+
+
+def _contains(container: Container, low: int) -> bool:
+    if isinstance(container, array):
+        position = bisect.bisect_left(container, low)
+        return position < len(container) and container[position] == low
+    return bool(container[low >> 3] >> (low & 7) & 1)
+
+
+def _intersect(first: Container, second: Container) -> Optional[Container]:
+    if isinstance(first, bytearray) and isinstance(second, bytearray):
+        return _from_bits(int.from_bytes(first, "little") & int.from_bytes(second, "little"))
+    if isinstance(first, bytearray):
+        first, second = second, first
+    if isinstance(second, bytearray):
+        return _from_lows([low for low in first if second[low >> 3] >> (low & 7) & 1])
+    return _from_lows(sorted(set(first).intersection(second)))
+
+
+def _unite(first: Container, second: Container) -> Container:
+    if isinstance(first, bytearray) and isinstance(second, bytearray):
+        return _from_bits(int.from_bytes(first, "little") | int.from_bytes(second, "little"))
+    if isinstance(first, bytearray):
+        first, second = second, first
+    if isinstance(second, bytearray):
+        bitmap = bytearray(second)
+        for low in first:
+            bitmap[low >> 3] |= 1 << (low & 7)
+        return bitmap
+    return _from_lows(sorted(set(first).union(second)))
+
+
+def _copy(container: Container) -> Container:
+    return array("H", container) if isinstance(container, array) else bytearray(container)
+
+
+class IdSet:
+    """Set of non-negative task ids in compressed chunks.
+
+    ``&`` and ``|`` return new sets that share no containers with their
+    operands, so results stay valid while the index keeps changing.
+    """
+
+    __slots__ = ("_chunks",)
+
+    def __init__(self, chunks: Optional[Dict[int, Container]] = None):
+        self._chunks: Dict[int, Container] = chunks if chunks is not None else {}
+
+    @classmethod
+    def from_ids(cls, ids: Iterable[int]) -> "IdSet":
+        grouped: Dict[int, set] = {}
+        for task_id in ids:
+            grouped.setdefault(task_id >> CHUNK_BITS, set()).add(task_id & LOW_MASK)
+        return cls({key: _from_lows(sorted(lows)) for key, lows in grouped.items()})
+
+    @classmethod
+    def union(cls, sets: Iterable["IdSet"]) -> "IdSet":
+        result = cls()
+        for other in sets:
+            result = result | other
+        return result
+
+    def add(self, task_id: int) -> None:
+        key, low = task_id >> CHUNK_BITS, task_id & LOW_MASK
+        container = self._chunks.get(key)
+        if container is None:
+            self._chunks[key] = array("H", (low,))
+        elif isinstance(container, bytearray):
+            container[low >> 3] |= 1 << (low & 7)
+        else:
+            position = bisect.bisect_left(container, low)
+            if position == len(container) or container[position] != low:
+                container.insert(position, low)
+                if len(container) > ARRAY_MAX:
+                    self._chunks[key] = _bitmap_of(container)
+
+    def discard(self, task_id: int) -> None:
+        """Remove ``task_id``; a bitmap chunk stays a bitmap until it is empty"""
+        key, low = task_id >> CHUNK_BITS, task_id & LOW_MASK
+        container = self._chunks.get(key)
+        if container is None:
+            return
+        if isinstance(container, bytearray):
+            container[low >> 3] &= ~(1 << (low & 7)) & 0xFF
+            if not container[low >> 3] and not any(container):
+                del self._chunks[key]
+            return
+        position = bisect.bisect_left(container, low)
+        if position < len(container) and container[position] == low:
+            del container[position]
+            if not container:
+                del self._chunks[key]
+
+    def __contains__(self, task_id: int) -> bool:
+        container = self._chunks.get(task_id >> CHUNK_BITS)
+        return container is not None and _contains(container, task_id & LOW_MASK)
+
+    def __len__(self) -> int:
+        return sum(len(container) if isinstance(container, array) else _bit_count(container)
+                   for container in self._chunks.values())
+
+    def __bool__(self) -> bool:
+        return bool(self._chunks)
+
+    def __iter__(self) -> Iterator[int]:
+        for key in sorted(self._chunks):
+            container = self._chunks[key]
+            base = key << CHUNK_BITS
+            for low in (container if isinstance(container, array) else _lows_of(container)):
+                yield base | low
+
+    def __and__(self, other: "IdSet") -> "IdSet":
+        chunks = {}
+        for key in self._chunks.keys() & other._chunks.keys():
+            container = _intersect(self._chunks[key], other._chunks[key])
+            if container is not None:
+                chunks[key] = container
+        return IdSet(chunks)
+
+    def __or__(self, other: "IdSet") -> "IdSet":
+        chunks = {key: _copy(container) for key, container in self._chunks.items()}
+        for key, container in other._chunks.items():
+            chunks[key] = _unite(chunks[key], container) if key in chunks else _copy(container)
+        return IdSet(chunks)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, IdSet) and list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return f"IdSet({list(self)!r})"
+
+    def nbytes(self) -> int:
+        """Container bytes, for comparing layouts"""
+        return sum(len(container) * container.itemsize if isinstance(container, array) else len(container)
+                   for container in self._chunks.values())
@@ -0,0 +1,91 @@
+import asyncio
+import os
+from typing import Dict, List, Optional
+
+from sqlalchemy import Integer, any_, bindparam, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from backend import db as database
+from backend.metrics import metrics
+from . import model
+from .tags import tag_dictionary
+
+
+LOOKUP_COALESCING_ENABLED = os.getenv("TASK_LOOKUP_COALESCING", "true").lower() in ("1", "true", "yes")
+
+_COLUMNS = [attribute.key for attribute in model.Task.__mapper__.column_attrs]
+
+_tasks_by_ids = select(model.Task).where(model.Task.id == any_(bindparam("ids", type_=ARRAY(Integer))))
+
+
+def fetch_tasks(ids: List[int], db: Session) -> Dict[int, model.Task]:
+    """Load tasks with a single ``id = ANY(:ids)`` query"""
+    if not ids:
+        return {}
+    tasks = {task.id: task for task in db.execute(_tasks_by_ids, {"ids": list(ids)}).scalars()}
+    # Resolve tag names now so serialization does not depend on this session
+    tag_dictionary.names_by_id(db, list({tag_id for task in tasks.values() for tag_id in task.tag_ids or []}))
+    return tasks
+
+
+def detached_copy(task: model.Task) -> model.Task:
+    """A transient copy of the task's columns, independent of any session"""
+    return model.Task(**{key: list(value) if isinstance(value, list) else value
+                         for key, value in ((key, getattr(task, key)) for key in _COLUMNS)})
+
+
+def _fetch_detached(ids: List[int]) -> Dict[int, model.Task]:
+    # Lookups come from several requests, so none of their sessions is used
+    with database.request_session() as session:
+        return {task_id: detached_copy(task) for task_id, task in fetch_tasks(ids, session).items()}
+
+
+class TaskLoader:
+    """Coalesces single-task lookups issued in the same event-loop tick.
+
+    The first ``load()`` in a tick schedules a dispatch with ``call_soon``;
+    every lookup queued before it runs is answered by one batch query, run
+    in the threadpool on a session of its own. Each caller gets its own
+    detached copy of the task.
+    """
+
+    def __init__(self):
+        self._pending: Dict[int, List[asyncio.Future]] = {}
+
+    async def load(self, task_id: int, db: Session) -> Optional[model.Task]:
+        if not LOOKUP_COALESCING_ENABLED:
+            return fetch_tasks([task_id], db).get(task_id)
+
+        future = asyncio.get_running_loop().create_future()
+        if not self._pending:
+            asyncio.get_running_loop().call_soon(self._dispatch)
+        self._pending.setdefault(task_id, []).append(future)
+        return await future
+
+    def _dispatch(self) -> None:
+        pending, self._pending = self._pending, {}
+
+        waiters = sum(len(futures) for futures in pending.values())
+        metrics.increment("tasks.loader.batches")
+        metrics.increment("tasks.loader.lookups", waiters)
+        asyncio.ensure_future(self._resolve(pending))
+
+    async def _resolve(self, pending: Dict[int, List[asyncio.Future]]) -> None:
+        try:
+            tasks = await run_in_threadpool(_fetch_detached, list(pending))
+        except Exception as e:
+            for futures in pending.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        for task_id, futures in pending.items():
+            task = tasks.get(task_id)
+            for future in futures:
+                if not future.done():
+                    future.set_result(task and detached_copy(task))
+
+
+task_loader = TaskLoader()
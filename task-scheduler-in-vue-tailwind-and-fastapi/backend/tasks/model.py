@@ -1,6 +1,8 @@
 from datetime import datetime
-from sqlalchemy import Column, String, Text, DateTime, Integer, Enum
+from typing import List
+from sqlalchemy import BigInteger, Column, String, Text, Date, DateTime, Float, Integer, Enum, ForeignKey
 from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import object_session
 from enum import Enum as PyEnum
 
 
@@ -14,6 +16,17 @@ class PriorityEnum(PyEnum):
     URGENT = "urgent"
 
 
+class Tag(Base):
+    __tablename__ = "tag"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(50), nullable=False, unique=True)
+
+    def __repr__(self):
+        """Representation of Tag"""
+        return f"<Tag(id={self.id}, name='{self.name}')>"
+
+
 class Task(Base):
     __tablename__ = "task"
 
@@ -24,8 +37,17 @@ class Task(Base):
     description = Column(Text)
     status = Column(String(50))
     priority = Column(Enum(PriorityEnum), nullable=False, default=PriorityEnum.MEDIUM)
-    tags = Column(ARRAY(String), nullable=True, default=[])
+    tag_ids = Column(ARRAY(Integer), nullable=True, default=[])
     completedDate = Column("completeddate", DateTime, nullable=True)
+    # Set on occurrences of a series that were edited or completed
+    seriesId = Column("series_id", Integer, ForeignKey("task_series.id", ondelete="SET NULL"), nullable=True)
+    occurrenceDate = Column("occurrence_date", DateTime, nullable=True)
+
+    @property
+    def tags(self) -> List[str]:
+        """Tag names resolved from the interned tag ids"""
+        from .tags import tag_dictionary
+        return tag_dictionary.names_for(object_session(self), self.tag_ids or [])
 
     @property
     def is_overdue(self) -> bool:
@@ -50,3 +72,64 @@ class Task(Base):
     def __repr__(self):
         """Representation of Task"""
         return f"<Task(id={self.id}, title='{self.title}', status='{self.status}', priority='{self.priority.value}')>"
+
+
+class TaskSeries(Base):
+    """A repeating task; occurrences are expanded from ``rrule`` when read"""
+    __tablename__ = "task_series"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    createdDate = Column(DateTime, default=datetime.now)
+    title = Column(String(50))
+    description = Column(Text)
+    status = Column(String(50))
+    priority = Column(Enum(PriorityEnum), nullable=False, default=PriorityEnum.MEDIUM)
+    tag_ids = Column(ARRAY(Integer), nullable=True, default=[])
+    rrule = Column(String(255), nullable=False)
+    dtstart = Column(DateTime, nullable=False)
+    # Last occurrence, or NULL for a series without COUNT or UNTIL
+    until = Column(DateTime, nullable=True)
+
+    @property
+    def tags(self) -> List[str]:
+        from .tags import tag_dictionary
+        return tag_dictionary.names_for(object_session(self), self.tag_ids or [])
+
+    def __repr__(self):
+        """Representation of TaskSeries"""
+        return f"<TaskSeries(id={self.id}, title='{self.title}', rrule='{self.rrule}')>"
+
+
+class TaskDailyStats(Base):
+    """Per-day task counters by status, priority and tag; see backend/tasks/rollups.py"""
+    __tablename__ = "task_daily_stats"
+
+    dimension = Column(String(16), primary_key=True)
+    day = Column(Date, primary_key=True)
+    value = Column(String(50), primary_key=True)
+    created = Column(Integer, nullable=False, default=0, server_default="0")
+    completed = Column(Integer, nullable=False, default=0, server_default="0")
+    completion_seconds = Column(Float, nullable=False, default=0.0, server_default="0")
+    open_due = Column(Integer, nullable=False, default=0, server_default="0")
+
+    def __repr__(self):
+        """Representation of TaskDailyStats"""
+        return f"<TaskDailyStats(day={self.day}, {self.dimension}='{self.value}')>"
+
+
+class TaskDailyStatsDelta(Base):
+    """Rollup changes appended by task writes until they are folded into task_daily_stats"""
+    __tablename__ = "task_daily_stats_delta"
+
+    id = Column(BigInteger, primary_key=True)
+    dimension = Column(String(16), nullable=False)
+    day = Column(Date, nullable=False)
+    value = Column(String(50), nullable=False)
+    created = Column(Integer, nullable=False, default=0, server_default="0")
+    completed = Column(Integer, nullable=False, default=0, server_default="0")
+    completion_seconds = Column(Float, nullable=False, default=0.0, server_default="0")
+    open_due = Column(Integer, nullable=False, default=0, server_default="0")
+
+    def __repr__(self):
+        """Representation of TaskDailyStatsDelta"""
+        return f"<TaskDailyStatsDelta(id={self.id}, day={self.day}, {self.dimension}='{self.value}')>"
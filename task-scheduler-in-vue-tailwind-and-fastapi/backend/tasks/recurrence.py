@@ -0,0 +1,362 @@
+"""Recurring tasks expanded on read
+
+A ``TaskSeries`` stores an RFC 5545 RRULE instead of one row per occurrence.
+Listings and calendars with a due-date window expand the series that overlap
+the window into unsaved ``Occurrence`` objects. Only an occurrence that is
+edited or completed becomes a ``task`` row, linked back through ``seriesId``
+and ``occurrenceDate``; that row then replaces the expanded occurrence.
+
+The supported RRULE subset covers what the client offers: FREQ (DAILY,
+WEEKLY, MONTHLY, YEARLY), INTERVAL, COUNT, UNTIL, plain BYDAY for weekly
+rules and BYMONTHDAY for monthly rules.
+"""
+import calendar
+import os
+import threading
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, or_, select, text
+from sqlalchemy.orm import Session
+
+from backend.metrics import metrics
+from . import model
+from .filter_schema import TaskFilterParams
+from .statements import filter_conditions, filter_params, filter_shape
+from .tags import tag_dictionary
+
+
+# Upper bound on occurrences expanded for one request
+RECURRENCE_MAX_OCCURRENCES = int(os.getenv("TASK_RECURRENCE_MAX_OCCURRENCES", "5000"))
+# Deepest row a listing merged with occurrences pages to; every row before the page is read
+RECURRENCE_MAX_LISTING_DEPTH = int(os.getenv("TASK_RECURRENCE_MAX_LISTING_DEPTH", "2000"))
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+RULE_PARTS = ("FREQ", "INTERVAL", "COUNT", "UNTIL", "BYDAY", "BYMONTHDAY", "WKST")
+
+# Filters that apply to a series as a whole; due dates apply per occurrence
+SERIES_FILTER_FIELDS = ("search", "status", "priority", "tags", "overdue_only", "completed_only")
+
+# Stops a rule that can never produce another occurrence from looping forever
+_MAX_PERIODS = 100_000
+
+
+class RecurrenceRule(NamedTuple):
+    freq: str
+    interval: int = 1
+    count: Optional[int] = None
+    until: Optional[datetime] = None
+    by_day: Tuple[int, ...] = ()
+    by_month_day: Tuple[int, ...] = ()
+
+
+def _parse_until(value: str) -> datetime:
+    value = value.rstrip("Z")
+    for layout in ("%Y%m%dT%H%M%S", "%Y%m%d"):
+        try:
+            parsed = datetime.strptime(value, layout)
+        except ValueError:
+            continue
+        # A date-only UNTIL includes occurrences on that day
+        return parsed if "T" in value else datetime.combine(parsed.date(), time.max)
+    raise ValueError(f"Invalid UNTIL: {value}")
+
+
+def _positive_int(name: str, value: str) -> int:
+    if not value.isdigit() or int(value) < 1:
+        raise ValueError(f"{name} must be a positive integer")
+    return int(value)
+
+
+def parse_rrule(rule: str) -> RecurrenceRule:
+    """Parse an RRULE value such as ``FREQ=WEEKLY;BYDAY=MO,TH``; raises ValueError"""
+    rule = rule.strip()
+    if rule.upper().startswith("RRULE:"):
+        rule = rule[len("RRULE:"):]
+    parts: Dict[str, str] = {}
+    for part in filter(None, rule.upper().split(";")):
+        name, _, value = part.partition("=")
+        if name not in RULE_PARTS:
+            raise ValueError(f"Unsupported RRULE part: {name}")
+        if not value:
+            raise ValueError(f"Missing value for {name}")
+        parts[name] = value
+
+    freq = parts.get("FREQ")
+    if freq not in FREQUENCIES:
+        raise ValueError(f"FREQ must be one of: {', '.join(FREQUENCIES)}")
+    if "COUNT" in parts and "UNTIL" in parts:
+        raise ValueError("COUNT and UNTIL cannot be combined")
+    if parts.get("WKST", "MO") != "MO":
+        raise ValueError("Only WKST=MO is supported")
+
+    by_day: Tuple[int, ...] = ()
+    if "BYDAY" in parts:
+        if freq != "WEEKLY":
+            raise ValueError("BYDAY is only supported for weekly rules")
+        days = parts["BYDAY"].split(",")
+        unknown = [day for day in days if day not in WEEKDAYS]
+        if unknown:
+            raise ValueError(f"Unsupported BYDAY values: {', '.join(unknown)}")
+        by_day = tuple(sorted({WEEKDAYS.index(day) for day in days}))
+
+    by_month_day: Tuple[int, ...] = ()
+    if "BYMONTHDAY" in parts:
+        if freq != "MONTHLY":
+            raise ValueError("BYMONTHDAY is only supported for monthly rules")
+        try:
+            by_month_day = tuple(sorted({int(day) for day in parts["BYMONTHDAY"].split(",")}))
+        except ValueError:
+            raise ValueError("BYMONTHDAY must be a list of integers")
+        if any(day == 0 or not -31 <= day <= 31 for day in by_month_day):
+            raise ValueError("BYMONTHDAY values must be between -31 and 31, excluding 0")
+
+    return RecurrenceRule(
+        freq=freq,
+        interval=_positive_int("INTERVAL", parts["INTERVAL"]) if "INTERVAL" in parts else 1,
+        count=_positive_int("COUNT", parts["COUNT"]) if "COUNT" in parts else None,
+        until=_parse_until(parts["UNTIL"]) if "UNTIL" in parts else None,
+        by_day=by_day,
+        by_month_day=by_month_day,
+    )
+
+
+def _period_start(rule: RecurrenceRule, dtstart: datetime, index: int) -> datetime:
+    """Start of the ``index``-th period; carries the time of day of ``dtstart``"""
+    step = index * rule.interval
+    if rule.freq == "DAILY":
+        return dtstart + timedelta(days=step)
+    if rule.freq == "WEEKLY":
+        return dtstart - timedelta(days=dtstart.weekday()) + timedelta(weeks=step)
+    if rule.freq == "MONTHLY":
+        month = dtstart.month - 1 + step
+        return dtstart.replace(year=dtstart.year + month // 12, month=month % 12 + 1, day=1)
+    return dtstart.replace(year=dtstart.year + step, month=1, day=1)
+
+
+def _period_index(rule: RecurrenceRule, dtstart: datetime, moment: datetime) -> int:
+    """Index of the period containing ``moment``, used to skip ahead in unbounded rules"""
+    if rule.freq == "DAILY":
+        periods = (moment.date() - dtstart.date()).days
+    elif rule.freq == "WEEKLY":
+        periods = (moment.date() - dtstart.date() + timedelta(days=dtstart.weekday())).days // 7
+    elif rule.freq == "MONTHLY":
+        periods = (moment.year - dtstart.year) * 12 + moment.month - dtstart.month
+    else:
+        periods = moment.year - dtstart.year
+    return max(0, periods // rule.interval)
+
+
+def _candidates(rule: RecurrenceRule, dtstart: datetime, period: datetime) -> List[datetime]:
+    """Occurrences inside one period, in order; days a month does not have are skipped"""
+    if rule.freq == "DAILY":
+        return [period]
+    if rule.freq == "WEEKLY":
+        return [period + timedelta(days=day) for day in rule.by_day or (dtstart.weekday(),)]
+    if rule.freq == "MONTHLY":
+        last_day = calendar.monthrange(period.year, period.month)[1]
+        days = sorted({day if day > 0 else last_day + 1 + day for day in rule.by_month_day or (dtstart.day,)})
+        return [period.replace(day=day) for day in days if 1 <= day <= last_day]
+    if dtstart.month == 2 and dtstart.day == 29 and not calendar.isleap(period.year):
+        return []
+    return [period.replace(month=dtstart.month, day=dtstart.day)]
+
+
+def occurrences(rule: RecurrenceRule, dtstart: datetime,
+                start: Optional[datetime] = None, end: Optional[datetime] = None) -> Iterator[datetime]:
+    """Occurrences of ``rule`` between ``start`` and ``end`` (inclusive), in order.
+
+    Without COUNT, expansion jumps straight to the period containing
+    ``start``; with COUNT it has to walk from ``dtstart`` to know which
+    occurrences are still within the count.
+    """
+    first = 0 if rule.count is not None or start is None else _period_index(rule, dtstart, start)
+    seen = 0
+    for index in range(first, first + _MAX_PERIODS):
+        period = _period_start(rule, dtstart, index)
+        if (end is not None and period > end) or (rule.until is not None and period > rule.until):
+            return
+        for occurrence in _candidates(rule, dtstart, period):
+            if occurrence < dtstart:
+                continue
+            if rule.until is not None and occurrence > rule.until:
+                return
+            if rule.count is not None:
+                if seen == rule.count:
+                    return
+                seen += 1
+            if end is not None and occurrence > end:
+                return
+            if start is None or occurrence >= start:
+                yield occurrence
+
+
+def series_until(rule: RecurrenceRule, dtstart: datetime) -> Optional[datetime]:
+    """Last occurrence of a bounded rule, or None when the series never ends"""
+    if rule.count is None and rule.until is None:
+        return None
+    last = None
+    for last in occurrences(rule, dtstart):
+        pass
+    return last
+
+
+def is_occurrence(rule: RecurrenceRule, dtstart: datetime, moment: datetime) -> bool:
+    return next(occurrences(rule, dtstart, moment, moment), None) == moment
+
+
+class Occurrence:
+    """An expanded, unsaved occurrence; serializes like a task without an id"""
+
+    id = None
+    completedDate = None
+
+    def __init__(self, series: model.TaskSeries, due: datetime, tags: List[str]):
+        self.seriesId = series.id
+        self.occurrenceDate = due
+        self.dueDate = due
+        self.createdDate = series.createdDate
+        self.title = series.title
+        self.description = series.description
+        self.status = series.status
+        self.priority = getattr(series.priority, "value", series.priority)
+        self.tag_ids = list(series.tag_ids or [])
+        self.tags = tags
+
+    def materialize(self) -> model.Task:
+        """The ``task`` row that takes over this occurrence once it is edited"""
+        return model.Task(
+            title=self.title, description=self.description, status=self.status,
+            priority=model.PriorityEnum(self.priority), tag_ids=self.tag_ids,
+            createdDate=datetime.now(), dueDate=self.dueDate,
+            seriesId=self.seriesId, occurrenceDate=self.occurrenceDate,
+        )
+
+
+_statements: Dict[Tuple[str, ...], Any] = {}
+_statements_lock = threading.Lock()
+
+
+def series_statement(shape: Tuple[str, ...]):
+    """Series matching a filter shape that may have occurrences in the window"""
+    statement = _statements.get(shape)
+    if statement is not None:
+        return statement
+    conditions = filter_conditions(tuple(field for field in shape if field != "overdue_only"), model.TaskSeries)
+    if "overdue_only" in shape:
+        # Whether each occurrence is overdue is decided by its due date
+        conditions.append(model.TaskSeries.status != 'completed')
+    statement = select(model.TaskSeries).where(
+        model.TaskSeries.dtstart <= bindparam("window_end"),
+        or_(model.TaskSeries.until.is_(None), model.TaskSeries.until >= bindparam("window_start")),
+        *conditions
+    ).order_by(model.TaskSeries.id)
+    with _statements_lock:
+        return _statements.setdefault(shape, statement)
+
+
+_materialized = select(model.Task.seriesId, model.Task.occurrenceDate).where(
+    model.Task.seriesId.in_(bindparam("series_ids", expanding=True)),
+    model.Task.occurrenceDate.between(bindparam("window_start"), bindparam("window_end")),
+)
+
+
+def listing_window(filters: TaskFilterParams) -> Optional[Tuple[datetime, datetime]]:
+    """Window to expand series into for a listing; unbounded listings show no occurrences"""
+    if not filters.due_date_to:
+        return None
+    # Same bounds as the SQL filter, which compares timestamps to midnight
+    start = datetime.combine(filters.due_date_from or date.min, time())
+    return start, datetime.combine(filters.due_date_to, time())
+
+
+def expand_occurrences(filters: TaskFilterParams, window_start: datetime, window_end: datetime,
+                       db: Session) -> List[Occurrence]:
+    """Occurrences matching ``filters`` in the window that have no ``task`` row yet"""
+    return expand_window(filters, window_start, window_end, db)[0]
+
+
+def expand_window(filters: TaskFilterParams, window_start: datetime, window_end: datetime,
+                  db: Session) -> Tuple[List[Occurrence], bool]:
+    """``expand_occurrences``, and whether ``RECURRENCE_MAX_OCCURRENCES`` cut it short"""
+    shape = tuple(field for field in filter_shape(filters) if field in SERIES_FILTER_FIELDS)
+    if filters.overdue_only:
+        window_end = min(window_end, datetime.utcnow() - timedelta(microseconds=1))
+    if window_end < window_start:
+        return [], False
+
+    params = {**filter_params(filters, db), "window_start": window_start, "window_end": window_end}
+    series_rows = db.execute(series_statement(shape), params).scalars().all()
+    if not series_rows:
+        return [], False
+
+    materialized = set(db.execute(_materialized, {
+        "series_ids": [series.id for series in series_rows],
+        "window_start": window_start,
+        "window_end": window_end,
+    }).all())
+
+    expanded: List[Occurrence] = []
+    for series in series_rows:
+        tags = tag_dictionary.names_for(db, series.tag_ids or [])
+        for due in occurrences(parse_rrule(series.rrule), series.dtstart, window_start, window_end):
+            if (series.id, due) in materialized:
+                continue
+            if len(expanded) == RECURRENCE_MAX_OCCURRENCES:
+                metrics.increment("tasks.recurrence.truncated")
+                return expanded, True
+            expanded.append(Occurrence(series, due, tags))
+    metrics.increment("tasks.recurrence.expanded", len(expanded))
+    return expanded, False
+
+
+_PRIORITY_ORDER = [priority.value for priority in model.PriorityEnum]
+
+# String sorts, which must follow the database collation rather than Python's code point order
+COLLATED_SORTS = ("title", "status")
+
+
+def sort_field(item, sort_by: str):
+    return item[sort_by] if isinstance(item, dict) else getattr(item, sort_by)
+
+
+def collation_ranks(db: Session, values: Sequence[Optional[str]]) -> Dict[str, int]:
+    """Position of each distinct string when Postgres sorts them"""
+    distinct = sorted({value for value in values if value is not None})
+    if not distinct:
+        return {}
+    ordered = db.execute(
+        text("SELECT value FROM unnest(CAST(:values AS varchar[])) AS v(value) ORDER BY value"),
+        {"values": distinct},
+    ).scalars().all()
+    return {value: rank for rank, value in enumerate(ordered)}
+
+
+def _sort_value(item, sort_by: str, ranks: Optional[Dict[str, int]]):
+    value = sort_field(item, sort_by)
+    if sort_by == "priority" and value is not None:
+        value = _PRIORITY_ORDER.index(getattr(value, "value", value))
+    elif ranks is not None and value is not None:
+        value = ranks[value]
+    # Postgres puts NULLs last ascending and first descending
+    return (1,) if value is None else (0, value)
+
+
+def merge_sorted(tasks: Sequence, expanded: Sequence, sort_by: str, sort_order: str,
+                 ranks: Optional[Dict[str, int]] = None) -> List:
+    """Merge expanded occurrences into tasks already in the listing's sort order
+
+    String sorts need ``ranks`` from ``collation_ranks`` for every value.
+    """
+    return sorted([*tasks, *expanded], key=lambda item: _sort_value(item, sort_by, ranks),
+                  reverse=sort_order == "desc")
+
+
+def sparse_occurrence(occurrence: Occurrence, fields: Sequence[str]) -> Dict[str, Any]:
+    """Requested fields, plus what the client needs to edit an occurrence without an id"""
+    return {
+        **{field: getattr(occurrence, field) for field in fields},
+        "seriesId": occurrence.seriesId,
+        "occurrenceDate": occurrence.occurrenceDate,
+    }
@@ -0,0 +1,333 @@
+"""Daily task analytics rollups behind ``GET /tasks/stats``
+
+``task_daily_stats`` holds one row per day and dimension value (``status``,
+``priority`` or ``tag``) with:
+
+- ``created``: tasks created that day
+- ``completed``: tasks completed that day, and ``completion_seconds`` the
+  sum of their ``completedDate - createdDate``
+- ``open_due``: open tasks due that day; days before today count as overdue
+
+The rollups are opt-in (``TASK_ROLLUPS``). Every write path then appends the
+difference between a task's contributions before and after the write to
+``task_daily_stats_delta``, inside the write's own transaction. Plain inserts
+never wait on each other, so concurrent writes touching the same day and
+status do not queue behind one hot row. A background thread in every worker
+folds the delta rows into ``task_daily_stats`` every
+``TASK_ROLLUP_FOLD_INTERVAL`` seconds; stats read both tables, so they are
+exact between folds.
+
+Run ``python -m backend.tasks.rollups`` nightly: it recomputes the rollups
+from ``task`` and corrects any drift, for example from rows changed outside
+the API. Stats are read from the rollups only, so their cost depends on the
+range and the number of dimension values, not on the number of tasks.
+"""
+import logging
+import os
+import threading
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import Date, and_, bindparam, case, cast, column, func, insert, select, table, text, union_all
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from backend.metrics import metrics
+from . import model
+from .tags import tag_dictionary
+
+
+logger = logging.getLogger(__name__)
+
+ROLLUPS_ENABLED = os.getenv("TASK_ROLLUPS", "false").lower() in ("1", "true", "yes")
+ROLLUP_FOLD_INTERVAL = float(os.getenv("TASK_ROLLUP_FOLD_INTERVAL", "60"))
+
+GROUP_BY = ("none", "status", "priority", "tag")
+STATS_BUCKETS = ("day", "week", "month")
+STATS_MAX_DAYS = 5 * 366
+
+KEY_COLUMNS = ("dimension", "day", "value")
+COUNTERS = ("created", "completed", "completion_seconds", "open_due")
+
+Key = Tuple[date, str, str]
+
+
+class TaskFacts(NamedTuple):
+    """The task columns the rollups depend on"""
+    createdDate: Optional[datetime]
+    completedDate: Optional[datetime]
+    dueDate: Optional[datetime]
+    status: Optional[str]
+    priority: Any
+    tag_ids: Optional[List[int]]
+
+
+# Labelled, so rows from select() and RETURNING read like tasks
+FACT_COLUMNS = [getattr(model.Task, name).label(name) for name in TaskFacts._fields]
+
+
+def task_facts(task) -> Optional[TaskFacts]:
+    """Rollup-relevant values of a task or a row selected with ``FACT_COLUMNS``"""
+    if task is None:
+        return None
+    return TaskFacts(*(getattr(task, name) for name in TaskFacts._fields))
+
+
+def contributions(facts: Optional[TaskFacts]) -> Dict[Key, List[float]]:
+    """What one task adds to each rollup row"""
+    result: Dict[Key, List[float]] = defaultdict(lambda: [0, 0, 0.0, 0])
+    if facts is None:
+        return result
+    # Column default for tasks that have not been flushed yet
+    priority = facts.priority or model.PriorityEnum.MEDIUM
+    values = [("status", facts.status or ""), ("priority", getattr(priority, "value", priority)),
+              *(("tag", str(tag_id)) for tag_id in sorted(set(facts.tag_ids or [])))]
+    for dimension, value in values:
+        if facts.createdDate is not None:
+            result[(facts.createdDate.date(), dimension, value)][0] += 1
+        if facts.completedDate is not None:
+            counters = result[(facts.completedDate.date(), dimension, value)]
+            counters[1] += 1
+            if facts.createdDate is not None:
+                counters[2] += max((facts.completedDate - facts.createdDate).total_seconds(), 0.0)
+        if facts.dueDate is not None and facts.status != "completed":
+            result[(facts.dueDate.date(), dimension, value)][3] += 1
+    return result
+
+
+def changes(pairs: Iterable[Tuple[Optional[TaskFacts], Optional[TaskFacts]]]) -> Dict[Key, List[float]]:
+    """Net rollup change of ``(before, after)`` task pairs; None means absent"""
+    total: Dict[Key, List[float]] = defaultdict(lambda: [0, 0, 0.0, 0])
+    for before, after in pairs:
+        for sign, facts in ((1, after), (-1, before)):
+            for key, counters in contributions(facts).items():
+                entry = total[key]
+                for i, value in enumerate(counters):
+                    entry[i] += sign * value
+    return {key: counters for key, counters in total.items() if any(counters)}
+
+
+def append_changes(db: Session, delta: Dict[Key, List[float]]) -> None:
+    """Append ``delta`` to the delta table with one insert in the session's transaction"""
+    if not delta:
+        return
+    db.execute(insert(model.TaskDailyStatsDelta.__table__).values([
+        {"day": day, "dimension": dimension, "value": value, **dict(zip(COUNTERS, counters))}
+        for (day, dimension, value), counters in delta.items()
+    ]))
+
+
+def record_task_changes(db: Session, pairs: Iterable[Tuple[Optional[TaskFacts], Optional[TaskFacts]]]) -> None:
+    if ROLLUPS_ENABLED:
+        append_changes(db, changes(pairs))
+
+
+def fold_statement():
+    """Moves every visible delta row into ``task_daily_stats`` in one statement"""
+    stats, deltas = model.TaskDailyStats.__table__, model.TaskDailyStatsDelta.__table__
+    moved = deltas.delete().returning(*(deltas.c[name] for name in KEY_COLUMNS + COUNTERS)).cte("moved")
+    keys = [moved.c[name] for name in KEY_COLUMNS]
+    summed = (
+        select(*keys, *(func.sum(moved.c[name]).label(name) for name in COUNTERS))
+        .group_by(*keys)
+        .order_by(*keys)
+    )
+    statement = postgresql.insert(stats).from_select([*KEY_COLUMNS, *COUNTERS], summed)
+    return statement.on_conflict_do_update(
+        index_elements=[stats.c[name] for name in KEY_COLUMNS],
+        set_={name: stats.c[name] + statement.excluded[name] for name in COUNTERS},
+    )
+
+
+# Only folds and reconciliation write task_daily_stats; this lock keeps them apart
+# without blocking readers or the writers appending deltas
+_LOCK_ROLLUPS = "LOCK TABLE task_daily_stats IN SHARE ROW EXCLUSIVE MODE"
+
+
+def fold(db: Session) -> Optional[int]:
+    """Fold the pending deltas; the number of rollup rows changed, or None while another fold runs"""
+    try:
+        db.execute(text(_LOCK_ROLLUPS + " NOWAIT"))
+    except OperationalError:
+        db.rollback()
+        return None
+    folded = db.execute(fold_statement()).rowcount
+    db.commit()
+    return folded
+
+
+class RollupFolder:
+    """Folds the delta table into the rollups every ``interval`` seconds"""
+
+    def __init__(self, interval: float = ROLLUP_FOLD_INTERVAL):
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="task-rollup-folder", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def _run(self) -> None:
+        from backend import db
+
+        while not self._stopped.wait(self.interval):
+            try:
+                with db.SessionLocal() as session:
+                    folded = fold(session)
+            except Exception as e:
+                metrics.increment("tasks.rollups.fold_errors")
+                logger.warning("Task rollup fold failed: %s", e)
+                continue
+            if folded is not None:
+                metrics.increment("tasks.rollups.folded_rows", folded)
+
+
+rollup_folder = RollupFolder()
+
+
+def validate_stats_range(start: date, end: date, bucket: str, group_by: str) -> None:
+    if bucket not in STATS_BUCKETS:
+        raise ValueError(f"bucket must be one of: {', '.join(STATS_BUCKETS)}")
+    if group_by not in GROUP_BY:
+        raise ValueError(f"group_by must be one of: {', '.join(GROUP_BY)}")
+    if end < start:
+        raise ValueError("End date cannot be before start date")
+    if (end - start).days + 1 > STATS_MAX_DAYS:
+        raise ValueError(f"Range spans more than {STATS_MAX_DAYS} days")
+
+
+_statements: Dict[Tuple[str, str], Any] = {}
+
+
+def stats_statement(bucket: str, group_by: str):
+    """Summed rollup rows per bucket, and per dimension value unless ``group_by`` is none"""
+    key = (bucket, group_by)
+    if key in _statements:
+        return _statements[key]
+    # Deltas not folded yet count as well
+    stats = union_all(*(
+        select(*(table.c[name] for name in KEY_COLUMNS + COUNTERS))
+        for table in (model.TaskDailyStats.__table__, model.TaskDailyStatsDelta.__table__)
+    )).subquery("rollups").c
+    period = cast(func.date_trunc(bucket, stats.day), Date).label("period")
+    group = [stats.value.label("group")] if group_by != "none" else []
+    statement = (
+        select(period, *group,
+               func.sum(stats.created).label("created"),
+               func.sum(stats.completed).label("completed"),
+               func.sum(stats.completion_seconds).label("completion_seconds"),
+               func.sum(case((stats.day < bindparam("today", type_=Date), stats.open_due), else_=0))
+               .label("overdue"))
+        # Every task has exactly one status, so its rows also give the totals
+        .where(and_(stats.dimension == ("status" if group_by == "none" else group_by),
+                    stats.day >= bindparam("range_start", type_=Date),
+                    stats.day <= bindparam("range_end", type_=Date)))
+        .group_by(period, *group)
+        .order_by(period, *group)
+    )
+    return _statements.setdefault(key, statement)
+
+
+def task_stats(start: date, end: date, bucket: str, group_by: str, db: Session) -> List[Dict[str, Any]]:
+    rows = db.execute(stats_statement(bucket, group_by),
+                      {"range_start": start, "range_end": end, "today": date.today()}).all()
+    names = {}
+    if group_by == "tag":
+        names = tag_dictionary.names_by_id(db, [int(row.group) for row in rows])
+    result = []
+    for row in rows:
+        group = None
+        if group_by == "tag":
+            group = names.get(int(row.group))
+            if group is None:
+                continue
+        elif group_by != "none":
+            group = row.group
+        result.append({
+            "period": row.period,
+            "group": group,
+            "created": row.created,
+            "completed": row.completed,
+            "completionRate": round(row.completed / row.created, 4) if row.created > 0 else None,
+            "meanSecondsToComplete": round(row.completion_seconds / row.completed) if row.completed > 0 else None,
+            "overdue": row.overdue,
+        })
+    return result
+
+
+def expected_rollups(db: Session) -> Dict[Key, List[float]]:
+    """The rollups recomputed from every task"""
+    total: Dict[Key, List[float]] = defaultdict(lambda: [0, 0, 0.0, 0])
+    rows = db.execute(select(*FACT_COLUMNS).execution_options(stream_results=True, max_row_buffer=10000))
+    for row in rows:
+        for key, counters in contributions(task_facts(row)).items():
+            entry = total[key]
+            for i, value in enumerate(counters):
+                entry[i] += value
+    return total
+
+
+_STAGING = "task_daily_stats_staging"
+
+_APPLY_STAGING = f"""
+INSERT INTO task_daily_stats SELECT * FROM {_STAGING}
+ON CONFLICT (dimension, day, value) DO UPDATE SET
+    created = excluded.created, completed = excluded.completed,
+    completion_seconds = excluded.completion_seconds, open_due = excluded.open_due
+WHERE abs(task_daily_stats.completion_seconds - excluded.completion_seconds) > 1e-6
+   OR (task_daily_stats.created, task_daily_stats.completed, task_daily_stats.open_due)
+      IS DISTINCT FROM (excluded.created, excluded.completed, excluded.open_due)
+"""
+
+_DROP_UNSTAGED = f"""
+DELETE FROM task_daily_stats AS stats WHERE NOT EXISTS (
+    SELECT 1 FROM {_STAGING} AS staged
+    WHERE staged.dimension = stats.dimension AND staged.day = stats.day AND staged.value = stats.value
+)
+"""
+
+
+def reconcile(db: Session, batch_size: int = 5000) -> Dict[str, int]:
+    """Replace the rollups with ones recomputed from the tasks, in a fresh session's first transaction
+
+    The lock comes before the snapshot, so the fold below takes exactly the
+    deltas the task scan sees; later deltas stay pending and still apply on
+    top. Writers keep appending deltas throughout, and readers see the old
+    rollups until the commit swaps in the new ones.
+    """
+    db.execute(text("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ"))
+    db.execute(text(_LOCK_ROLLUPS))
+    db.execute(fold_statement())
+    expected = expected_rollups(db)
+    db.execute(text(f"CREATE TEMP TABLE {_STAGING} (LIKE task_daily_stats) ON COMMIT DROP"))
+    rows = [{"day": day, "dimension": dimension, "value": value, **dict(zip(COUNTERS, counters))}
+            for (day, dimension, value), counters in expected.items()
+            if counters[0] or counters[1] or counters[3] or abs(counters[2]) > 1e-6]
+    staging = table(_STAGING, *(column(name) for name in KEY_COLUMNS + COUNTERS))
+    for start in range(0, len(rows), batch_size):
+        db.execute(insert(staging).values(rows[start:start + batch_size]))
+    corrected = db.execute(text(_APPLY_STAGING)).rowcount
+    removed = db.execute(text(_DROP_UNSTAGED)).rowcount
+    db.commit()
+    return {"rows": len(rows), "corrected": corrected, "removed": removed}
+
+
+if __name__ == "__main__":
+    import sys
+
+    from backend import db
+
+    with db.SessionLocal() as session:
+        if sys.argv[1:] == ["fold"]:
+            folded = fold(session)
+            print("Another fold is running" if folded is None else f"Folded into {folded} rollup rows")
+        else:
+            result = reconcile(session)
+            print(f"Reconciled {result['rows']} rollup rows: {result['corrected']} corrected, "
+                  f"{result['removed']} removed")
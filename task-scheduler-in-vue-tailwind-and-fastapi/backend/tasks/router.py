@@ -1,21 +1,73 @@
-from typing import List, Optional
+import inspect
+from typing import List, Optional, Union
 from fastapi import APIRouter, Depends, status, Response, Request, Query, HTTPException
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
-from datetime import date
+from datetime import date, datetime
 
 from backend import db
+from backend.deadlines import AGGREGATE_TIMEOUT_MS, LIST_TIMEOUT_MS, session_with_deadline
+from backend.tracing import TracedRoute
+from .suggest import SUGGEST_TIMEOUT_MS
 
 from .import schema
 from .import services
 from .filter_schema import TaskFilterParams
+from .formats import JSON, WIRE_FIELDS, binary_response, negotiate, tasks_response
 
 
 router = APIRouter(
     tags=["Task"],
-    prefix='/tasks'
+    prefix='/tasks',
+    route_class=TracedRoute
 )
 
+# Filter query parameters shared by the listing and aggregate endpoints
+async def get_task_filters(
+    search: Optional[str] = Query(None),
+    status: Optional[List[str]] = Query(None),
+    priority: Optional[List[str]] = Query(None),
+    tags: Optional[List[str]] = Query(None),
+    due_date_from: Optional[date] = Query(None),
+    due_date_to: Optional[date] = Query(None),
+    created_date_from: Optional[date] = Query(None),
+    created_date_to: Optional[date] = Query(None),
+    overdue_only: bool = Query(False),
+    completed_only: bool = Query(False),
+    sort_by: str = Query("createdDate"),
+    sort_order: str = Query("desc"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    fields: Optional[str] = Query(None, description="Comma-separated task fields to return"),
+) -> TaskFilterParams:
+    try:
+        return TaskFilterParams(
+            search=search,
+            status=status,
+            priority=priority,
+            tags=tags,
+            due_date_from=due_date_from,
+            due_date_to=due_date_to,
+            created_date_from=created_date_from,
+            created_date_to=created_date_to,
+            overdue_only=overdue_only,
+            completed_only=completed_only,
+            sort_by=sort_by,
+            sort_order=sort_order,
+            page=page,
+            page_size=page_size,
+            fields=[field.strip() for field in fields.split(",") if field.strip()] if fields else None
+        )
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors())
+
+
+# Any of these turns GET /tasks/ from the full listing into a filtered page
+LISTING_QUERY_PARAMS = frozenset(inspect.signature(get_task_filters).parameters)
+
+
 # Send a cookie here
 @router.get("/cookie")
 def create_cookie():
@@ -27,78 +79,48 @@ def create_cookie():
 
 
 @router.post('/', status_code=status.HTTP_201_CREATED,
-             response_model=schema.TaskBase)
-async def create_new_task(request: schema.TaskBase, database: Session = Depends(db.get_db)):
-    result = await services.create_new_task(request, database)
+             response_model=schema.TaskCreateResponse)
+async def create_new_task(request: schema.TaskBase,
+                          allow_duplicate: bool = Query(False, description="Create even if a near-duplicate exists"),
+                          database: Session = Depends(db.get_db)):
+    result = await services.create_new_task(request, database, allow_duplicate)
     return result
 
 
 @router.get('/', status_code=status.HTTP_200_OK,
-            response_model=List[schema.TaskList])
-async def task_list(database: Session = Depends(db.get_db)):
+            response_model=Union[List[schema.TaskList], schema.PaginatedTaskResponse])
+async def task_list(
+    request: Request,
+    filters: TaskFilterParams = Depends(get_task_filters),
+    database: Session = Depends(session_with_deadline(LIST_TIMEOUT_MS))
+):
+    media_type = negotiate(request.headers.get("accept"))
+    if LISTING_QUERY_PARAMS.intersection(request.query_params.keys()):
+        return await get_filtered_tasks(request, filters, database, media_type)
+    if media_type != JSON:
+        return binary_response(media_type, {}, WIRE_FIELDS, await services.get_task_listing_rows(database))
     result = await services.get_task_listing(database)
     return result
 
 
-@router.get('/{task_id}', status_code=status.HTTP_200_OK, response_model=schema.TaskBase)
-async def get_task_by_id(task_id: int, database: Session = Depends(db.get_db)):                            
-    return await services.get_task_by_id(task_id, database)
-
-
-@router.delete('/{task_id}', status_code=status.HTTP_204_NO_CONTENT, response_class=Response)
-async def delete_task_by_id(task_id: int,
-                                database: Session = Depends(db.get_db)):
-    return await services.delete_task_by_id(task_id, database)
-
-
-@router.patch('/{task_id}', status_code=status.HTTP_200_OK, response_model=schema.TaskBase)
-async def update_task_by_id(request: schema.TaskUpdate, task_id: int, database: Session = Depends(db.get_db)):
-    return await services.update_task_by_id(request, task_id, database)
-
-
-# New filtering endpoints
-async def get_task_filters(
-    search: Optional[str] = Query(None),
-    status: Optional[List[str]] = Query(None),
-    priority: Optional[List[str]] = Query(None),
-    tags: Optional[List[str]] = Query(None),
-    due_date_from: Optional[date] = Query(None),
-    due_date_to: Optional[date] = Query(None),
-    created_date_from: Optional[date] = Query(None),
-    created_date_to: Optional[date] = Query(None),
-    overdue_only: bool = Query(False),
-    completed_only: bool = Query(False),
-    sort_by: str = Query("createdDate"),
-    sort_order: str = Query("desc"),
-    page: int = Query(1, ge=1),
-    page_size: int = Query(20, ge=1, le=100),
-) -> TaskFilterParams:
-    return TaskFilterParams(
-        search=search,
-        status=status,
-        priority=priority,
-        tags=tags,
-        due_date_from=due_date_from,
-        due_date_to=due_date_to,
-        created_date_from=created_date_from,
-        created_date_to=created_date_to,
-        overdue_only=overdue_only,
-        completed_only=completed_only,
-        sort_by=sort_by,
-        sort_order=sort_order,
-        page=page,
-        page_size=page_size
-    )
-
-
-@router.get('/', response_model=schema.PaginatedTaskResponse)
-async def get_filtered_tasks(
-    filters: TaskFilterParams = Depends(get_task_filters),
-    database: Session = Depends(db.get_db)
-):
+async def get_filtered_tasks(request: Request, filters: TaskFilterParams, database: Session, media_type: str):
+    """Page of tasks matching ``filters``, for GET /tasks/ with query parameters"""
     try:
-        result = await services.get_filtered_tasks(filters, database)
+        if media_type != JSON:
+            # Binary formats are always column-oriented, so read projected rows
+            fields = filters.fields or list(WIRE_FIELDS)
+            result = await services.get_filtered_tasks(filters.copy(update={"fields": fields}), database, request,
+                                                       wire=True)
+            envelope = {key: value for key, value in result.items() if key != "tasks"}
+            return binary_response(media_type, envelope, fields, result["tasks"])
+        result = await services.get_filtered_tasks(filters, database, request)
+        if filters.fields:
+            # Sparse rows only carry the requested keys
+            sparse = schema.PaginatedSparseTaskResponse(**result)
+            return JSONResponse(content=jsonable_encoder(sparse, exclude_unset=True))
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -111,4 +133,119 @@ async def get_filter_options_endpoint(
         options = await services.get_filter_options(database)
         return options
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get('/calendar', status_code=status.HTTP_200_OK, response_model=schema.CalendarResponse)
+async def get_task_calendar(
+    request: Request,
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    bucket: str = Query("day", regex="^(day|week)$"),
+    filters: TaskFilterParams = Depends(get_task_filters),
+    database: Session = Depends(session_with_deadline(AGGREGATE_TIMEOUT_MS))
+):
+    return await services.get_task_calendar(filters, date_from, date_to, bucket, database, request)
+
+
+@router.get('/stats', status_code=status.HTTP_200_OK, response_model=schema.StatsResponse)
+async def get_task_stats(
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    bucket: str = Query("week", regex="^(day|week|month)$"),
+    group_by: str = Query("none", regex="^(none|status|priority|tag)$"),
+    database: Session = Depends(session_with_deadline(AGGREGATE_TIMEOUT_MS))
+):
+    return await services.get_task_stats(date_from, date_to, bucket, group_by, database)
+
+
+@router.get('/board', status_code=status.HTTP_200_OK, response_model=schema.BoardResponse)
+async def get_task_board(
+    request: Request,
+    per_column: int = Query(10, ge=1, le=100),
+    filters: TaskFilterParams = Depends(get_task_filters),
+    database: Session = Depends(session_with_deadline(AGGREGATE_TIMEOUT_MS))
+):
+    result = await services.get_task_board(filters, per_column, database, request)
+    if filters.fields:
+        sparse = schema.SparseBoardResponse(**result)
+        return JSONResponse(content=jsonable_encoder(sparse, exclude_unset=True))
+    return result
+
+
+@router.get('/suggest', status_code=status.HTTP_200_OK, response_model=schema.SuggestResponse)
+async def get_suggestions(
+    request: Request,
+    q: str = Query(..., max_length=100),
+    limit: int = Query(8, ge=1, le=25),
+    client_id: Optional[str] = Query(None, max_length=64,
+                                     description="Stable per search box; a newer query from the same address "
+                                                 "cancels the previous one"),
+    database: Session = Depends(session_with_deadline(SUGGEST_TIMEOUT_MS))
+):
+    return await services.get_suggestions(q, limit, database, request, client_id)
+
+
+@router.get('/batch', status_code=status.HTTP_200_OK, response_model=schema.TaskBatchResponse)
+async def get_tasks_batch(request: Request, ids: str = Query(..., description="Comma-separated task ids"),
+                          database: Session = Depends(db.get_db)):
+    try:
+        task_ids = [int(task_id) for task_id in ids.split(",") if task_id.strip()]
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="ids must be integers")
+    result = await services.get_tasks_by_ids(task_ids, database)
+    media_type = negotiate(request.headers.get("accept"))
+    return result if media_type == JSON else tasks_response(media_type, result)
+
+
+@router.post('/batch', status_code=status.HTTP_200_OK, response_model=schema.TaskBatchResponse)
+async def post_tasks_batch(request: schema.TaskBatchRequest, http_request: Request,
+                           database: Session = Depends(db.get_db)):
+    result = await services.get_tasks_by_ids(request.ids, database)
+    media_type = negotiate(http_request.headers.get("accept"))
+    return result if media_type == JSON else tasks_response(media_type, result)
+
+
+@router.post('/bulk-update-by-filter', status_code=status.HTTP_200_OK, response_model=schema.BulkUpdateResponse)
+async def bulk_update_by_filter(request: schema.BulkUpdateByFilterRequest,
+                                # Not capped: batches commit as they go, however long the whole update takes
+                                database: Session = Depends(session_with_deadline(None))):
+    return await services.bulk_update_by_filter(request, database)
+
+
+@router.post('/series', status_code=status.HTTP_201_CREATED, response_model=schema.TaskSeriesResponse)
+async def create_task_series(request: schema.TaskSeriesCreate, database: Session = Depends(db.get_db)):
+    return await services.create_task_series(request, database)
+
+
+@router.get('/series/{series_id}', status_code=status.HTTP_200_OK, response_model=schema.TaskSeriesResponse)
+async def get_task_series(series_id: int, database: Session = Depends(db.get_db)):
+    return await services.get_task_series(series_id, database)
+
+
+@router.delete('/series/{series_id}', status_code=status.HTTP_204_NO_CONTENT, response_class=Response)
+async def delete_task_series(series_id: int, database: Session = Depends(db.get_db)):
+    return await services.delete_task_series(series_id, database)
+
+
+@router.patch('/series/{series_id}/occurrences/{occurrence_date}', status_code=status.HTTP_200_OK,
+              response_model=schema.TaskResponse)
+async def update_series_occurrence(request: schema.TaskUpdate, series_id: int, occurrence_date: datetime,
+                                   database: Session = Depends(db.get_db)):
+    return await services.update_series_occurrence(request, series_id, occurrence_date, database)
+
+
+@router.get('/{task_id}', status_code=status.HTTP_200_OK, response_model=schema.TaskBase)
+async def get_task_by_id(task_id: int, database: Session = Depends(db.get_db)):                            
+    return await services.get_task_by_id(task_id, database)
+
+
+@router.delete('/{task_id}', status_code=status.HTTP_204_NO_CONTENT, response_class=Response)
+async def delete_task_by_id(task_id: int,
+                                database: Session = Depends(db.get_db)):
+    return await services.delete_task_by_id(task_id, database)
+
+
+@router.patch('/{task_id}', status_code=status.HTTP_200_OK, response_model=schema.TaskBase)
+async def update_task_by_id(request: schema.TaskUpdate, task_id: int, database: Session = Depends(db.get_db)):
+    return await services.update_task_by_id(request, task_id, database)
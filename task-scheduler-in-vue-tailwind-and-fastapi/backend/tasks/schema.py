@@ -1,6 +1,8 @@
 from datetime import date, datetime
-from typing import Optional, List
-from pydantic import BaseModel
+from typing import Optional, List, Dict
+from pydantic import BaseModel, Field, validator
+
+from .filter_schema import PriorityEnum, TaskFilterParams
 
 
 class TaskBase(BaseModel):
@@ -19,6 +21,18 @@ class TaskCreate(TaskBase):
     pass
 
 
+class DuplicateCandidate(BaseModel):
+    id: int
+    title: str
+    status: Optional[str] = None
+    score: float
+
+
+class TaskCreateResponse(TaskBase):
+    # Open tasks with similar titles, when duplicate detection is enabled
+    possibleDuplicates: List[DuplicateCandidate] = []
+
+
 class TaskUpdate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
@@ -32,12 +46,32 @@ class TaskUpdate(BaseModel):
         orm_mode = True
 
 
+class TaskBulkPatch(TaskUpdate):
+    addTags: Optional[List[str]] = None
+    removeTags: Optional[List[str]] = None
+
+
+class BulkUpdateByFilterRequest(BaseModel):
+    filters: TaskFilterParams
+    patch: TaskBulkPatch
+    batchSize: Optional[int] = Field(None, ge=1, le=5000)
+
+
+class BulkUpdateResponse(BaseModel):
+    updatedCount: int
+    batches: int
+    lastId: Optional[int] = None
+
+
 class TaskResponse(TaskBase):
-    id: int
+    # Occurrences of a series have no id until they are edited
+    id: Optional[int] = None
     createdDate: datetime
     completedDate: Optional[datetime] = None
     isOverdue: bool = False
     daysUntilDue: Optional[int] = None
+    seriesId: Optional[int] = None
+    occurrenceDate: Optional[datetime] = None
 
     class Config:
         orm_mode = True
@@ -67,6 +101,128 @@ class PaginatedTaskResponse(BaseModel):
     page: int
     pageSize: int
     totalPages: int
+    # More occurrences matched than were expanded; totalCount is then a lower bound
+    truncated: bool = False
+
+
+class SparseTask(BaseModel):
+    """Task projected to the fields requested with ``fields=``"""
+    id: Optional[int] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    status: Optional[str] = None
+    priority: Optional[str] = None
+    tags: Optional[List[str]] = None
+    createdDate: Optional[datetime] = None
+    dueDate: Optional[datetime] = None
+    completedDate: Optional[datetime] = None
+    seriesId: Optional[int] = None
+    occurrenceDate: Optional[datetime] = None
+
+
+class PaginatedSparseTaskResponse(BaseModel):
+    tasks: List[SparseTask]
+    totalCount: int
+    filteredCount: int
+    page: int
+    pageSize: int
+    totalPages: int
+    # More occurrences matched than were expanded; totalCount is then a lower bound
+    truncated: bool = False
+
+
+class BoardColumn(BaseModel):
+    status: str
+    total: int
+    tasks: List[TaskResponse]
+
+
+class BoardResponse(BaseModel):
+    columns: List[BoardColumn]
+
+
+class SparseBoardColumn(BaseModel):
+    status: str
+    total: int
+    tasks: List[SparseTask]
+
+
+class SparseBoardResponse(BaseModel):
+    columns: List[SparseBoardColumn]
+
+
+class TaskBatchRequest(BaseModel):
+    ids: List[int]
+
+
+class TaskBatchResponse(BaseModel):
+    tasks: List[TaskResponse]
+    missing: List[int]
+
+
+class TaskSeriesCreate(BaseModel):
+    title: str
+    description: Optional[str] = None
+    status: str = "pending"
+    priority: PriorityEnum = PriorityEnum.MEDIUM
+    tags: Optional[List[str]] = []
+    rrule: str = Field(..., max_length=255, description="RFC 5545 RRULE, e.g. FREQ=WEEKLY;BYDAY=MO")
+    dtstart: datetime
+
+
+class TaskSeriesResponse(BaseModel):
+    id: int
+    title: str
+    description: Optional[str] = None
+    status: str
+    priority: PriorityEnum
+    tags: List[str]
+    rrule: str
+    dtstart: datetime
+    until: Optional[datetime] = None
+    createdDate: datetime
+
+    @validator("priority", pre=True)
+    def priority_value(cls, v):
+        return getattr(v, "value", v)
+
+    class Config:
+        orm_mode = True
+
+
+class CalendarBucket(BaseModel):
+    start: date
+    total: int
+    byStatus: Dict[str, int]
+    byPriority: Dict[str, int]
+
+
+class CalendarResponse(BaseModel):
+    bucket: str
+    buckets: List[CalendarBucket]
+
+
+class StatsRow(BaseModel):
+    period: date
+    # Status, priority or tag name; None when not grouped
+    group: Optional[str] = None
+    created: int
+    completed: int
+    completionRate: Optional[float] = None
+    meanSecondsToComplete: Optional[int] = None
+    overdue: int
+
+
+class StatsResponse(BaseModel):
+    bucket: str
+    groupBy: str
+    rows: List[StatsRow]
+
+
+class SuggestResponse(BaseModel):
+    query: str
+    titles: List[str]
+    tags: List[str]
 
 
 class FilterOptionsResponse(BaseModel):
@@ -1,28 +1,118 @@
-from fastapi import HTTPException, status
-from sqlalchemy import select, and_, or_, func, desc, asc
+import os
+from fastapi import HTTPException, Request, status
+from sqlalchemy import delete, select, func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any
 from . import model
 from .filter_schema import TaskFilterParams
-from datetime import datetime
+from .tags import tag_dictionary
+from .facet_index import facet_index, FACET_INDEX_ENABLED
+from .statements import canonical_fields, filter_shape, filter_statement_cache, filter_params, projection, sparse_rows
+from .statements import FILTER_COALESCING_ENABLED, filter_flights, filter_request_key
+from .loader import fetch_tasks, task_loader
+from .task_cache import TASK_CACHE_ENABLED, task_cache
+from .writer import WRITE_BATCHING_ENABLED, task_writer
+from .suggest import normalize_query, suggest_cache, superseded_key, superseded_queries, task_suggestions
+from .timeline import calendar_cache, task_calendar, validate_range
+from .board import task_board
+from .bulk import BULK_UPDATE_BATCH_SIZE, bulk_update
+from .dedupe import DEDUPE_ENABLED, find_duplicates, rejecting_duplicate
+from .formats import WIRE_FIELDS, task_tuples, wire_rows
+from .rollups import (FACT_COLUMNS, ROLLUPS_ENABLED, record_task_changes, task_facts, task_stats,
+                      validate_stats_range)
+from .recurrence import (
+    COLLATED_SORTS, RECURRENCE_MAX_LISTING_DEPTH, Occurrence, collation_ranks, expand_window, is_occurrence,
+    listing_window, merge_sorted, parse_rrule, series_until, sort_field, sparse_occurrence,
+)
+from backend.deadlines import CLIENT_CLOSED_REQUEST, run_cancellable
+from backend.metrics import metrics
+from backend.tracing import traced
+from datetime import date, datetime
 
 
-async def create_new_task(request, database) -> model.Task:
-    new_task = model.Task(title=request.title, description=request.description, status=request.status,
-                            createdDate=datetime.now(), dueDate=request.dueDate)
-    database.add(new_task)
-    database.commit()
-    database.refresh(new_task)
+BATCH_MAX_IDS = int(os.getenv("TASK_BATCH_MAX_IDS", "100"))
+
+
+def _task_written(task: model.Task) -> None:
+    """Keep in-process indexes and caches current after a committed write"""
+    facet_index.add(task)
+    calendar_cache.clear()
+    if TASK_CACHE_ENABLED:
+        task_cache.put(task)
+    if TASK_CACHE_ENABLED or FACET_INDEX_ENABLED:
+        task_cache.publish(task.id)
+
+
+def _task_deleted(task_id: int) -> None:
+    facet_index.remove(task_id)
+    calendar_cache.clear()
+    if TASK_CACHE_ENABLED:
+        task_cache.discard(task_id)
+    if TASK_CACHE_ENABLED or FACET_INDEX_ENABLED:
+        task_cache.publish(task_id)
+
+
+def _tasks_bulk_written() -> None:
+    facet_index.invalidate()
+    calendar_cache.clear()
+    if TASK_CACHE_ENABLED:
+        task_cache.clear()
+    if TASK_CACHE_ENABLED or FACET_INDEX_ENABLED:
+        task_cache.publish()
+
+
+@traced()
+async def create_new_task(request, database, allow_duplicate: bool = False) -> model.Task:
+    duplicates = find_duplicates(request.title, database) if DEDUPE_ENABLED else []
+    blocking = rejecting_duplicate(duplicates)
+    if blocking is not None and not allow_duplicate:
+        metrics.increment("tasks.dedupe.rejected")
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": f"Task duplicates open task {blocking['id']}; "
+                               "pass allow_duplicate=true to create it anyway",
+                    "duplicates": duplicates}
+        )
+    values = dict(title=request.title, description=request.description, status=request.status,
+                  createdDate=datetime.now(), dueDate=request.dueDate,
+                  tag_ids=tag_dictionary.intern(database, request.tags))
+    if WRITE_BATCHING_ENABLED:
+        new_task = await task_writer.create(values)
+    else:
+        new_task = model.Task(**values)
+        database.add(new_task)
+        record_task_changes(database, [(None, task_facts(new_task))])
+        database.commit()
+        database.refresh(new_task)
+    _task_written(new_task)
+    new_task.possibleDuplicates = duplicates
     return new_task
 
 
+@traced()
 async def get_task_listing(database) -> List[model.Task]:
     tasks = database.query(model.Task).all()
     return tasks
 
 
+@traced()
+async def get_task_listing_rows(database) -> List[tuple]:
+    """Every task as a tuple of ``WIRE_FIELDS`` values, without loading ORM objects"""
+    rows = database.execute(select(*projection(WIRE_FIELDS))).all()
+    return wire_rows(rows, WIRE_FIELDS, database)
+
+
+@traced()
 async def get_task_by_id(task_id, database):
-    task = database.query(model.Task).filter_by(id=task_id).first()
+    if TASK_CACHE_ENABLED:
+        task = task_cache.get(task_id)
+        if task is not None:
+            return task
+        generation = task_cache.generation(task_id)
+    task = await task_loader.load(task_id, database)
+    if task and TASK_CACHE_ENABLED:
+        task_cache.fill(task, generation)
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -31,12 +121,32 @@ async def get_task_by_id(task_id, database):
     return task
 
 
+@traced()
+async def get_tasks_by_ids(ids: List[int], database) -> Dict[str, Any]:
+    """Fetch several tasks in request order, reporting ids that do not exist"""
+    if len(ids) > BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"At most {BATCH_MAX_IDS} ids can be fetched per batch"
+        )
+    ids = list(dict.fromkeys(ids))
+    tasks = fetch_tasks(ids, database)
+    return {
+        "tasks": [tasks[task_id] for task_id in ids if task_id in tasks],
+        "missing": [task_id for task_id in ids if task_id not in tasks]
+    }
+
+
+@traced()
 async def delete_task_by_id(task_id, database):
-    database.query(model.Task).filter(
-        model.Task.id == task_id).delete()
+    deleted = database.execute(
+        delete(model.Task).where(model.Task.id == task_id).returning(*FACT_COLUMNS)).all()
+    record_task_changes(database, [(task_facts(row), None) for row in deleted])
     database.commit()
+    _task_deleted(task_id)
 
 
+@traced()
 async def update_task_by_id(request, task_id, database):
     task = database.query(model.Task).filter_by(id=task_id).first()
     if not task:
@@ -44,101 +154,175 @@ async def update_task_by_id(request, task_id, database):
             status_code=status.HTTP_404_NOT_FOUND,
             detail="task Not Found !"
         )
+    before = task_facts(task)
+    _apply_update(task, request, database)
+    record_task_changes(database, [(before, task_facts(task))])
+    database.commit()
+    database.refresh(task)
+    _task_written(task)
+    return task
+
+
+def _apply_update(task: model.Task, request, database) -> None:
     task.title = request.title if request.title else task.title
     task.description = request.description if request.description else task.description
     task.status = request.status if request.status else task.status
     task.dueDate = request.dueDate if request.dueDate else task.dueDate
     task.priority = request.priority if request.priority else task.priority
-    task.tags = request.tags if request.tags else task.tags
+    task.tag_ids = tag_dictionary.intern(database, request.tags) if request.tags else task.tag_ids
     if request.status == "completed" and not task.completedDate:
         task.completedDate = datetime.now()
-    database.commit()
-    database.refresh(task)
-    return task
 
 
-async def get_filtered_tasks(filters: TaskFilterParams, db: Session) -> Dict[str, Any]:
-    """Get filtered tasks with pagination"""
-    # Build base query
-    query = select(model.Task)
+def _hydrate_tasks(ids: List[int], db: Session, fields: List[str] = None) -> List:
+    """Load tasks by id, returned in the order of ``ids``"""
+    if not ids:
+        return []
+    query = select(*projection(fields)).where(model.Task.id.in_(ids))
+    if fields:
+        tasks = sparse_rows(db.execute(query), db)
+        by_id = {task["id"]: task for task in tasks}
+    else:
+        by_id = {task.id: task for task in db.execute(query).scalars()}
+    return [by_id[task_id] for task_id in ids if task_id in by_id]
 
-    # Apply filters
-    conditions = []
 
-    # Search filter
-    if filters.search:
-        search_term = f"%{filters.search.lower()}%"
-        conditions.append(
-            or_(
-                func.lower(model.Task.title).like(search_term),
-                func.lower(model.Task.description).like(search_term)
-            )
-        )
+def _paginated(tasks, total_count: int, filters: TaskFilterParams, truncated: bool = False) -> Dict[str, Any]:
+    return {
+        "tasks": tasks,
+        "totalCount": total_count,
+        "filteredCount": total_count,
+        "page": filters.page,
+        "pageSize": filters.page_size,
+        "totalPages": (total_count + filters.page_size - 1) // filters.page_size,
+        "truncated": truncated,
+    }
 
-    # Status filter
-    if filters.status:
-        conditions.append(model.Task.status.in_(filters.status))
-
-    # Priority filter
-    if filters.priority:
-        conditions.append(model.Task.priority.in_(filters.priority))
-
-    # Tags filter
-    if filters.tags:
-        conditions.append(model.Task.tags.overlap(filters.tags))
-
-    # Date range filters
-    if filters.due_date_from:
-        conditions.append(model.Task.dueDate >= filters.due_date_from)
-    if filters.due_date_to:
-        conditions.append(model.Task.dueDate <= filters.due_date_to)
-
-    # Quick filters
-    if filters.overdue_only:
-        conditions.append(
-            and_(
-                model.Task.dueDate < datetime.utcnow(),
-                model.Task.status != 'completed'
-            )
-        )
 
-    if filters.completed_only:
-        conditions.append(model.Task.status == 'completed')
+@traced()
+async def get_filtered_tasks(filters: TaskFilterParams, db: Session, request: Request = None,
+                             wire: bool = False) -> Dict[str, Any]:
+    """Get filtered tasks with pagination.
 
-    # Apply conditions
-    if conditions:
-        query = query.where(and_(*conditions))
+    With ``wire``, the page's tasks are tuples of ``filters.fields`` values
+    for the binary formats instead of tasks or sparse dicts.
+    """
+    async def execute():
+        if request is not None:
+            return await run_cancellable(request, db, _filtered_tasks, filters, db, wire)
+        return _filtered_tasks(filters, db, wire)
 
-    # Get total count
-    count_query = select(func.count()).select_from(query.subquery())
-    total_count = db.execute(count_query).scalar()
+    if not FILTER_COALESCING_ENABLED:
+        return await execute()
+    # A leader abandoned by its own client should not fail the requests that joined it
+    return await filter_flights.do(
+        (filter_request_key(filters), wire), execute,
+        retry_on=lambda e: isinstance(e, HTTPException) and e.status_code == CLIENT_CLOSED_REQUEST
+    )
 
-    # Apply sorting
-    sort_column = getattr(model.Task, filters.sort_by, model.Task.createdDate)
-    if filters.sort_order == "desc":
-        query = query.order_by(desc(sort_column))
+
+def _filtered_tasks(filters: TaskFilterParams, db: Session, wire: bool = False) -> Dict[str, Any]:
+    window = listing_window(filters)
+    expanded, truncated = expand_window(filters, *window, db) if window else ([], False)
+    if expanded:
+        tasks, total_count = _tasks_with_occurrences(filters, expanded, db)
+    # Pure facet filters are answered from the in-memory index
+    elif FACET_INDEX_ENABLED and facet_index.supports(filters):
+        facet_index.refresh(db)
+        ids, total_count = facet_index.lookup(db, filters)
+        tasks = _hydrate_tasks(ids, db, filters.fields)
     else:
-        query = query.order_by(asc(sort_column))
+        statements = filter_statement_cache.get(filters)
+        params = filter_params(filters, db)
+
+        # Get total count
+        total_count = db.execute(statements.count, params).scalar()
+
+        # Get the requested page
+        offset = (filters.page - 1) * filters.page_size
+        result = db.execute(statements.page, {**params, "offset": offset, "limit": filters.page_size})
+        if wire:
+            return _paginated(_wire_page(result.all(), filters.fields, db), total_count, filters, truncated)
+        tasks = sparse_rows(result, db) if filters.fields else result.scalars().all()
 
-    # Apply pagination
+    if wire:
+        return _paginated(task_tuples(tasks, filters.fields), total_count, filters, truncated)
+    if not filters.fields:
+        # Coalesced requests serialize these tasks after this session is gone
+        _resolve_tag_names(tasks, db)
+    return _paginated(tasks, total_count, filters, truncated)
+
+
+def _wire_page(rows, fields: List[str], db: Session) -> List[tuple]:
+    """Page rows, selected in ``canonical_fields`` order, as wire tuples in ``fields`` order"""
+    columns = list(canonical_fields(fields))
+    rows = wire_rows(rows, columns, db)
+    if columns == list(fields):
+        return rows
+    positions = [columns.index(field) for field in fields]
+    return [tuple(row[position] for position in positions) for row in rows]
+
+
+def _tasks_with_occurrences(filters: TaskFilterParams, expanded: List[Occurrence], db: Session):
+    """Page of tasks and expanded occurrences merged in the requested order.
+
+    Task rows up to the end of the page are read and merged in memory, so
+    pages end at ``RECURRENCE_MAX_LISTING_DEPTH`` rows.
+    """
     offset = (filters.page - 1) * filters.page_size
-    query = query.offset(offset).limit(filters.page_size)
+    if offset + filters.page_size > RECURRENCE_MAX_LISTING_DEPTH:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Listings with recurring tasks end at row {RECURRENCE_MAX_LISTING_DEPTH}; "
+                   "narrow the due date range to see later rows"
+        )
+    query_filters = filters
+    if filters.fields and filters.sort_by not in filters.fields:
+        # The merge needs the sort value of every row
+        query_filters = filters.copy(update={"fields": [*filters.fields, filters.sort_by]})
+    statements = filter_statement_cache.get(query_filters)
+    params = filter_params(filters, db)
+    total_count = db.execute(statements.count, params).scalar() + len(expanded)
 
-    # Execute query
-    tasks = db.execute(query).scalars().all()
+    result = db.execute(statements.page, {**params, "offset": 0, "limit": offset + filters.page_size})
+    if query_filters.fields:
+        tasks = sparse_rows(result, db)
+        expanded = [sparse_occurrence(occurrence, query_filters.fields) for occurrence in expanded]
+    else:
+        tasks = result.scalars().all()
+    ranks = None
+    if filters.sort_by in COLLATED_SORTS:
+        ranks = collation_ranks(db, [sort_field(item, filters.sort_by) for item in [*tasks, *expanded]])
+    merged = merge_sorted(tasks, expanded, filters.sort_by, filters.sort_order, ranks)
+    page = merged[offset:offset + filters.page_size]
+    if query_filters is not filters:
+        for task in page:
+            del task[filters.sort_by]
+    return page, total_count
 
-    return {
-        "tasks": tasks,
-        "totalCount": total_count,
-        "filteredCount": total_count,
-        "page": filters.page,
-        "pageSize": filters.page_size,
-        "totalPages": (total_count + filters.page_size - 1) // filters.page_size
-    }
+
+def _resolve_tag_names(tasks, db: Session) -> None:
+    """Cache tag names so the tasks serialize without their session"""
+    tag_dictionary.names_by_id(db, list({tag_id for task in tasks for tag_id in task.tag_ids or []}))
 
 
+@traced()
 async def get_filter_options(db: Session) -> Dict[str, List[Dict[str, Any]]]:
     """Get available filter options with counts"""
+    if FACET_INDEX_ENABLED and facet_index.ready:
+        facet_index.refresh(db)
+        counts = facet_index.facet_counts()
+        tag_names = tag_dictionary.names_by_id(db, list(counts["tags"]))
+        return {
+            "statuses": [{"value": status, "label": status.title(), "count": count}
+                        for status, count in counts["statuses"].items()],
+            "priorities": [{"value": priority, "label": priority.title(), "count": count}
+                          for priority, count in counts["priorities"].items()],
+            "tags": [{"value": tag_names[tag_id], "label": tag_names[tag_id].title(), "count": count}
+                    for tag_id, count in counts["tags"].items() if tag_id in tag_names],
+            "dateRanges": {}
+        }
+
     # Get status counts
     status_query = select(model.Task.status, func.count(model.Task.id)).group_by(model.Task.status)
     status_results = db.execute(status_query).all()
@@ -148,15 +332,175 @@ async def get_filter_options(db: Session) -> Dict[str, List[Dict[str, Any]]]:
     priority_results = db.execute(priority_query).all()
 
     # Get tag counts
-    tag_query = select(func.unnest(model.Task.tags), func.count(model.Task.id)).group_by(func.unnest(model.Task.tags))
+    tag_column = func.unnest(model.Task.tag_ids).label("tag_id")
+    tag_query = select(tag_column, func.count()).group_by(tag_column)
     tag_results = db.execute(tag_query).all()
+    tag_names = tag_dictionary.names_by_id(db, [tag_id for tag_id, _ in tag_results])
 
     return {
         "statuses": [{"value": status, "label": status.title(), "count": count}
                     for status, count in status_results],
         "priorities": [{"value": priority.value, "label": priority.value.title(), "count": count}
                       for priority, count in priority_results],
-        "tags": [{"value": tag, "label": tag.title(), "count": count}
-                for tag, count in tag_results],
+        "tags": [{"value": tag_names[tag_id], "label": tag_names[tag_id].title(), "count": count}
+                for tag_id, count in tag_results if tag_id in tag_names],
         "dateRanges": {}  # To be implemented
-    }
\ No newline at end of file
+    }
+
+
+@traced()
+async def get_task_calendar(filters: TaskFilterParams, start: date, end: date, bucket: str,
+                            db: Session, request: Request = None) -> Dict[str, Any]:
+    """Task counts per day or week of due date, by status and priority"""
+    try:
+        validate_range(start, end, bucket)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    if request is not None:
+        buckets = await run_cancellable(request, db, task_calendar, filters, start, end, bucket, db)
+    else:
+        buckets = task_calendar(filters, start, end, bucket, db)
+    return {"bucket": bucket, "buckets": buckets}
+
+
+@traced()
+async def get_task_stats(start: date, end: date, bucket: str, group_by: str, db: Session) -> Dict[str, Any]:
+    """Created, completed and overdue counts per bucket, read from the daily rollups"""
+    try:
+        validate_stats_range(start, end, bucket, group_by)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    if not ROLLUPS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task stats are not enabled")
+    return {"bucket": bucket, "groupBy": group_by, "rows": task_stats(start, end, bucket, group_by, db)}
+
+
+@traced()
+async def get_task_board(filters: TaskFilterParams, per_column: int, db: Session,
+                         request: Request = None) -> Dict[str, Any]:
+    """Kanban columns with the first ``per_column`` tasks of every status"""
+    if request is not None:
+        return {"columns": await run_cancellable(request, db, task_board, filters, per_column, db)}
+    return {"columns": task_board(filters, per_column, db)}
+
+
+@traced()
+async def bulk_update_by_filter(request, db: Session) -> Dict[str, Any]:
+    """Patch every task matching the filters with set-based, batched UPDATEs"""
+    if not filter_shape(request.filters):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="At least one filter is required for a bulk update"
+        )
+    if not request.patch.dict(exclude_none=True):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Patch has no fields to update"
+        )
+    result = bulk_update(request.filters, request.patch, db, request.batchSize or BULK_UPDATE_BATCH_SIZE)
+    _tasks_bulk_written()
+    return result
+
+
+@traced()
+async def get_suggestions(q: str, limit: int, db: Session, request: Request = None,
+                          client_id: str = None) -> Dict[str, Any]:
+    """Type-ahead matches over task titles and the tag vocabulary"""
+    query = normalize_query(q)
+    if not query:
+        return {"query": query, "titles": [], "tags": []}
+    cached = suggest_cache.get((query, limit))
+    if cached is not None:
+        metrics.increment("tasks.suggest.cache_hits")
+        return cached
+
+    # A newer keystroke from the same client makes this request's answer useless
+    key = superseded_key(request, client_id)
+    if key:
+        superseded_queries.start(key, db)
+    try:
+        if request is not None:
+            suggestions = await run_cancellable(request, db, task_suggestions, query, limit, db)
+        else:
+            suggestions = task_suggestions(query, limit, db)
+    finally:
+        if key:
+            superseded_queries.finish(key, db)
+    result = {"query": query, **suggestions}
+    suggest_cache.set((query, limit), result)
+    return result
+
+
+@traced()
+async def create_task_series(request, database) -> model.TaskSeries:
+    """Store a recurring task; its occurrences are expanded when read"""
+    try:
+        rule = parse_rrule(request.rrule)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    series = model.TaskSeries(
+        title=request.title, description=request.description, status=request.status,
+        priority=model.PriorityEnum(request.priority.value), createdDate=datetime.now(),
+        tag_ids=tag_dictionary.intern(database, request.tags),
+        rrule=request.rrule.strip(), dtstart=request.dtstart, until=series_until(rule, request.dtstart),
+    )
+    database.add(series)
+    database.commit()
+    database.refresh(series)
+    calendar_cache.clear()
+    return series
+
+
+@traced()
+async def get_task_series(series_id: int, database) -> model.TaskSeries:
+    series = database.get(model.TaskSeries, series_id)
+    if not series:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Series Not Found !"
+        )
+    return series
+
+
+@traced()
+async def delete_task_series(series_id: int, database) -> None:
+    """Remove a series; its edited and completed occurrences stay as plain tasks"""
+    deleted = database.query(model.TaskSeries).filter(model.TaskSeries.id == series_id).delete()
+    if not deleted:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Series Not Found !"
+        )
+    database.commit()
+    # Its stored occurrences lost their seriesId
+    _tasks_bulk_written()
+
+
+@traced()
+async def update_series_occurrence(request, series_id: int, occurrence_date: datetime, database) -> model.Task:
+    """Edit one occurrence, storing it as a task row the first time it changes"""
+    series = await get_task_series(series_id, database)
+    occurrence_date = occurrence_date.replace(tzinfo=None)
+    task = database.query(model.Task).filter_by(seriesId=series_id, occurrenceDate=occurrence_date).first()
+    before = task_facts(task)
+    if task is None:
+        if not is_occurrence(parse_rrule(series.rrule), series.dtstart, occurrence_date):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"{occurrence_date.isoformat()} is not an occurrence of series {series_id}"
+            )
+        task = Occurrence(series, occurrence_date, series.tags).materialize()
+        database.add(task)
+    _apply_update(task, request, database)
+    record_task_changes(database, [(before, task_facts(task))])
+    try:
+        database.commit()
+    except IntegrityError:
+        database.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Occurrence was changed concurrently, retry the update"
+        )
+    database.refresh(task)
+    _task_written(task)
+    return task
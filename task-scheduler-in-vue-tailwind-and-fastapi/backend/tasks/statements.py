@@ -0,0 +1,264 @@
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, asc, bindparam, desc, func, or_, select, text, Integer, String
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from backend.metrics import metrics
+from backend.singleflight import SingleFlight
+from . import model
+from .filter_schema import TaskFilterParams
+from .tags import tag_dictionary
+
+
+# Filters that change the WHERE clause, in a fixed order so equal filter sets
+# always produce the same shape key.
+FILTER_FIELDS = (
+    "search", "status", "priority", "tags", "due_date_from", "due_date_to",
+    "overdue_only", "completed_only",
+)
+
+SORT_COLUMNS = {
+    "createdDate": model.Task.createdDate,
+    "dueDate": model.Task.dueDate,
+    "priority": model.Task.priority,
+    "title": model.Task.title,
+    "status": model.Task.status,
+}
+
+
+# Columns backing each sparse fieldset name
+FIELD_COLUMNS = {
+    "id": model.Task.id,
+    "title": model.Task.title,
+    "description": model.Task.description,
+    "status": model.Task.status,
+    "priority": model.Task.priority,
+    "tags": model.Task.tag_ids,
+    "createdDate": model.Task.createdDate,
+    "dueDate": model.Task.dueDate,
+    "completedDate": model.Task.completedDate,
+    "seriesId": model.Task.seriesId,
+    "occurrenceDate": model.Task.occurrenceDate,
+}
+
+
+def canonical_fields(fields: Optional[Sequence[str]]) -> Tuple[str, ...]:
+    """Requested fields in ``FIELD_COLUMNS`` order, so every permutation shares a statement"""
+    if not fields:
+        return ()
+    requested = set(fields)
+    return tuple(field for field in FIELD_COLUMNS if field in requested)
+
+
+def projection(fields: Optional[Sequence[str]]) -> List:
+    """SELECT list for a sparse fieldset, or the whole entity"""
+    if not fields:
+        return [model.Task]
+    return [FIELD_COLUMNS[field].label(field) for field in fields]
+
+
+def sparse_rows(rows, db: Session, fields: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+    """Convert projected rows into dicts of API values"""
+    tasks = []
+    for row in rows:
+        task = {field: row._mapping[field] for field in fields} if fields else dict(row._mapping)
+        if "priority" in task and task["priority"] is not None:
+            task["priority"] = getattr(task["priority"], "value", task["priority"])
+        if "tags" in task:
+            task["tags"] = tag_dictionary.names_for(db, task["tags"] or [])
+        tasks.append(task)
+    return tasks
+
+
+class FilterStatements(NamedTuple):
+    count: Any
+    page: Any
+
+
+def filter_shape(filters: TaskFilterParams) -> Tuple[str, ...]:
+    """Names of the active filters"""
+    return tuple(field for field in FILTER_FIELDS if getattr(filters, field))
+
+
+def filter_conditions(shape: Tuple[str, ...], entity=model.Task) -> List:
+    """WHERE conditions for a filter shape, with values left as bind parameters.
+
+    Bind names never match a task column name, so the conditions can also be
+    used in UPDATE statements without clashing with the SET parameters.
+    ``entity`` can be any mapped class with the task columns the shape uses.
+    """
+    conditions = []
+    if "search" in shape:
+        search_term = bindparam("search", type_=String)
+        conditions.append(
+            or_(
+                func.lower(entity.title).like(search_term),
+                func.lower(entity.description).like(search_term)
+            )
+        )
+    if "status" in shape:
+        conditions.append(entity.status.in_(bindparam("statuses", expanding=True)))
+    if "priority" in shape:
+        conditions.append(entity.priority.in_(bindparam("priorities", expanding=True)))
+    if "tags" in shape:
+        conditions.append(entity.tag_ids.overlap(bindparam("filter_tag_ids", type_=ARRAY(Integer))))
+    if "due_date_from" in shape:
+        conditions.append(entity.dueDate >= bindparam("due_date_from"))
+    if "due_date_to" in shape:
+        conditions.append(entity.dueDate <= bindparam("due_date_to"))
+    if "overdue_only" in shape:
+        conditions.append(
+            and_(
+                entity.dueDate < bindparam("now"),
+                entity.status != 'completed'
+            )
+        )
+    if "completed_only" in shape:
+        conditions.append(entity.status == 'completed')
+    return conditions
+
+
+def canonical_filters(filters: TaskFilterParams) -> Tuple:
+    """Hashable key for the filter values, independent of list order"""
+    key = []
+    for field in FILTER_FIELDS:
+        value = getattr(filters, field)
+        if isinstance(value, list):
+            value = tuple(sorted(getattr(item, "value", item) for item in value))
+        key.append(value)
+    return tuple(key)
+
+
+def filter_request_key(filters: TaskFilterParams) -> Tuple:
+    """Key shared by filter requests that produce the same response"""
+    return (canonical_filters(filters), filters.sort_by, filters.sort_order,
+            filters.page, filters.page_size, tuple(filters.fields or ()))
+
+
+def filter_params(filters: TaskFilterParams, db: Session) -> Dict[str, Any]:
+    """Bind parameter values for the filters' shape"""
+    params: Dict[str, Any] = {}
+    if filters.search:
+        params["search"] = f"%{filters.search.lower()}%"
+    if filters.status:
+        params["statuses"] = filters.status
+    if filters.priority:
+        params["priorities"] = filters.priority
+    if filters.tags:
+        # Unknown tags resolve to an empty array, which overlaps nothing
+        params["filter_tag_ids"] = tag_dictionary.ids_for(db, filters.tags)
+    if filters.due_date_from:
+        params["due_date_from"] = filters.due_date_from
+    if filters.due_date_to:
+        params["due_date_to"] = filters.due_date_to
+    if filters.overdue_only:
+        params["now"] = datetime.utcnow()
+    return params
+
+
+class FilterStatementCache:
+    """Count and page statements per filter shape and sort order.
+
+    Every request with the same active filters and sort reuses the same
+    statement objects instead of building a new ``select()``. Compiling is
+    left to the engine's compiled cache, which already matches structurally
+    equal statements; ``backend.metrics.record_compiled_cache`` reports its
+    hits and compile times. Values are always bound, so Postgres sees one
+    stable SQL text per shape.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._statements: Dict[Tuple, FilterStatements] = {}
+
+    def get(self, filters: TaskFilterParams) -> FilterStatements:
+        key = (filter_shape(filters), filters.sort_by, filters.sort_order, canonical_fields(filters.fields))
+        statements = self._statements.get(key)
+        if statements is not None:
+            metrics.increment("tasks.filter_statements.hits")
+            return statements
+
+        metrics.increment("tasks.filter_statements.misses")
+        statements = self._build(*key)
+        with self._lock:
+            return self._statements.setdefault(key, statements)
+
+    @staticmethod
+    def _build(shape: Tuple[str, ...], sort_by: str, sort_order: str, fields: Tuple[str, ...]) -> FilterStatements:
+        query = select(*projection(fields))
+        conditions = filter_conditions(shape)
+        if conditions:
+            query = query.where(and_(*conditions))
+
+        count = select(func.count()).select_from(query.subquery())
+
+        sort_column = SORT_COLUMNS.get(sort_by, model.Task.createdDate)
+        query = query.order_by(desc(sort_column) if sort_order == "desc" else asc(sort_column))
+        page = query.offset(bindparam("offset", type_=Integer)).limit(bindparam("limit", type_=Integer))
+        return FilterStatements(count, page)
+
+    def __len__(self):
+        return len(self._statements)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._statements.clear()
+
+
+filter_statement_cache = FilterStatementCache()
+
+FILTER_COALESCING_ENABLED = os.getenv("TASK_FILTER_COALESCING", "true").lower() in ("1", "true", "yes")
+
+# Identical concurrent filter requests share one count + page execution
+filter_flights = SingleFlight("tasks.filter.flights")
+
+
+# Filter shapes the Vue client sends most often
+COMMON_FILTERS = (
+    TaskFilterParams(),
+    TaskFilterParams(status=["pending"]),
+    TaskFilterParams(priority=["high"]),
+    TaskFilterParams(tags=["tag"]),
+    TaskFilterParams(search="task"),
+    TaskFilterParams(overdue_only=True),
+    TaskFilterParams(completed_only=True),
+    TaskFilterParams(sort_by="dueDate", sort_order="asc"),
+)
+
+
+def warm_filter_statements(db: Session) -> int:
+    """Build the common filter shapes and run their page queries once.
+
+    Runs with ``LIMIT 0`` so SQLAlchemy's compiled cache and the Postgres
+    backend's catalog caches are populated without reading any rows.
+    """
+    for filters in COMMON_FILTERS:
+        statements = filter_statement_cache.get(filters)
+        db.execute(statements.page, {**filter_params(filters, db), "offset": 0, "limit": 0}).all()
+    return len(COMMON_FILTERS)
+
+
+def plan_time_stats(db: Session, limit: int = 20) -> List[Dict[str, Any]]:
+    """Planning and execution time per task statement from pg_stat_statements.
+
+    Requires the pg_stat_statements extension with
+    ``pg_stat_statements.track_planning`` enabled; returns an empty list
+    otherwise.
+    """
+    try:
+        rows = db.execute(
+            text(
+                "SELECT query, calls, plans, total_plan_time, mean_plan_time, mean_exec_time "
+                "FROM pg_stat_statements WHERE query LIKE '%FROM task%' "
+                "ORDER BY total_plan_time DESC LIMIT :limit"
+            ),
+            {"limit": limit},
+        ).mappings().all()
+    except Exception:
+        db.rollback()
+        return []
+    return [dict(row) for row in rows]
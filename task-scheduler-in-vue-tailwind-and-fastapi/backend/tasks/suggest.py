@@ -0,0 +1,105 @@
+import os
+from typing import Dict, List, Optional
+
+from sqlalchemy import Integer, String, bindparam, func, literal_column, select, union_all
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+
+from backend.cache import TTLCache
+from backend.deadlines import abandon_query
+from backend.metrics import metrics
+from . import model
+
+
+SUGGEST_TIMEOUT_MS = int(os.getenv("TASK_SUGGEST_TIMEOUT_MS", "200"))
+
+# Trigrams need at least three characters to say anything useful
+MIN_TRIGRAM_LENGTH = 3
+
+# Hot prefixes are served from memory; titles may lag writes by the TTL
+suggest_cache = TTLCache(max_entries=int(os.getenv("TASK_SUGGEST_CACHE_SIZE", "2048")),
+                         ttl=float(os.getenv("TASK_SUGGEST_CACHE_TTL", "30")))
+
+
+def normalize_query(q: str) -> str:
+    return " ".join(q.lower().split())
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def suggest_statement(column, fuzzy: bool):
+    """Top-K distinct values of ``column``: prefix matches first, then trigram matches.
+
+    The prefix branch uses the ``lower(...) text_pattern_ops`` index and the
+    fuzzy branch the ``gin_trgm_ops`` index; both take ``:query``,
+    ``:prefix`` and ``:limit``.
+    """
+    lowered = func.lower(column)
+    query = bindparam("query", type_=String)
+    branches = [
+        select(column.label("value"), literal_column("1").label("is_prefix"),
+               func.similarity(lowered, query).label("score"))
+        .where(lowered.like(bindparam("prefix", type_=String), escape="\\"))
+        .order_by(lowered)
+        .limit(bindparam("limit", type_=Integer))
+    ]
+    if fuzzy:
+        branches.append(
+            select(column.label("value"), literal_column("0").label("is_prefix"),
+                   func.similarity(lowered, query).label("score"))
+            .where(lowered.op("%")(query))
+            .order_by(func.similarity(lowered, query).desc())
+            .limit(bindparam("limit", type_=Integer))
+        )
+    candidates = union_all(*branches).subquery("candidates")
+    return (
+        select(candidates.c.value)
+        .group_by(candidates.c.value)
+        .order_by(func.max(candidates.c.is_prefix).desc(), func.max(candidates.c.score).desc(), candidates.c.value)
+        .limit(bindparam("limit", type_=Integer))
+    )
+
+
+_STATEMENTS = {
+    (kind, fuzzy): suggest_statement(column, fuzzy)
+    for kind, column in (("titles", model.Task.title), ("tags", model.Tag.name))
+    for fuzzy in (False, True)
+}
+
+
+def task_suggestions(query: str, limit: int, db: Session) -> Dict[str, List[str]]:
+    params = {"query": query, "prefix": f"{escape_like(query)}%", "limit": limit}
+    fuzzy = len(query) >= MIN_TRIGRAM_LENGTH
+    return {
+        kind: db.execute(_STATEMENTS[(kind, fuzzy)], params).scalars().all()
+        for kind in ("titles", "tags")
+    }
+
+
+def superseded_key(request: Optional[Request], client_id: Optional[str]) -> Optional[str]:
+    """``client_id`` scoped to the caller's address, so nobody can cancel another client's queries"""
+    if not client_id or request is None or request.client is None:
+        return None
+    return f"{request.client.host}/{client_id}"
+
+
+class SupersededQueries:
+    """Cancels a client's running suggest query once a newer keystroke arrives"""
+
+    def __init__(self):
+        self._running: Dict[str, Session] = {}
+
+    def start(self, client_id: str, db: Session) -> None:
+        previous = self._running.get(client_id)
+        if previous is not None and abandon_query(previous):
+            metrics.increment("db.cancel.superseded")
+        self._running[client_id] = db
+
+    def finish(self, client_id: str, db: Session) -> None:
+        if self._running.get(client_id) is db:
+            del self._running[client_id]
+
+
+superseded_queries = SupersededQueries()
@@ -0,0 +1,89 @@
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from . import model
+
+
+class TagDictionary:
+    """Process-wide cache of the ``tag`` table mapping names to integer ids.
+
+    Tasks only store ``tag_ids``; this keeps the string <-> id translation
+    out of every filter and listing query. Misses fall back to the database.
+    """
+
+    def __init__(self):
+        self._ids_by_name: Dict[str, int] = {}
+        self._names_by_id: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def _remember(self, rows) -> None:
+        with self._lock:
+            for tag_id, name in rows:
+                self._ids_by_name[name] = tag_id
+                self._names_by_id[tag_id] = name
+
+    def _load_names(self, db: Session, names: Iterable[str]) -> None:
+        rows = db.execute(
+            select(model.Tag.id, model.Tag.name).where(model.Tag.name.in_(list(names)))
+        ).all()
+        self._remember(rows)
+
+    def _load_ids(self, db: Session, tag_ids: Iterable[int]) -> None:
+        rows = db.execute(
+            select(model.Tag.id, model.Tag.name).where(model.Tag.id.in_(list(tag_ids)))
+        ).all()
+        self._remember(rows)
+
+    def ids_for(self, db: Session, names: Optional[List[str]]) -> List[int]:
+        """Ids of already known tags; unknown names are dropped"""
+        if not names:
+            return []
+        missing = {name for name in names if name not in self._ids_by_name}
+        if missing and db is not None:
+            self._load_names(db, missing)
+        return [self._ids_by_name[name] for name in dict.fromkeys(names) if name in self._ids_by_name]
+
+    def intern(self, db: Session, names: Optional[List[str]]) -> List[int]:
+        """Ids for the given names, inserting tags that do not exist yet"""
+        if not names:
+            return []
+        names = list(dict.fromkeys(names))
+        missing = [name for name in names if name not in self._ids_by_name]
+        if missing:
+            # Committed on its own connection so cached ids always exist
+            # even if the caller's transaction is rolled back.
+            with db.get_bind().begin() as connection:
+                connection.execute(
+                    insert(model.Tag)
+                    .values([{"name": name} for name in missing])
+                    .on_conflict_do_nothing(index_elements=[model.Tag.name])
+                )
+                rows = connection.execute(
+                    select(model.Tag.id, model.Tag.name).where(model.Tag.name.in_(missing))
+                ).all()
+            self._remember(rows)
+        return [self._ids_by_name[name] for name in names]
+
+    def names_by_id(self, db: Optional[Session], tag_ids: List[int]) -> Dict[int, str]:
+        """Mapping of the given ids to tag names; unknown ids are dropped"""
+        missing = [tag_id for tag_id in tag_ids if tag_id not in self._names_by_id]
+        if missing and db is not None:
+            self._load_ids(db, missing)
+        return {tag_id: self._names_by_id[tag_id] for tag_id in tag_ids if tag_id in self._names_by_id}
+
+    def names_for(self, db: Optional[Session], tag_ids: List[int]) -> List[str]:
+        """Tag names for the given ids, preserving order"""
+        names = self.names_by_id(db, tag_ids)
+        return [names[tag_id] for tag_id in tag_ids if tag_id in names]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ids_by_name.clear()
+            self._names_by_id.clear()
+
+
+tag_dictionary = TagDictionary()
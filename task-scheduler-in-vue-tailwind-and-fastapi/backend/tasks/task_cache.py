@@ -0,0 +1,252 @@
+"""Read-through cache of single tasks
+
+``get_task_by_id`` answers from here before touching Postgres. Entries are
+column snapshots rather than ORM instances, so they never hold on to a
+session. Writes in this process update or drop the entry directly and then
+publish the change with ``NOTIFY task_cache``; every other process drops the
+entry from a ``LISTEN`` thread. The TTL bounds staleness if a notification
+is missed, and the cache is cleared whenever the listener reconnects.
+
+Each id also has a generation that every write and drop bumps. A read takes
+the generation before it queries and only fills the cache if it has not
+moved, so a slow read cannot put back a row a concurrent write replaced.
+
+The cache is opt-in (``TASK_CACHE``): the listener and the publisher each
+hold one extra Postgres connection per worker, outside the pool.
+"""
+import logging
+import os
+import secrets
+import select
+import sys
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from backend.cache import TTLCache
+from backend.metrics import metrics
+from . import model
+
+
+logger = logging.getLogger(__name__)
+
+TASK_CACHE_ENABLED = os.getenv("TASK_CACHE", "false").lower() in ("1", "true", "yes")
+TASK_CACHE_SIZE = int(os.getenv("TASK_CACHE_SIZE", "10000"))
+TASK_CACHE_TTL = float(os.getenv("TASK_CACHE_TTL", "60"))
+
+CHANNEL = "task_cache"
+ALL = "*"
+
+# Lets the listener skip notifications this process sent itself
+_INSTANCE = secrets.token_hex(4)
+
+_COLUMNS = [attribute.key for attribute in model.Task.__mapper__.column_attrs]
+
+
+def remote_target(payload: str) -> Optional[str]:
+    """The task id, or ``ALL``, of a notification another process sent; None for our own"""
+    instance, _, target = payload.partition(":")
+    return None if instance == _INSTANCE else target
+
+
+def _dedicated_connection():
+    """A DBAPI connection outside the pool, so it never takes a slot from requests"""
+    from backend import db
+
+    args, kwargs = db.engine.dialect.create_connect_args(db.engine.url)
+    return db.engine.dialect.connect(*args, **kwargs)
+
+
+def _approx_size(value: Any) -> int:
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_approx_size(item) for item in value.values())
+    elif isinstance(value, (list, tuple)):
+        size += sum(sys.getsizeof(item) for item in value)
+    return size
+
+
+class TaskCache:
+    def __init__(self, max_entries: int = TASK_CACHE_SIZE, ttl: float = TASK_CACHE_TTL):
+        self._entries = TTLCache(max_entries=max_entries, ttl=ttl)
+        self._generations: Dict[int, int] = {}
+        # Bumped when the generations are forgotten, which refuses every pending fill
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def get(self, task_id: int) -> Optional[model.Task]:
+        """A detached copy of the cached task, or None on a miss"""
+        values = self._entries.get(task_id)
+        if values is None:
+            metrics.increment("tasks.cache.misses")
+            return None
+        metrics.increment("tasks.cache.hits")
+        return model.Task(**{key: list(value) if isinstance(value, list) else value
+                             for key, value in values.items()})
+
+    def generation(self, task_id: int) -> Tuple[int, int]:
+        """Take before reading ``task_id`` from the database, and pass to ``fill``"""
+        with self._lock:
+            return self._epoch, self._generations.get(task_id, 0)
+
+    def _bump(self, task_id: int) -> None:
+        if len(self._generations) >= self._entries.max_entries:
+            self._generations.clear()
+            self._epoch += 1
+        self._generations[task_id] = self._generations.get(task_id, 0) + 1
+
+    @staticmethod
+    def _values(task: model.Task) -> Dict[str, Any]:
+        values = {key: getattr(task, key) for key in _COLUMNS}
+        if isinstance(values.get("tag_ids"), list):
+            values["tag_ids"] = list(values["tag_ids"])
+        return values
+
+    def put(self, task: model.Task) -> None:
+        """Cache a task this process has just written"""
+        with self._lock:
+            self._bump(task.id)
+            self._entries.set(task.id, self._values(task))
+
+    def fill(self, task: model.Task, generation: Tuple[int, int]) -> bool:
+        """Cache a task read from the database, unless it was written or dropped since ``generation``"""
+        with self._lock:
+            if (self._epoch, self._generations.get(task.id, 0)) != generation:
+                metrics.increment("tasks.cache.stale_fills")
+                return False
+            self._entries.set(task.id, self._values(task))
+            return True
+
+    def discard(self, task_id: int) -> None:
+        with self._lock:
+            self._bump(task_id)
+            self._entries.delete(task_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generations.clear()
+            self._epoch += 1
+            self._entries.clear()
+
+    def publish(self, task_id: Optional[int] = None) -> None:
+        """Tell other processes to drop ``task_id``, or every entry when None"""
+        try:
+            invalidation_publisher.send(f"{_INSTANCE}:{ALL if task_id is None else task_id}")
+        except Exception as e:
+            metrics.increment("tasks.cache.publish_errors")
+            logger.warning("Publishing task cache invalidation failed: %s", e)
+
+    def receive(self, payload: str) -> None:
+        target = remote_target(payload)
+        if target is None:
+            return
+        metrics.increment("tasks.cache.remote_invalidations")
+        if target == ALL:
+            self.clear()
+        elif target.isdigit():
+            self.discard(int(target))
+
+    def snapshot(self) -> Dict[str, Any]:
+        entries = self._entries
+        lookups = entries.hits + entries.misses
+        return {
+            "enabled": TASK_CACHE_ENABLED,
+            "entries": len(entries),
+            "maxEntries": entries.max_entries,
+            "ttlSeconds": entries.ttl,
+            "approxBytes": sum(_approx_size(values) for values in entries.values()),
+            "hits": entries.hits,
+            "misses": entries.misses,
+            "hitRate": round(entries.hits / lookups, 4) if lookups else None,
+        }
+
+
+class InvalidationPublisher:
+    """Sends invalidations on one dedicated autocommit connection.
+
+    Writers publish after their commit while their session still holds its
+    pooled connection; a second pooled connection per writer could exhaust
+    the pool with every writer waiting for another slot.
+    """
+
+    def __init__(self, connect=_dedicated_connection):
+        self._connect = connect
+        self._lock = threading.RLock()
+        self._connection = None
+
+    def send(self, payload: str) -> None:
+        with self._lock:
+            if self._connection is None or self._connection.closed:
+                self._connection = self._connect()
+                self._connection.autocommit = True
+            try:
+                with self._connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_notify(%s, %s)", (CHANNEL, payload))
+            except Exception:
+                # Reconnect on the next send
+                self.close()
+                raise
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+invalidation_publisher = InvalidationPublisher()
+
+task_cache = TaskCache()
+
+
+class InvalidationListener:
+    """Passes invalidations published by other processes to every receiver"""
+
+    def __init__(self, receivers: Iterable = (task_cache,), poll_interval: float = 5.0, retry_delay: float = 5.0):
+        self.receivers = list(receivers)
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="task-cache-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                connection = _dedicated_connection()
+            except Exception as e:
+                logger.warning("Task cache listener cannot connect: %s", e)
+                self._stopped.wait(self.retry_delay)
+                continue
+            try:
+                self._listen(connection)
+            except Exception as e:
+                metrics.increment("tasks.cache.listener_errors")
+                logger.warning("Task cache listener lost its connection: %s", e)
+                self._stopped.wait(self.retry_delay)
+            finally:
+                connection.close()
+
+    def _listen(self, connection) -> None:
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+        # Anything published while we were not listening is lost
+        for receiver in self.receivers:
+            receiver.clear()
+        while not self._stopped.is_set():
+            if select.select([connection], [], [], self.poll_interval) == ([], [], []):
+                continue
+            connection.poll()
+            while connection.notifies:
+                payload = connection.notifies.pop(0).payload
+                for receiver in self.receivers:
+                    receiver.receive(payload)
+
+
+invalidation_listener = InvalidationListener()
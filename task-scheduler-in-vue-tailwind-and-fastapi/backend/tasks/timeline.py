@@ -0,0 +1,127 @@
+import os
+import threading
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import Date, DateTime, and_, bindparam, cast, func, literal_column, select
+from sqlalchemy.orm import Session
+
+from backend.cache import TTLCache
+from . import model
+from .filter_schema import TaskFilterParams
+from .recurrence import expand_occurrences
+from .statements import canonical_filters, filter_conditions, filter_params, filter_shape
+
+
+CALENDAR_BUCKETS = ("day", "week")
+CALENDAR_MAX_BUCKETS = 400
+CALENDAR_CACHE_TTL = float(os.getenv("TASK_CALENDAR_CACHE_TTL", "60"))
+
+# Cleared on every task write; the TTL bounds staleness from other processes
+calendar_cache = TTLCache(max_entries=256, ttl=CALENDAR_CACHE_TTL)
+
+_statements: Dict[Tuple, Any] = {}
+_statements_lock = threading.Lock()
+
+
+def calendar_statement(shape: Tuple[str, ...], bucket: str):
+    """Per-bucket task counts by status and priority for a filter shape.
+
+    ``generate_series`` produces every bucket in the range, so empty buckets
+    are returned too, and each bucket joins tasks through a ``dueDate``
+    range that can use ``idx_tasks_due_date``.
+    """
+    key = (shape, bucket)
+    statement = _statements.get(key)
+    if statement is not None:
+        return statement
+
+    step = literal_column(f"interval '1 {bucket}'")
+    buckets = func.generate_series(
+        func.date_trunc(bucket, bindparam("range_start", type_=DateTime)),
+        bindparam("range_end", type_=DateTime),
+        step,
+    ).table_valued("bucket_start").alias("buckets")
+    bucket_start = buckets.c.bucket_start
+
+    onclause = and_(
+        model.Task.dueDate >= bucket_start,
+        model.Task.dueDate < bucket_start + step,
+        *filter_conditions(shape)
+    )
+    statement = (
+        select(cast(bucket_start, Date).label("bucket"), model.Task.status, model.Task.priority,
+               func.count(model.Task.id))
+        .select_from(buckets.outerjoin(model.Task, onclause))
+        .group_by(bucket_start, model.Task.status, model.Task.priority)
+        .order_by(bucket_start)
+    )
+    with _statements_lock:
+        return _statements.setdefault(key, statement)
+
+
+def validate_range(start: date, end: date, bucket: str) -> None:
+    if bucket not in CALENDAR_BUCKETS:
+        raise ValueError(f"bucket must be one of: {', '.join(CALENDAR_BUCKETS)}")
+    if end < start:
+        raise ValueError("End date cannot be before start date")
+    days_per_bucket = 7 if bucket == "week" else 1
+    if (end - start).days // days_per_bucket + 1 > CALENDAR_MAX_BUCKETS:
+        raise ValueError(f"Range spans more than {CALENDAR_MAX_BUCKETS} buckets")
+
+
+def _bucket_start(day: date, bucket: str) -> date:
+    """Same bucket boundaries as ``date_trunc``; weeks start on Monday"""
+    return day - timedelta(days=day.weekday()) if bucket == "week" else day
+
+
+def _count(entry: Dict, task_status, priority, count: int) -> None:
+    entry["total"] += count
+    if task_status is not None:
+        entry["byStatus"][task_status] = entry["byStatus"].get(task_status, 0) + count
+    priority = getattr(priority, "value", priority)
+    entry["byPriority"][priority] = entry["byPriority"].get(priority, 0) + count
+
+
+def _count_occurrences(buckets: Dict[date, Dict], filters: TaskFilterParams, start: date, end: date,
+                       bucket: str, db: Session) -> None:
+    """Add occurrences of recurring series to the buckets they fall in"""
+    window_start = datetime.combine(_bucket_start(start, bucket), time())
+    window_end = datetime.combine(_bucket_start(end, bucket), time()) \
+        + timedelta(days=7 if bucket == "week" else 1, microseconds=-1)
+    if filters.due_date_from:
+        window_start = max(window_start, datetime.combine(filters.due_date_from, time()))
+    if filters.due_date_to:
+        window_end = min(window_end, datetime.combine(filters.due_date_to, time()))
+    for occurrence in expand_occurrences(filters, window_start, window_end, db):
+        entry = buckets.get(_bucket_start(occurrence.dueDate.date(), bucket))
+        if entry is not None:
+            _count(entry, occurrence.status, occurrence.priority, 1)
+
+
+def task_calendar(filters: TaskFilterParams, start: date, end: date, bucket: str, db: Session) -> List[Dict]:
+    """Calendar buckets between ``start`` and ``end`` (inclusive)"""
+    key = (bucket, start, end, canonical_filters(filters))
+    cached = calendar_cache.get(key)
+    if cached is not None:
+        return cached
+
+    params = {
+        **filter_params(filters, db),
+        "range_start": datetime(start.year, start.month, start.day),
+        "range_end": datetime(end.year, end.month, end.day),
+    }
+    rows = db.execute(calendar_statement(filter_shape(filters), bucket), params).all()
+
+    buckets: Dict[date, Dict] = {}
+    for bucket_start, task_status, priority, count in rows:
+        entry = buckets.setdefault(
+            bucket_start, {"start": bucket_start, "total": 0, "byStatus": {}, "byPriority": {}}
+        )
+        if count:
+            _count(entry, task_status, priority, count)
+    _count_occurrences(buckets, filters, start, end, bucket, db)
+
+    result = list(buckets.values())
+    calendar_cache.set(key, result)
+    return result
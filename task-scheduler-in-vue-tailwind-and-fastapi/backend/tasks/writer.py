@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from backend import db as database
+from backend.metrics import metrics
+from . import model
+from .rollups import record_task_changes, task_facts
+
+
+logger = logging.getLogger(__name__)
+
+WRITE_BATCHING_ENABLED = os.getenv("TASK_WRITE_BATCHING", "false").lower() in ("1", "true", "yes")
+WRITE_BATCH_WINDOW = float(os.getenv("TASK_WRITE_BATCH_WINDOW_MS", "2")) / 1000
+WRITE_BATCH_MAX_ROWS = int(os.getenv("TASK_WRITE_BATCH_MAX_ROWS", "100"))
+
+_allocate_ids = text("SELECT nextval(pg_get_serial_sequence('task', 'id')) FROM generate_series(1, :count)")
+
+
+def insert_tasks(rows: List[Dict[str, Any]], db: Session) -> List[model.Task]:
+    """Insert ``rows`` with one multi-row ``INSERT ... RETURNING``, in input order.
+
+    Ids are drawn from the sequence first so returned rows can be matched to
+    their inputs; RETURNING order itself is not guaranteed by Postgres.
+    """
+    ids = db.execute(_allocate_ids, {"count": len(rows)}).scalars().all()
+    statement = insert(model.Task).values([{**row, "id": task_id} for row, task_id in zip(rows, ids)])
+    returned = db.execute(statement.returning(*model.Task.__table__.columns)).all()
+    by_id = {row._mapping[model.Task.__table__.c.id]: row for row in returned}
+    tasks = [_task_from_row(by_id[task_id]) for task_id in ids]
+    record_task_changes(db, [(None, task_facts(task)) for task in tasks])
+    return tasks
+
+
+def _task_from_row(row) -> model.Task:
+    return model.Task(**{attribute.key: row._mapping[attribute.columns[0]]
+                         for attribute in model.Task.__mapper__.column_attrs})
+
+
+class TaskWriteBatcher:
+    """Group-commits task creates that arrive within a short window.
+
+    The first create starts a ``window``-second timer; the batch is flushed
+    when it fires or as soon as ``max_rows`` creates are queued. The flush
+    runs in the threadpool on a session of its own, so the event loop keeps
+    serving requests while it waits on Postgres. Every waiter gets back its
+    own detached row. If the combined insert fails, rows are retried one by
+    one so a single bad row only fails its own request.
+    """
+
+    def __init__(self, window: float = WRITE_BATCH_WINDOW, max_rows: int = WRITE_BATCH_MAX_ROWS,
+                 session_factory: Callable[[], Session] = None):
+        self.window = window
+        self.max_rows = max_rows
+        self.session_factory = session_factory or database.request_session
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def create(self, values: Dict[str, Any]) -> model.Task:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if not self._pending:
+            self._timer = loop.call_later(self.window, self._flush)
+        self._pending.append((values, future))
+        if len(self._pending) >= self.max_rows:
+            self._timer.cancel()
+            self._flush()
+        return await future
+
+    def _flush(self) -> None:
+        pending = self._pending
+        self._pending, self._timer = [], None
+        if pending:
+            asyncio.ensure_future(self._write_batch(pending))
+
+    async def _write_batch(self, pending: List[Tuple[Dict[str, Any], asyncio.Future]]) -> None:
+        started = time.monotonic()
+        metrics.increment("tasks.writer.batches")
+        metrics.increment("tasks.writer.rows", len(pending))
+        try:
+            results = await run_in_threadpool(self._write, [values for values, _ in pending])
+        except Exception as e:
+            results = [e] * len(pending)
+        # Futures belong to the event loop, so they are resolved here rather than in the worker thread
+        for (_, future), result in zip(pending, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+        metrics.observe("tasks.writer.flush", time.monotonic() - started)
+
+    def _write(self, rows: List[Dict[str, Any]]) -> List[Union[model.Task, Exception]]:
+        with self.session_factory() as db:
+            try:
+                tasks = insert_tasks(rows, db)
+                db.commit()
+                return tasks
+            except Exception:
+                db.rollback()
+                logger.warning("Batched insert of %d tasks failed, retrying row by row", len(rows), exc_info=True)
+            results: List[Union[model.Task, Exception]] = []
+            for row in rows:
+                try:
+                    results.append(insert_tasks([row], db)[0])
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    results.append(e)
+            return results
+
+
+task_writer = TaskWriteBatcher()
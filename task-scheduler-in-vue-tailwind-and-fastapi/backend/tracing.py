@@ -0,0 +1,407 @@
+"""OpenTelemetry-compatible request tracing
+
+Spans follow the OTLP data model and W3C ``traceparent`` propagation, so a
+trace started by the Vue client continues through the router, the service
+functions and every SQL statement. Finished spans go to an OTLP/HTTP
+collector (``TRACING_EXPORTER=otlp``, JSON encoding, endpoint from
+``OTEL_EXPORTER_OTLP_ENDPOINT``) or to a JSON-lines file for offline
+analysis (``TRACING_EXPORTER=file``, ``TRACING_FILE``). With no exporter
+configured every span is a no-op.
+"""
+import asyncio
+import contextvars
+import hashlib
+import inspect
+import json
+import logging
+import os
+import queue
+import random
+import re
+import secrets
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from fastapi.routing import APIRoute
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.jsonl")
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "1.0"))
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318").rstrip("/")
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "task-scheduler-api")
+
+# OTLP SpanKind values
+INTERNAL, SERVER, CLIENT = 1, 2, 3
+STATUS_OK, STATUS_ERROR = 1, 2
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns",
+                 "attributes", "status", "sampled")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], kind: int = INTERNAL,
+                 sampled: bool = True, start_ns: Optional[int] = None):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = {}
+        self.status = STATUS_OK
+        self.sampled = sampled
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException) -> None:
+        self.status = STATUS_ERROR
+        self.attributes["exception.type"] = type(error).__name__
+        self.attributes["exception.message"] = str(error)
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": self.status},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def parse_traceparent(header: Optional[str]):
+    """(trace_id, parent span id, sampled) from a W3C traceparent header"""
+    match = _TRACEPARENT.match(header.strip().lower()) if header else None
+    if match is None or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2), int(match.group(3), 16) & 1 == 1
+
+
+class FileExporter:
+    """Appends one OTLP-JSON span per line"""
+
+    def __init__(self, path: str = TRACING_FILE):
+        self.path = path
+
+    def export(self, spans: List[Span]) -> None:
+        with open(self.path, "a") as trace_file:
+            for span in spans:
+                trace_file.write(json.dumps({"serviceName": SERVICE_NAME, **span.to_otlp()}) + "\n")
+
+
+class OtlpHttpExporter:
+    """Posts spans to an OTLP/HTTP collector using the JSON encoding"""
+
+    def __init__(self, endpoint: str = OTLP_ENDPOINT, timeout: float = 5.0):
+        self.url = f"{endpoint}/v1/traces"
+        self.timeout = timeout
+
+    def export(self, spans: List[Span]) -> None:
+        body = {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+                "scopeSpans": [{"scope": {"name": "backend.tracing"}, "spans": [span.to_otlp() for span in spans]}],
+            }]
+        }
+        request = urllib.request.Request(self.url, data=json.dumps(body).encode(), method="POST",
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class BatchSpanProcessor:
+    """Exports finished spans from a background thread so requests never wait on I/O"""
+
+    def __init__(self, exporter, max_queue: int = 2048, max_batch: int = 512, interval: float = 2.0):
+        self.exporter = exporter
+        self.max_batch = max_batch
+        self.interval = interval
+        self._queue: "queue.Queue[Span]" = queue.Queue(max_queue)
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def on_end(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            metrics.increment("tracing.spans_dropped")
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            self.flush(batch)
+
+    def flush(self, batch: List[Span]) -> None:
+        try:
+            self.exporter.export(batch)
+            metrics.increment("tracing.spans_exported", len(batch))
+        except Exception as e:
+            metrics.increment("tracing.export_errors")
+            logger.warning("Exporting %d spans failed: %s", len(batch), e)
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Tracer:
+    def __init__(self, processor: Optional[BatchSpanProcessor] = None, sample_rate: float = TRACING_SAMPLE_RATE):
+        self.processor = processor
+        self.sample_rate = sample_rate
+
+    @property
+    def enabled(self) -> bool:
+        return self.processor is not None
+
+    @contextmanager
+    def span(self, name: str, kind: int = INTERNAL, attributes: Optional[Dict[str, Any]] = None,
+             traceparent: Optional[str] = None, start_ns: Optional[int] = None) -> Iterator[Optional[Span]]:
+        """Run the block inside a child of the current span (or a new trace)"""
+        if not self.enabled:
+            yield None
+            return
+        parent = _current_span.get()
+        if parent is not None:
+            span = Span(name, parent.trace_id, parent.span_id, kind, parent.sampled, start_ns)
+        else:
+            remote = parse_traceparent(traceparent)
+            if remote is not None:
+                span = Span(name, remote[0], remote[1], kind, remote[2], start_ns)
+            else:
+                span = Span(name, secrets.token_hex(16), None, kind, random.random() < self.sample_rate, start_ns)
+        span.attributes.update(attributes or {})
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end(span)
+
+    def end(self, span: Span) -> None:
+        span.end_ns = time.time_ns()
+        if span.sampled:
+            self.processor.on_end(span)
+
+
+def _processor_from_config() -> Optional[BatchSpanProcessor]:
+    if TRACING_EXPORTER == "otlp":
+        return BatchSpanProcessor(OtlpHttpExporter())
+    if TRACING_EXPORTER == "file":
+        return BatchSpanProcessor(FileExporter())
+    return None
+
+
+tracer = Tracer(_processor_from_config())
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator wrapping a sync or async function in a span"""
+    def decorate(function: Callable) -> Callable:
+        span_name = name or f"{function.__module__.rsplit('.', 1)[-1]}.{function.__name__}"
+        if asyncio.iscoroutinefunction(function):
+            @wraps(function)
+            async def run_async(*args, **kwargs):
+                with tracer.span(span_name):
+                    return await function(*args, **kwargs)
+            return run_async
+
+        @wraps(function)
+        def run(*args, **kwargs):
+            with tracer.span(span_name):
+                return function(*args, **kwargs)
+        return run
+    return decorate
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_fingerprint(statement: str) -> str:
+    """Short stable id for a SQL statement; bind values are already out of the text"""
+    normalized = _WHITESPACE.sub(" ", statement).strip()
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+def instrument_engine(engine) -> None:
+    """Open a CLIENT span around every statement the engine executes"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_statement(conn, cursor, statement, parameters, context, executemany):
+        if not tracer.enabled or _current_span.get() is None:
+            return
+        operation = statement.lstrip().split(" ", 1)[0].upper()
+        fingerprint = statement_fingerprint(statement)
+        span_context = tracer.span(f"db {operation}", CLIENT, {
+            "db.system": "postgresql",
+            "db.operation": operation,
+            "db.statement": _WHITESPACE.sub(" ", statement).strip()[:2048],
+            "db.statement.fingerprint": fingerprint,
+        })
+        span_context.__enter__()
+        conn.info.setdefault("tracing_spans", []).append(span_context)
+
+    def _finish_statement(conn, error: Optional[BaseException] = None):
+        spans = conn.info.get("tracing_spans")
+        if spans:
+            span_context = spans.pop()
+            if error is None:
+                span_context.__exit__(None, None, None)
+            else:
+                span_context.__exit__(type(error), error, None)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _end_statement(conn, cursor, statement, parameters, context, executemany):
+        _finish_statement(conn)
+
+    @event.listens_for(engine, "handle_error")
+    def _statement_failed(exception_context):
+        if exception_context.connection is not None:
+            _finish_statement(exception_context.connection, exception_context.original_exception)
+
+
+class TracedRoute(APIRoute):
+    """Route class adding handler, dependency and response serialization spans
+
+    The handler span covers the endpoint function; the serialization span
+    runs from the endpoint returning to the response being built, which is
+    where FastAPI validates ``response_model`` and encodes JSON.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, endpoint, **kwargs)
+        self.dependant.call = _traced_call(self.dependant.call, f"handler {self.name}", marks_return=True)
+        for dependency in self.dependant.dependencies:
+            # Generator dependencies (sessions) stay as they are; their teardown outlives the span
+            if not _is_generator(dependency.call):
+                dependency.call = _traced_call(dependency.call, f"dependency {dependency.call.__name__}")
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        path = self.path
+
+        async def traced_handler(request):
+            span = current_span()
+            if span is None:
+                return await handler(request)
+            span.name = f"{request.method} {path}"
+            span.set_attribute("http.route", path)
+            # A list rather than a plain value: sync endpoints run in a copied context
+            returned: List[int] = []
+            token = _endpoint_returned.set(returned)
+            try:
+                response = await handler(request)
+            finally:
+                _endpoint_returned.reset(token)
+            if returned:
+                with tracer.span("serialize response", start_ns=returned[-1]):
+                    pass
+            return response
+        return traced_handler
+
+
+_endpoint_returned: contextvars.ContextVar[Optional[List[int]]] = contextvars.ContextVar(
+    "endpoint_returned", default=None
+)
+
+
+def _traced_call(call: Callable, name: str, marks_return: bool = False) -> Callable:
+    def mark_return() -> None:
+        returned = _endpoint_returned.get()
+        if marks_return and returned is not None:
+            returned.append(time.time_ns())
+
+    if asyncio.iscoroutinefunction(call):
+        @wraps(call)
+        async def run_async(*args, **kwargs):
+            with tracer.span(name):
+                result = await call(*args, **kwargs)
+            mark_return()
+            return result
+        return run_async
+
+    @wraps(call)
+    def run(*args, **kwargs):
+        with tracer.span(name):
+            result = call(*args, **kwargs)
+        mark_return()
+        return result
+    return run
+
+
+def _is_generator(call: Callable) -> bool:
+    target = call if inspect.isfunction(call) else getattr(call, "__call__", None)
+    return inspect.isgeneratorfunction(target) or inspect.isasyncgenfunction(target)
+
+
+class TracingMiddleware:
+    """Server span per request, continuing the caller's trace from ``traceparent``"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = Headers(scope=scope).get("traceparent")
+        with tracer.span(f"{scope['method']} {scope['path']}", SERVER, {
+            "http.method": scope["method"],
+            "http.target": scope["path"],
+        }, traceparent=traceparent) as span:
+            async def send_with_trace(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.status = STATUS_ERROR
+                    MutableHeaders(scope=message).append("traceparent", span.traceparent)
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace)
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Parallel backup and restore of the task data
+
+Backups are directories of gzip-compressed binary COPY chunks, one per id
+range, plus a manifest.json with the schema revision, column lists, row
+counts and SHA-256 checksums:
+
+    python scripts/task_backup.py backup backups/2025-11-28 --jobs 4
+    python scripts/task_backup.py verify backups/2025-11-28
+    python scripts/task_backup.py restore backups/2025-11-28 --jobs 4 [--truncate]
+
+All backup workers read from one exported snapshot, so the chunks are
+consistent with each other. Restore verifies every checksum first, drops the
+secondary indexes and foreign keys of the restored tables, loads the chunks
+in parallel, then rebuilds the indexes in parallel, re-adds the foreign keys
+and resets the id sequences. The target database must be migrated to the
+same Alembic revision as the source.
+
+Before dropping anything, restore writes the statements that put the schema
+back to restore-schema.sql in the backup directory. The file is removed once
+the restore finishes; if it is still there, finish by hand with
+``psql -f restore-schema.sql``.
+
+Script connections run without statement_timeout and lock_timeout, so long
+COPY chunks and index builds are not cut off by role or database defaults.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+MANIFEST = "manifest.json"
+SCHEMA_DDL = "restore-schema.sql"
+FORMAT_VERSION = 1
+
+# Restore order; later tables reference earlier ones
+TABLES = ("tag", "task_series", "task")
+
+DEFAULT_CHUNK_ROWS = 250_000
+DEFAULT_COMPRESS_LEVEL = 3
+
+
+def id_ranges(min_id: Optional[int], max_id: Optional[int], rows: int, chunk_rows: int) -> List[Tuple[int, int]]:
+    """Half-open ``[start, end)`` id ranges of roughly ``chunk_rows`` rows each"""
+    if min_id is None or rows == 0:
+        return []
+    chunks = max(1, math.ceil(rows / chunk_rows))
+    step = max(1, math.ceil((max_id - min_id + 1) / chunks))
+    return [(start, min(start + step, max_id + 1)) for start in range(min_id, max_id + 1, step)]
+
+
+def sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_name(table: str, start: int, end: int) -> str:
+    return f"{table}.{start:012d}-{end:012d}.copy.gz"
+
+
+def quoted(columns: List[str]) -> str:
+    return ", ".join(f'"{column}"' for column in columns)
+
+
+def connect():
+    """A raw psycopg2 connection using the application's database settings"""
+    from backend import db
+    connection = db.engine.raw_connection()
+    # Session settings must not leak back into the application's pool
+    connection.detach()
+    connection = connection.dbapi_connection
+    with connection.cursor() as cursor:
+        cursor.execute("SET statement_timeout = 0")
+        cursor.execute("SET lock_timeout = 0")
+    connection.commit()
+    return connection
+
+
+def run_parallel(jobs: int, work: Callable, items: List) -> List:
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(work, items))
+
+
+# Backup
+
+def table_columns(cursor, table: str) -> List[str]:
+    cursor.execute(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = %s ORDER BY ordinal_position",
+        (table,),
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def alembic_revision(cursor) -> Optional[str]:
+    cursor.execute("SELECT to_regclass('alembic_version') IS NOT NULL")
+    if not cursor.fetchone()[0]:
+        return None
+    cursor.execute("SELECT version_num FROM alembic_version")
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def backup(directory: Path, jobs: int, chunk_rows: int, compress_level: int) -> Dict:
+    directory.mkdir(parents=True, exist_ok=False)
+    started = time.monotonic()
+
+    # The leader holds the snapshot open until every worker has imported it
+    leader = connect()
+    leader.set_session(isolation_level="REPEATABLE READ", readonly=True)
+    cursor = leader.cursor()
+    cursor.execute("SELECT pg_export_snapshot()")
+    snapshot = cursor.fetchone()[0]
+
+    manifest = {
+        "format": FORMAT_VERSION,
+        "createdAt": datetime.utcnow().isoformat() + "Z",
+        "alembicRevision": alembic_revision(cursor),
+        "tables": [],
+    }
+    work = []
+    for table in TABLES:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (table,))
+        if not cursor.fetchone()[0]:
+            continue
+        cursor.execute(f"SELECT min(id), max(id), count(*) FROM {table}")
+        min_id, max_id, rows = cursor.fetchone()
+        entry = {"name": table, "columns": table_columns(cursor, table), "rows": rows, "chunks": []}
+        manifest["tables"].append(entry)
+        for start, end in id_ranges(min_id, max_id, rows, chunk_rows):
+            work.append((entry, start, end))
+
+    def dump_chunk(item) -> Dict:
+        entry, start, end = item
+        connection = connect()
+        try:
+            connection.set_session(isolation_level="REPEATABLE READ", readonly=True)
+            with connection.cursor() as worker:
+                worker.execute("SET TRANSACTION SNAPSHOT %s", (snapshot,))
+                name = chunk_name(entry["name"], start, end)
+                with gzip.open(directory / name, "wb", compresslevel=compress_level) as target:
+                    worker.copy_expert(
+                        f"COPY (SELECT {quoted(entry['columns'])} FROM {entry['name']} "
+                        f"WHERE id >= {start} AND id < {end} ORDER BY id) TO STDOUT WITH (FORMAT binary)",
+                        target,
+                    )
+                    rows = worker.rowcount
+            connection.rollback()
+        finally:
+            connection.close()
+        return {"file": name, "idFrom": start, "idTo": end, "rows": rows,
+                "bytes": (directory / name).stat().st_size, "sha256": sha256_file(directory / name)}
+
+    try:
+        chunks = run_parallel(jobs, dump_chunk, work)
+    finally:
+        leader.rollback()
+        leader.close()
+
+    for (entry, _, _), chunk in zip(work, chunks):
+        entry["chunks"].append(chunk)
+    for entry in manifest["tables"]:
+        copied = sum(chunk["rows"] for chunk in entry["chunks"])
+        if copied != entry["rows"]:
+            raise RuntimeError(f"{entry['name']}: copied {copied} rows, expected {entry['rows']}")
+    (directory / MANIFEST).write_text(json.dumps(manifest, indent=2))
+    manifest["seconds"] = round(time.monotonic() - started, 1)
+    return manifest
+
+
+# Restore
+
+def load_manifest(directory: Path) -> Dict:
+    manifest = json.loads((directory / MANIFEST).read_text())
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported backup format: {manifest.get('format')}")
+    return manifest
+
+
+def verify(directory: Path, jobs: int = 4) -> List[str]:
+    """Names of chunk files that are missing or do not match their checksum"""
+    manifest = load_manifest(directory)
+    chunks = [chunk for table in manifest["tables"] for chunk in table["chunks"]]
+
+    def damaged(chunk) -> bool:
+        path = directory / chunk["file"]
+        return not path.is_file() or sha256_file(path) != chunk["sha256"]
+
+    return [chunk["file"] for chunk, bad in zip(chunks, run_parallel(jobs, damaged, chunks)) if bad]
+
+
+def deferrable_indexes(cursor, table: str) -> List[Tuple[str, str]]:
+    """(name, definition) of indexes that do not back a constraint"""
+    cursor.execute(
+        "SELECT i.relname, pg_get_indexdef(i.oid) FROM pg_index x "
+        "JOIN pg_class i ON i.oid = x.indexrelid "
+        "WHERE x.indrelid = to_regclass(%s) "
+        "AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.oid)",
+        (table,),
+    )
+    return cursor.fetchall()
+
+
+def foreign_keys(cursor, table: str) -> List[Tuple[str, str]]:
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+        (table,),
+    )
+    return cursor.fetchall()
+
+
+def schema_ddl(indexes: List[Tuple[str, str]], keys: List[Tuple[str, str, str]]) -> List[str]:
+    """Statements recreating dropped indexes and foreign keys; indexes can be rerun"""
+    statements = [definition.replace(" INDEX ", " INDEX IF NOT EXISTS ", 1) for _, definition in indexes]
+    return statements + [f'ALTER TABLE {table} ADD CONSTRAINT "{name}" {definition}' for table, name, definition in keys]
+
+
+def restore(directory: Path, jobs: int, truncate: bool = False) -> Dict:
+    started = time.monotonic()
+    manifest = load_manifest(directory)
+    damaged = verify(directory, jobs)
+    if damaged:
+        raise RuntimeError(f"Checksum mismatch or missing chunks: {', '.join(damaged)}")
+
+    tables = [entry["name"] for entry in manifest["tables"]]
+    connection = connect()
+    cursor = connection.cursor()
+    revision = alembic_revision(cursor)
+    if revision != manifest["alembicRevision"]:
+        raise RuntimeError(f"Target is at revision {revision}, backup was taken at {manifest['alembicRevision']}")
+    if truncate:
+        cursor.execute(f"TRUNCATE {', '.join(tables)} RESTART IDENTITY CASCADE")
+    for table in tables:
+        cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {table})")
+        if cursor.fetchone()[0]:
+            raise RuntimeError(f"Table {table} is not empty; use --truncate to replace its rows")
+
+    # Rows load much faster without index maintenance; primary keys stay
+    indexes = [index for table in tables for index in deferrable_indexes(cursor, table)]
+    keys = [(table, *key) for table in tables for key in foreign_keys(cursor, table)]
+    statements = schema_ddl(indexes, keys)
+    ddl_file = directory / SCHEMA_DDL
+    ddl_file.write_text("".join(f"{statement};\n" for statement in statements))
+    for table, name, _ in keys:
+        # Quoted: generated names such as task_seriesId_fkey keep their case
+        cursor.execute(f'ALTER TABLE {table} DROP CONSTRAINT "{name}"')
+    for name, _ in indexes:
+        cursor.execute(f'DROP INDEX "{name}"')
+    connection.commit()
+
+    def load_chunk(item) -> int:
+        entry, chunk = item
+        worker = connect()
+        try:
+            with worker.cursor() as copy, gzip.open(directory / chunk["file"], "rb") as source:
+                copy.execute("SET LOCAL synchronous_commit = off")
+                copy.copy_expert(
+                    f"COPY {entry['name']} ({quoted(entry['columns'])}) FROM STDIN WITH (FORMAT binary)", source
+                )
+            worker.commit()
+        finally:
+            worker.close()
+        return chunk["rows"]
+
+    def run_ddl(statement: str) -> None:
+        worker = connect()
+        try:
+            with worker.cursor() as ddl:
+                ddl.execute(statement)
+            worker.commit()
+        finally:
+            worker.close()
+
+    def rebuild_schema() -> None:
+        run_parallel(jobs, run_ddl, statements[:len(indexes)])
+        for statement in statements[len(indexes):]:
+            cursor.execute(statement)
+        connection.commit()
+
+    try:
+        rows = sum(run_parallel(jobs, load_chunk, [(entry, chunk) for entry in manifest["tables"]
+                                                   for chunk in entry["chunks"]]))
+    except Exception:
+        # Put the schema back even when loading failed, without hiding why it failed
+        connection.rollback()
+        try:
+            rebuild_schema()
+        except Exception as e:
+            print(f"Rebuilding indexes and foreign keys failed: {e}\nFinish with psql -f {ddl_file}",
+                  file=sys.stderr)
+        else:
+            ddl_file.unlink()
+        raise
+    try:
+        rebuild_schema()
+    except Exception:
+        print(f"Rebuilding indexes and foreign keys failed; finish with psql -f {ddl_file}", file=sys.stderr)
+        raise
+    ddl_file.unlink()
+
+    for table in tables:
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), coalesce(max(id), 0) + 1, false) FROM {table}"
+        )
+        cursor.execute(f"ANALYZE {table}")
+    connection.commit()
+    connection.close()
+    return {"tables": tables, "rows": rows, "indexesRebuilt": len(indexes),
+            "seconds": round(time.monotonic() - started, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel binary COPY backup and restore of the task data")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backup_parser = commands.add_parser("backup", help="Write a new backup directory")
+    backup_parser.add_argument("directory", type=Path)
+    backup_parser.add_argument("--jobs", type=int, default=os.cpu_count() or 4)
+    backup_parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    backup_parser.add_argument("--compress-level", type=int, default=DEFAULT_COMPRESS_LEVEL, choices=range(1, 10))
+
+    verify_parser = commands.add_parser("verify", help="Check the chunk checksums of a backup")
+    verify_parser.add_argument("directory", type=Path)
+
+    restore_parser = commands.add_parser("restore", help="Load a backup into empty tables")
+    restore_parser.add_argument("directory", type=Path)
+    restore_parser.add_argument("--jobs", type=int, default=os.cpu_count() or 4)
+    restore_parser.add_argument("--truncate", action="store_true", help="Delete existing rows first")
+
+    args = parser.parse_args()
+    if args.command == "backup":
+        manifest = backup(args.directory, args.jobs, args.chunk_rows, args.compress_level)
+        chunks = sum(len(table["chunks"]) for table in manifest["tables"])
+        tables = ", ".join(f"{table['name']}: {table['rows']} rows" for table in manifest["tables"])
+        print(f"Backed up {tables} in {chunks} chunks, {manifest['seconds']}s")
+    elif args.command == "verify":
+        damaged = verify(args.directory)
+        if damaged:
+            print("Damaged or missing chunks:\n" + "\n".join(damaged))
+            sys.exit(1)
+        print("All chunks match the manifest")
+    else:
+        result = restore(args.directory, args.jobs, args.truncate)
+        print(f"Restored {result['rows']} rows into {', '.join(result['tables'])}, "
+              f"rebuilt {result['indexesRebuilt']} indexes, {result['seconds']}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,24 @@
-from fastapi import FastAPI, BackgroundTasks, Request, status
+from fastapi import FastAPI, BackgroundTasks, Depends, Request, status
 from fastapi.responses import JSONResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
+from sqlalchemy.orm import Session
+
+from backend import db
+from backend.admission import ADMISSION_CONTROL_ENABLED, AdmissionControlMiddleware, limiter
+from backend.metrics import metrics
+from backend.profiling import ProfilingMiddleware, require_admin, router as profiling_router
+from backend.query_stats import QUERY_STATS_HEADER_NAMES, QUERY_STATS_HEADERS, QueryStatsMiddleware
+from backend.static import STATIC_SERVING_ENABLED, ApiPrefixMiddleware, ClientStaticFiles
 from backend.tasks import router as task_router
+from backend.tasks.facet_index import facet_index, facet_index_builder, FACET_INDEX_ENABLED
+from backend.tasks.rollups import ROLLUPS_ENABLED, rollup_folder
+from backend.tasks.statements import filter_flights, plan_time_stats
+from backend.tasks.task_cache import TASK_CACHE_ENABLED, invalidation_listener, invalidation_publisher, task_cache
+from backend.tracing import TracingMiddleware
 
 app = FastAPI(title="Fast API Scheduler",
     docs_url="/docs",
@@ -14,15 +27,81 @@ app = FastAPI(title="Fast API Scheduler",
 
 origins = ["http://localhost:8080","http://127.0.0.1:8080","http://localhost:3000",]
 
+if QUERY_STATS_HEADERS:
+    app.add_middleware(QueryStatsMiddleware)
+
+app.add_middleware(ProfilingMiddleware)
+
+# Added before CORS so shed responses still carry CORS headers
+if ADMISSION_CONTROL_ENABLED:
+    app.add_middleware(AdmissionControlMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["traceparent", *(QUERY_STATS_HEADER_NAMES if QUERY_STATS_HEADERS else [])],
 )
 
+# Outside admission and CORS, so the server span covers queueing too
+app.add_middleware(TracingMiddleware)
+
+if STATIC_SERVING_ENABLED:
+    app.add_middleware(ApiPrefixMiddleware)
+
 app.include_router(task_router.router)
+app.include_router(profiling_router)
+
+
+@app.on_event("startup")
+def build_facet_index():
+    # Filters are answered from Postgres until the first build is ready
+    if FACET_INDEX_ENABLED:
+        facet_index_builder.start()
+
+
+@app.on_event("shutdown")
+def stop_facet_index_builder():
+    facet_index_builder.stop()
+
+
+@app.on_event("startup")
+def listen_for_task_cache_invalidations():
+    if FACET_INDEX_ENABLED:
+        invalidation_listener.receivers.append(facet_index)
+    if TASK_CACHE_ENABLED or FACET_INDEX_ENABLED:
+        invalidation_listener.start()
+
+
+@app.on_event("shutdown")
+def stop_task_cache_listener():
+    invalidation_listener.stop()
+    invalidation_publisher.close()
+
+
+@app.on_event("startup")
+def fold_task_rollups():
+    if ROLLUPS_ENABLED:
+        rollup_folder.start()
+
+
+@app.on_event("shutdown")
+def stop_task_rollups():
+    rollup_folder.stop()
+
+
+# Same X-Admin-Token as /admin/profiles; off unless PROFILE_ADMIN_TOKEN is set
+@app.get("/metrics", dependencies=[Depends(require_admin)])
+def get_metrics(database: Session = Depends(db.get_db)):
+    return {
+        **metrics.snapshot(),
+        "admission": limiter.snapshot(),
+        "filterCoalescing": filter_flights.snapshot(),
+        "taskCache": task_cache.snapshot(),
+        "statementPlanning": plan_time_stats(database),
+    }
 
 
 def write_notification(email: str, message=""):
@@ -37,16 +116,9 @@ async def send_notification(email: str, background_tasks: BackgroundTasks):
     return {"message": "Notification sent in the background"}
 
 
-# app.mount("/client", StaticFiles(directory="client/dist"), name="static")
-
-# templates = Jinja2Templates(directory="client/dist")
-
-
-# @app.get("/{full_path:path}")
-# async def serve_vue_app(request: Request, full_path: str):
-#     """Serve the vue app bootstrapped by Vite
-#     """
-#     return templates.TemplateResponse("index.html", {"request": request})
+# Mounted last so every API route takes precedence over client paths
+if STATIC_SERVING_ENABLED:
+    app.mount("/", ClientStaticFiles(), name="client")
 
 
 # @app.get("/")
@@ -16,6 +16,9 @@ from sqlalchemy.pool import StaticPool
 from main import app
 from backend import db
 from backend.tasks import model
+from backend.metrics import record_compiled_cache
+from backend.query_stats import record_statements
+from backend.tasks.task_cache import task_cache
 
 # Test database configuration - use PostgreSQL in Docker, SQLite locally
 def get_test_database_url():
@@ -45,6 +48,10 @@ else:
     # PostgreSQL configuration
     engine = create_engine(SQLALCHEMY_DATABASE_URL)
 
+# Lets tests/integration hold endpoints to statement budgets
+record_statements(engine)
+record_compiled_cache(engine)
+
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
@@ -75,6 +82,8 @@ def db_session():
     finally:
         session.close()
         model.Base.metadata.drop_all(bind=engine)
+        # Ids are reused once the tables are recreated
+        task_cache.clear()
 
 
 @pytest.fixture(scope="function")
@@ -0,0 +1,24 @@
+from contextlib import contextmanager
+
+import pytest
+
+from backend import query_stats
+
+
+@contextmanager
+def assert_query_budget(statements: int, rows: int = None):
+    """Fail when the block executes more statements (or rows) than budgeted"""
+    with query_stats.capture() as stats:
+        yield stats
+    executed = "\n".join(f"  {statement}" for statement in stats.executed)
+    assert stats.statements <= statements, (
+        f"Expected at most {statements} statements, {stats.statements} were executed:\n{executed}"
+    )
+    if rows is not None:
+        assert stats.rows <= rows, f"Expected at most {rows} rows, {stats.rows} were read or written"
+
+
+@pytest.fixture
+def query_budget():
+    """``with query_budget(1): client.get(...)`` asserts the request's statement budget"""
+    return assert_query_budget
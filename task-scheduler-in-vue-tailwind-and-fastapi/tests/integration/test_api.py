@@ -1,3 +1,7 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
 import pytest
 from datetime import date
 
@@ -48,6 +52,201 @@ class TestTaskAPI:
         assert data[0]["id"] == sample_task.id
         assert data[0]["title"] == "Sample Task"
 
+    def test_get_tasks_endpoint_filtered_page(self, client, sample_task):
+        """Test GET /tasks with filter or paging parameters returns a page"""
+        response = client.get("/tasks/", params={"status": "pending", "page_size": 5})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["totalCount"] == 1
+        assert data["pageSize"] == 5
+        assert data["tasks"][0]["id"] == sample_task.id
+
+    def test_get_tasks_endpoint_sparse_fields(self, client, sample_task):
+        """Test GET /tasks?fields= returns only the requested fields"""
+        response = client.get("/tasks/", params={"fields": "id,title"})
+
+        assert response.status_code == 200
+        assert response.json()["tasks"] == [{"id": sample_task.id, "title": "Sample Task"}]
+
+    def test_get_tasks_endpoint_invalid_filter(self, client):
+        """Test GET /tasks validates filter parameters"""
+        response = client.get("/tasks/", params={"fields": "id,secret"})
+
+        assert response.status_code == 422
+
+    def test_identical_filter_requests_share_one_execution(self, client, sample_task, monkeypatch):
+        """Test concurrent identical GET /tasks?status=&sort_by= requests run the filter query once"""
+        from backend import profiling
+        from backend.tasks import services
+        from backend.tasks.statements import filter_flights
+
+        followers = 3
+        executed, coalesced = filter_flights.executed, filter_flights.coalesced
+        filtered_tasks = services._filtered_tasks
+
+        def held_filtered_tasks(filters, db, wire=False):
+            # Keep the leader in flight until the other requests have joined it
+            deadline = time.monotonic() + 5
+            while filter_flights.coalesced < coalesced + followers and time.monotonic() < deadline:
+                time.sleep(0.01)
+            return filtered_tasks(filters, db, wire)
+
+        monkeypatch.setattr(services, "_filtered_tasks", held_filtered_tasks)
+        params = {"status": "pending", "sort_by": "dueDate"}
+        with ThreadPoolExecutor(followers + 1) as pool:
+            responses = list(pool.map(lambda _: client.get("/tasks/", params=params), range(followers + 1)))
+
+        assert [response.status_code for response in responses] == [200] * (followers + 1)
+        assert all(response.json() == responses[0].json() for response in responses)
+        assert responses[0].json()["tasks"][0]["id"] == sample_task.id
+        assert filter_flights.executed == executed + 1
+        assert filter_flights.coalesced == coalesced + followers
+
+        monkeypatch.setattr(profiling, "PROFILE_ADMIN_TOKEN", "secret")
+        coalescing = client.get("/metrics", headers={"X-Admin-Token": "secret"}).json()["filterCoalescing"]
+        assert coalescing["coalesced"] == filter_flights.coalesced
+        assert coalescing["inFlight"] == 0
+
+    def test_facet_filters_answered_from_index(self, client, db_session, sample_task, sample_task_data, monkeypatch):
+        """Test GET /tasks?status= and /tasks/filter-options follow writes through the facet index"""
+        from backend.metrics import metrics
+        from backend.tasks import services
+        from backend.tasks.facet_index import facet_index
+
+        monkeypatch.setattr(services, "FACET_INDEX_ENABLED", True)
+        # Restored on teardown, so later tests go back to the SQL path
+        monkeypatch.setattr(facet_index, "ready", False)
+        facet_index.rebuild(db_session)
+
+        created = client.post("/tasks/", json=sample_task_data).json()
+        client.patch(f"/tasks/{sample_task.id}", json={"status": "completed"})
+
+        def statement_lookups():
+            counters = metrics.snapshot()["counters"]
+            return sum(counters.get(f"tasks.filter_statements.{name}", 0) for name in ("hits", "misses"))
+
+        lookups = statement_lookups()
+        response = client.get("/tasks/", params={"status": "pending"})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["totalCount"] == 1
+        assert [task["id"] for task in data["tasks"]] == [created["id"]]
+        # Answered from the index, without building a filter statement
+        assert statement_lookups() == lookups
+
+        options = client.get("/tasks/filter-options")
+        assert options.status_code == 200
+        statuses = {option["value"]: option["count"] for option in options.json()["statuses"]}
+        assert statuses == {"pending": 1, "completed": 1}
+
+    def test_filter_statements_reused_across_values(self, client, sample_task, monkeypatch):
+        """Test GET /tasks requests with the same filter shape share one statement and its compiled form"""
+        from backend import profiling
+        from backend.tasks.statements import filter_statement_cache
+
+        filter_statement_cache.clear()
+        monkeypatch.setattr(profiling, "PROFILE_ADMIN_TOKEN", "secret")
+
+        def counters():
+            return client.get("/metrics", headers={"X-Admin-Token": "secret"}).json()["counters"]
+
+        def lookups(counts):
+            return counts.get("tasks.filter_statements.hits", 0), counts.get("tasks.filter_statements.misses", 0)
+
+        # Compile everything the first request and /metrics itself run
+        counters()
+        client.get("/tasks/", params={"status": "pending", "sort_by": "dueDate"})
+        first = counters()
+        response = client.get("/tasks/", params={"status": "completed", "sort_by": "dueDate"})
+        second = counters()
+
+        assert response.json()["totalCount"] == 0
+        assert lookups(second) == (lookups(first)[0] + 1, lookups(first)[1])
+        assert len(filter_statement_cache) == 1
+        # count and page were compiled for the first request and reused by the engine for the second
+        assert second.get("db.compiled_cache.misses", 0) == first.get("db.compiled_cache.misses", 0)
+        assert second["db.compiled_cache.hits"] >= first.get("db.compiled_cache.hits", 0) + 2
+
+    def test_filtered_list_query_cancelled_at_deadline(self, client, db_session, sample_task, monkeypatch):
+        """Test GET /tasks?status= runs under the list deadline and answers 504 when it is hit"""
+        from sqlalchemy import text
+        from backend.deadlines import LIST_TIMEOUT_MS
+        from backend.tasks import services
+
+        timeouts = []
+
+        def slow_filtered_tasks(filters, db, wire=False):
+            timeouts.append(db.execute(text("SELECT current_setting('statement_timeout')::interval")).scalar())
+            # Shorter than LIST_TIMEOUT_MS so the test does not wait for the real deadline
+            db.execute(text("SELECT set_config('statement_timeout', '50', true)"))
+            db.execute(text("SELECT pg_sleep(1)"))
+
+        monkeypatch.setattr(services, "_filtered_tasks", slow_filtered_tasks)
+        # The deadline is applied when the request's transaction begins, not in one the fixtures left open
+        db_session.commit()
+        response = client.get("/tasks/", params={"status": "pending"})
+
+        assert timeouts == [timedelta(milliseconds=LIST_TIMEOUT_MS)]
+        assert response.status_code == 504
+        assert f"{LIST_TIMEOUT_MS} ms deadline" in response.json()["detail"]
+
+        # get_db would have closed the request's session; the shared test session is rolled back by hand
+        db_session.rollback()
+        monkeypatch.undo()
+        assert client.get("/tasks/", params={"status": "pending"}).json()["totalCount"] == 1
+
+    def test_series_occurrences_merged_into_listing(self, client, sample_task):
+        """Test GET /tasks?due_date_to= lists series occurrences among stored tasks in due date order"""
+        created = client.post("/tasks/series", json={
+            "title": "Weekly review",
+            "rrule": "FREQ=WEEKLY;BYDAY=MO",
+            "dtstart": "2024-12-02T00:00:00",
+        })
+        assert created.status_code == 201
+        series_id = created.json()["id"]
+
+        edited = client.patch(f"/tasks/series/{series_id}/occurrences/2024-12-09T00:00:00",
+                              json={"status": "completed"})
+        assert edited.status_code == 200
+
+        response = client.get("/tasks/", params={
+            "due_date_from": "2024-12-01", "due_date_to": "2025-01-01", "sort_by": "dueDate", "sort_order": "asc",
+        })
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["totalCount"] == 6
+        assert data["truncated"] is False
+        assert [(task["dueDate"][:10], task["id"]) for task in data["tasks"]] == [
+            ("2024-12-02", None),
+            ("2024-12-09", edited.json()["id"]),
+            ("2024-12-16", None),
+            ("2024-12-23", None),
+            ("2024-12-30", None),
+            ("2024-12-31", sample_task.id),
+        ]
+        assert all(task["seriesId"] == series_id for task in data["tasks"][:5])
+
+        # Unbounded listings show stored tasks only
+        assert client.get("/tasks/", params={"status": "pending"}).json()["totalCount"] == 1
+
+    def test_filtered_list_as_msgpack(self, client, sample_task):
+        """Test GET /tasks?status= with Accept: application/msgpack returns a column-oriented page"""
+        import msgpack
+
+        response = client.get("/tasks/", params={"status": "pending", "fields": "id,title"},
+                              headers={"Accept": "application/msgpack"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/msgpack"
+        assert response.headers["vary"] == "Accept"
+        data = msgpack.unpackb(response.content)
+        assert data["totalCount"] == 1
+        assert data["columns"] == ["id", "title"]
+        assert data["rows"] == [[sample_task.id, "Sample Task"]]
+
     def test_get_task_by_id_endpoint_success(self, client, sample_task):
         """Test GET /tasks/{task_id} endpoint success"""
         response = client.get(f"/tasks/{sample_task.id}")
@@ -156,6 +355,18 @@ class TestTaskAPI:
         verify_response = client.get(f"/tasks/{task_id}")
         assert verify_response.status_code == 404
 
+    def test_metrics_require_admin_token(self, client, monkeypatch):
+        """Test metrics are hidden unless an admin token is configured and sent"""
+        from backend import profiling
+
+        assert client.get("/metrics").status_code == 404
+
+        monkeypatch.setattr(profiling, "PROFILE_ADMIN_TOKEN", "secret")
+        assert client.get("/metrics").status_code == 403
+        response = client.get("/metrics", headers={"X-Admin-Token": "secret"})
+        assert response.status_code == 200
+        assert "statementPlanning" in response.json()
+
     def test_get_multiple_tasks(self, client, db_session):
         """Test getting multiple tasks"""
         from datetime import datetime
@@ -0,0 +1,61 @@
+import pytest
+
+from backend.tasks import schema
+
+
+@pytest.mark.integration
+class TestQueryBudgets:
+    """Statements per request for the task endpoints; raise a budget only on purpose.
+
+    Budgets leave room for the set_config call that starts a transaction
+    with a route's statement_timeout.
+    """
+
+    def test_listing_budget(self, client, sample_task, query_budget):
+        with query_budget(2):
+            response = client.get("/tasks/")
+        assert response.status_code == 200
+        assert isinstance(response.json(), list)
+
+    def test_filtered_listing_budget(self, client, sample_task, query_budget):
+        # count, page
+        with query_budget(3):
+            response = client.get("/tasks/", params={"status": "pending", "sort_by": "dueDate"})
+        assert response.status_code == 200
+        # Fails if the request reaches the unfiltered listing instead
+        page = schema.PaginatedTaskResponse(**response.json())
+        assert page.totalCount == 1
+
+    def test_get_task_budget(self, client, sample_task, query_budget):
+        with query_budget(2):
+            response = client.get(f"/tasks/{sample_task.id}")
+        assert response.status_code == 200
+
+        # Served from the task cache
+        with query_budget(0):
+            client.get(f"/tasks/{sample_task.id}")
+
+    def test_create_task_budget(self, client, sample_task_data, query_budget):
+        # INSERT, rollup delta insert, refresh in a second transaction
+        with query_budget(5):
+            response = client.post("/tasks/", json=sample_task_data)
+        assert response.status_code == 201
+
+    def test_update_task_budget(self, client, sample_task, query_budget):
+        # SELECT, rollup delta insert, UPDATE, refresh in a second transaction
+        with query_budget(6):
+            response = client.patch(f"/tasks/{sample_task.id}", json={"status": "completed"})
+        assert response.status_code == 200
+
+    def test_delete_task_budget(self, client, sample_task, query_budget):
+        # DELETE ... RETURNING, rollup delta insert
+        with query_budget(3):
+            response = client.delete(f"/tasks/{sample_task.id}")
+        assert response.status_code == 204
+
+    def test_stats_budget(self, client, query_budget):
+        # Rollup aggregate; independent of the number of tasks
+        with query_budget(2):
+            response = client.get("/tasks/stats", params={"from": "2024-01-01", "to": "2024-12-31",
+                                                          "group_by": "status"})
+        assert response.status_code == 200
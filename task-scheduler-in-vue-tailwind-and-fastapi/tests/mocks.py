@@ -3,6 +3,7 @@ Mock utilities for testing
 """
 from unittest.mock import MagicMock
 from datetime import datetime, date
+from sqlalchemy.dialects import postgresql
 from backend.tasks import model, schema
 
 
@@ -116,6 +117,71 @@ def create_mock_db_session():
     return MockDatabase()
 
 
+class FakeResult:
+    """Stand-in for a SQLAlchemy result in unit tests"""
+
+    def __init__(self, rows=(), rowcount=0, value=None):
+        self.rows = list(rows)
+        self.rowcount = rowcount
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class FakeSession:
+    """Session stand-in for unit tests of code that builds its own statements
+
+    Every statement is compiled for Postgres and recorded in ``executed`` as
+    ``(sql, params)``, then answered by ``respond``: by default with
+    ``results`` in order and empty results after them. Override ``respond``
+    when the answer depends on the statement.
+    """
+
+    def __init__(self, results=(), info=None, bind=None):
+        self.results = list(results)
+        self.info = dict(info or {})
+        self.bind = bind
+        self.executed = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def execute(self, statement, params=None):
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        self.executed.append((sql, params))
+        return self.respond(sql, statement, params)
+
+    def respond(self, sql, statement, params):
+        return self.results.pop(0) if self.results else FakeResult()
+
+    def get_bind(self):
+        return self.bind
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
 def setup_axios_mock(mock_axios):
     """Setup axios mock with common responses"""
     # Setup default responses
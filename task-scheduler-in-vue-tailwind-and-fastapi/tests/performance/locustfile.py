@@ -38,6 +38,12 @@ class TaskSchedulerUser(HttpUser):
         task_id = getattr(self, 'task_id', random.randint(1, 100))
         self.client.get(f"/tasks/{task_id}")
 
+    @task(1)
+    def get_tasks_batch(self):
+        """Get several linked tasks in one request"""
+        ids = ",".join(str(random.randint(1, 100)) for _ in range(10))
+        self.client.get(f"/tasks/batch?ids={ids}", name="/tasks/batch")
+
     @task(1)
     def update_task(self):
         """Update an existing task"""
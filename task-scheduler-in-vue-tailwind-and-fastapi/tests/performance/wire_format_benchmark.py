@@ -0,0 +1,92 @@
+"""Payload size and encode/decode time of the task list response formats
+
+Compares the default JSON response (pydantic validation, jsonable_encoder,
+json.dumps) with the MessagePack and Arrow IPC encodings served for
+``Accept: application/msgpack`` and ``application/vnd.apache.arrow.stream``:
+
+    python tests/performance/wire_format_benchmark.py --tasks 20000 --repeat 5
+
+Formats whose library is not installed are skipped.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from fastapi.encoders import jsonable_encoder
+
+from backend.tasks import formats, schema
+from backend.tasks.formats import WIRE_FIELDS
+
+
+STATUSES = ["pending", "in-progress", "completed"]
+PRIORITIES = ["low", "medium", "high", "urgent"]
+TAGS = ["work", "personal", "urgent", "review", "backend", "frontend", "ops"]
+
+
+def make_rows(count: int):
+    rng = random.Random(42)
+    start = datetime(2025, 1, 1, 9)
+    rows = []
+    for task_id in range(1, count + 1):
+        created = start + timedelta(minutes=rng.randrange(500_000))
+        completed = created + timedelta(hours=rng.randrange(1, 400)) if rng.random() < 0.3 else None
+        rows.append((task_id, f"Task {task_id} {rng.choice(TAGS)} follow-up", "Description " * rng.randrange(1, 6),
+                     "completed" if completed else rng.choice(STATUSES[:2]), rng.choice(PRIORITIES),
+                     rng.sample(TAGS, rng.randrange(0, 3)), created, created + timedelta(days=rng.randrange(1, 30)),
+                     completed, None, None))
+    return rows
+
+
+def best_of(repeat: int, work) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        work()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.tasks)
+    envelope = {"totalCount": len(rows), "filteredCount": len(rows), "page": 1,
+                "pageSize": len(rows), "totalPages": 1}
+    dicts = [dict(zip(WIRE_FIELDS, row)) for row in rows]
+
+    def encode_json():
+        response = schema.PaginatedTaskResponse(tasks=dicts, **envelope)
+        return json.dumps(jsonable_encoder(response)).encode()
+
+    results = [("json", encode_json, json.loads)]
+    if formats.msgpack is not None:
+        results.append(("msgpack", lambda: formats.encode_msgpack(envelope, WIRE_FIELDS, rows),
+                        lambda payload: formats.msgpack.unpackb(payload, timestamp=3)))
+    if formats.pyarrow is not None:
+        results.append(("arrow", lambda: formats.encode_arrow(envelope, WIRE_FIELDS, rows),
+                        lambda payload: formats.pyarrow.ipc.open_stream(payload).read_all()))
+
+    print(f"{args.tasks} tasks, best of {args.repeat}")
+    print(f"{'format':<10}{'bytes':>12}{'encode ms':>12}{'decode ms':>12}")
+    for name, encode, decode in results:
+        payload = encode()
+        encode_seconds = best_of(args.repeat, encode)
+        decode_seconds = best_of(args.repeat, lambda: decode(payload))
+        print(f"{name:<10}{len(payload):>12}{encode_seconds * 1000:>12.2f}{decode_seconds * 1000:>12.2f}")
+    missing = [name for name, library in (("msgpack", formats.msgpack), ("pyarrow", formats.pyarrow))
+               if library is None]
+    if missing:
+        print(f"Skipped: {', '.join(missing)} not installed")
+
+
+if __name__ == "__main__":
+    main()
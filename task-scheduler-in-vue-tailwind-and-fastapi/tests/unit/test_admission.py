@@ -0,0 +1,89 @@
+import asyncio
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from backend.admission import HEAVY, READ, WRITE, AdaptiveLimiter, AdmissionControlMiddleware, classify
+
+
+@pytest.mark.unit
+class TestAdmissionControl:
+    """Unit tests for adaptive admission control"""
+
+    def test_routes_are_classified(self):
+        """Test filter and aggregate calls are heavy, lookups cheap"""
+        assert classify("GET", "/tasks/") == HEAVY
+        assert classify("GET", "/tasks/board") == HEAVY
+        assert classify("GET", "/tasks/stats") == HEAVY
+        assert classify("GET", "/tasks/suggest") == READ
+        assert classify("POST", "/tasks/batch") == READ
+        assert classify("POST", "/tasks/") == WRITE
+        assert classify("GET", "/tasks/42") == READ
+        assert classify("PATCH", "/tasks/42") == WRITE
+        assert classify("GET", "/metrics") is None
+
+    @pytest.mark.asyncio
+    async def test_heavy_calls_limited_to_their_share(self):
+        """Test heavy calls cannot take every slot"""
+        limiter = AdaptiveLimiter(initial_limit=4, max_wait=0.01)
+
+        admitted = [await limiter.acquire(HEAVY) for _ in range(3)]
+
+        assert admitted == [True, True, False]
+        assert await limiter.acquire(READ)
+
+    @pytest.mark.asyncio
+    async def test_freed_slot_goes_to_reads_first(self):
+        """Test a queued read is admitted before an earlier queued heavy call"""
+        limiter = AdaptiveLimiter(initial_limit=4, min_limit=4, max_limit=4, max_wait=1)
+        for admission_class in (READ, READ, HEAVY, HEAVY):
+            assert await limiter.acquire(admission_class)
+
+        heavy = asyncio.ensure_future(limiter.acquire(HEAVY))
+        read = asyncio.ensure_future(limiter.acquire(READ))
+        await asyncio.sleep(0)
+        limiter.release(READ, 0.01)
+
+        assert await asyncio.wait_for(read, 1)
+        assert not heavy.done()
+        heavy.cancel()
+        await asyncio.gather(heavy, return_exceptions=True)
+
+    @pytest.mark.asyncio
+    async def test_full_queue_sheds(self):
+        """Test requests beyond the wait queue are rejected at once"""
+        limiter = AdaptiveLimiter(initial_limit=1, min_limit=1, max_queue=1, max_wait=1)
+        assert await limiter.acquire(READ)
+        queued = asyncio.ensure_future(limiter.acquire(READ))
+        await asyncio.sleep(0)
+
+        assert not await limiter.acquire(READ)
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+
+    def test_limit_shrinks_when_latency_climbs(self):
+        """Test the limit follows latency down and back up"""
+        limiter = AdaptiveLimiter(initial_limit=50)
+        for _ in range(20):
+            limiter.in_flight[READ] += 1
+            limiter.release(READ, 0.01)
+        settled = limiter.limit
+        for _ in range(20):
+            limiter.in_flight[READ] += 1
+            limiter.release(READ, 0.5)
+
+        assert limiter.limit < settled
+
+    def test_saturated_middleware_returns_503(self):
+        """Test shed requests get 503 with Retry-After"""
+        limiter = AdaptiveLimiter(initial_limit=1, min_limit=1, max_queue=0)
+        limiter.in_flight[READ] = 1
+        app = Starlette(routes=[Route("/tasks/{task_id}", lambda request: PlainTextResponse("ok"))])
+        app.add_middleware(AdmissionControlMiddleware, limiter=limiter)
+
+        response = TestClient(app).get("/tasks/1")
+
+        assert response.status_code == 503
+        assert int(response.headers["Retry-After"]) >= 1
@@ -0,0 +1,50 @@
+import pytest
+from collections import namedtuple
+from sqlalchemy.dialects import postgresql
+
+from backend.tasks import model
+from backend.tasks.board import board_statement, task_board
+from backend.tasks.filter_schema import TaskFilterParams
+from tests.mocks import FakeResult, FakeSession
+
+
+BoardRow = namedtuple("BoardRow", ["task", "board_status", "board_total"])
+
+
+@pytest.mark.unit
+class TestTaskBoard:
+    """Unit tests for the kanban board query"""
+
+    def test_statement_ranks_per_status(self):
+        """Test the board is a single windowed query"""
+        statement = board_statement(("priority",), "dueDate", "asc", ())
+
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+
+        assert "row_number() OVER (PARTITION BY task.status" in sql
+        assert "count(*) OVER (PARTITION BY task.status)" in sql
+        assert "board_position <= %(per_column)s" in sql
+
+    def test_field_order_shares_a_statement(self):
+        """Test permutations of a sparse fieldset reuse one cached statement"""
+        first = board_statement(("status",), "title", "desc", ("id", "title", "dueDate"))
+        second = board_statement(("status",), "title", "desc", ("dueDate", "id", "title"))
+
+        assert first is second
+
+    def test_rows_grouped_into_columns(self):
+        """Test rows become one column per status with its total"""
+        rows = [
+            BoardRow(model.Task(id=1, title="A"), "completed", 7),
+            BoardRow(model.Task(id=2, title="B"), "pending", 3),
+            BoardRow(model.Task(id=3, title="C"), "pending", 3),
+        ]
+        database = FakeSession([FakeResult(rows)])
+
+        columns = task_board(TaskFilterParams(status=["pending", "cancelled"]), 2, database)
+
+        assert [(column["status"], column["total"]) for column in columns] == [
+            ("completed", 7), ("pending", 3), ("cancelled", 0)
+        ]
+        assert [task.id for task in columns[1]["tasks"]] == [2, 3]
+        assert database.executed[0][1]["per_column"] == 2
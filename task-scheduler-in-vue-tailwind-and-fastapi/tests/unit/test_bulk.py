@@ -0,0 +1,94 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from backend.tasks import bulk, model, rollups
+from backend.tasks.bulk import bulk_update, patch_values
+from backend.tasks.filter_schema import TaskFilterParams
+from backend.tasks.schema import TaskBulkPatch
+from backend.tasks.tags import tag_dictionary
+from tests.mocks import FakeResult, FakeSession
+
+
+def task_row(task_id, status):
+    return SimpleNamespace(id=task_id, createdDate=datetime(2025, 1, task_id), completedDate=None, dueDate=None,
+                           status=status, priority="medium", tag_ids=[])
+
+
+class BulkSession(FakeSession):
+    """Answers the max-id and boundary queries from a list of matching ids"""
+
+    def __init__(self, matching_ids):
+        super().__init__()
+        self.matching_ids = matching_ids
+        self.updates = []
+        self.rollup_deltas = 0
+
+    def respond(self, sql, statement, params):
+        if sql.startswith("INSERT INTO task_daily_stats_delta"):
+            self.rollup_deltas += 1
+            return FakeResult()
+        if sql.startswith("UPDATE") or sql.endswith("FOR UPDATE"):
+            rows = [i for i in self.matching_ids if params["last_id"] < i <= params["upper_id"]]
+            if sql.endswith("FOR UPDATE"):
+                return FakeResult(rows=[task_row(i, "pending") for i in rows])
+            self.updates.append((params["last_id"], params["upper_id"]))
+            return FakeResult(rowcount=len(rows), rows=[task_row(i, "cancelled") for i in rows])
+        if "max(" in sql:
+            return FakeResult(value=max(self.matching_ids, default=None))
+        remaining = [i for i in self.matching_ids if i > params["last_id"]]
+        offset = statement._offset
+        return FakeResult(value=remaining[offset] if offset < len(remaining) else None)
+
+
+@pytest.mark.unit
+class TestBulkUpdate:
+    """Unit tests for bulk update by filter"""
+
+    def setup_method(self):
+        tag_dictionary.clear()
+        tag_dictionary._remember([(1, "work"), (2, "urgent")])
+
+    def teardown_method(self):
+        tag_dictionary.clear()
+
+    def test_patch_skips_unset_fields(self):
+        """Test only the fields present in the patch are written"""
+        values = patch_values(TaskBulkPatch(priority="high"), db=None)
+
+        assert list(values) == [model.Task.priority]
+
+    def test_tag_changes_use_array_operators(self):
+        """Test added and removed tags are applied in SQL, not per row"""
+        values = patch_values(TaskBulkPatch(addTags=["work"], removeTags=["urgent"]), db=None)
+
+        sql = str(values[model.Task.tag_ids].compile(dialect=postgresql.dialect()))
+
+        assert "task.tag_ids | %(add_tag_ids)s" in sql
+        assert "- %(remove_tag_ids)s" in sql
+
+    def test_updates_run_in_id_batches(self, monkeypatch):
+        """Test matching rows are updated in committed keyset batches"""
+        monkeypatch.setattr(bulk, "ROLLUPS_ENABLED", True)
+        monkeypatch.setattr(rollups, "ROLLUPS_ENABLED", True)
+        db = BulkSession([3, 5, 8, 13, 21])
+        filters = TaskFilterParams(status=["pending"])
+
+        result = bulk_update(filters, TaskBulkPatch(status="cancelled"), db, batch_size=2)
+
+        assert db.updates == [(0, 5), (5, 13), (13, 21)]
+        assert db.commits == 3
+        # Each batch moves its rows' status counters in its own transaction
+        assert db.rollup_deltas == 3
+        assert result == {"updatedCount": 5, "batches": 3, "lastId": 21}
+
+    def test_nothing_matching_updates_nothing(self):
+        """Test an empty match issues no UPDATE"""
+        db = BulkSession([])
+
+        result = bulk_update(TaskFilterParams(status=["pending"]), TaskBulkPatch(status="cancelled"), db, 2)
+
+        assert db.updates == []
+        assert result == {"updatedCount": 0, "batches": 0, "lastId": None}
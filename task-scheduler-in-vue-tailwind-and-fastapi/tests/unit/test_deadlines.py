@@ -0,0 +1,144 @@
+import asyncio
+import threading
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.exc import OperationalError
+
+from backend import db, deadlines
+from backend.metrics import metrics
+from tests.mocks import FakeSession
+
+
+class FakeRequest:
+    """Request whose client disconnects once ``gone`` is set"""
+
+    def __init__(self):
+        self.gone = asyncio.Event()
+        self.url = type("URL", (), {"path": "/tasks/"})()
+
+    async def receive(self):
+        await self.gone.wait()
+        return {"type": "http.disconnect"}
+
+
+class FakeConnection:
+    closed = False
+
+    def __init__(self):
+        self.running = threading.Event()
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+def capped_session(connection):
+    return FakeSession(info={db.STATEMENT_TIMEOUT: 5000, "dbapi_connection": connection})
+
+
+class RecordingConnection:
+    """SQLAlchemy connection stand-in that records executed statements"""
+
+    def __init__(self, dialect):
+        self.dialect = type("Dialect", (), {"name": dialect})()
+        self.executed = []
+
+    def execute(self, statement, params=None):
+        self.executed.append((str(statement), params))
+
+
+class QueryCanceled(Exception):
+    pgcode = deadlines.QUERY_CANCELED
+
+
+def blocking_query(connection):
+    connection.running.set()
+    if not connection.cancelled.wait(timeout=5):
+        return "finished"
+    raise OperationalError("SELECT ...", {}, QueryCanceled())
+
+
+@pytest.mark.unit
+class TestStatementTimeouts:
+    """Unit tests for per-session statement timeouts"""
+
+    def test_request_sessions_are_capped(self):
+        """Test request sessions carry the default timeout and plain sessions none"""
+        with db.request_session() as session:
+            assert session.info[db.STATEMENT_TIMEOUT] == db.STATEMENT_TIMEOUT_MS
+        with db.SessionLocal() as session:
+            assert db.STATEMENT_TIMEOUT not in session.info
+
+    def test_route_deadline_replaces_the_default(self):
+        """Test a route deadline applies to the request's own session"""
+        with db.request_session() as session:
+            assert deadlines.session_with_deadline(5000)(database=session) is session
+            assert session.info[db.STATEMENT_TIMEOUT] == 5000
+
+    def test_timeout_is_set_per_transaction(self):
+        """Test the timeout is set locally when a capped transaction begins"""
+        connection = RecordingConnection("postgresql")
+        session = capped_session(None)
+
+        db._apply_statement_timeout(session, None, connection)
+
+        assert connection.executed == [
+            ("SELECT set_config('statement_timeout', :timeout, true)", {"timeout": "5000"})]
+
+    def test_uncapped_sessions_are_left_alone(self):
+        """Test sessions without a timeout, or on other databases, run no statement"""
+        uncapped = capped_session(None)
+        uncapped.info[db.STATEMENT_TIMEOUT] = None
+        postgres, sqlite = RecordingConnection("postgresql"), RecordingConnection("sqlite")
+
+        db._apply_statement_timeout(uncapped, None, postgres)
+        db._apply_statement_timeout(capped_session(None), None, sqlite)
+
+        assert postgres.executed == sqlite.executed == []
+
+
+@pytest.mark.unit
+class TestRunCancellable:
+    """Unit tests for query deadlines and disconnect cancellation"""
+
+    def setup_method(self):
+        metrics.reset()
+
+    @pytest.mark.asyncio
+    async def test_result_returned_while_client_connected(self):
+        """Test finished work is returned unchanged"""
+        session = capped_session(FakeConnection())
+
+        result = await deadlines.run_cancellable(FakeRequest(), session, lambda: {"tasks": []})
+
+        assert result == {"tasks": []}
+
+    @pytest.mark.asyncio
+    async def test_disconnect_cancels_running_query(self):
+        """Test a client disconnect cancels the backend query"""
+        connection = FakeConnection()
+        request = FakeRequest()
+
+        async def disconnect():
+            await asyncio.get_running_loop().run_in_executor(None, connection.running.wait)
+            request.gone.set()
+
+        asyncio.ensure_future(disconnect())
+        with pytest.raises(HTTPException) as error:
+            await deadlines.run_cancellable(request, capped_session(connection), blocking_query, connection)
+
+        assert connection.cancelled.is_set()
+        assert error.value.status_code == deadlines.CLIENT_CLOSED_REQUEST
+        assert metrics.snapshot()["counters"] == {"db.cancel.disconnect": 1}
+
+    @pytest.mark.asyncio
+    async def test_statement_timeout_becomes_504(self):
+        """Test a query hitting statement_timeout maps to a gateway timeout"""
+        connection = FakeConnection()
+        connection.cancelled.set()
+
+        with pytest.raises(HTTPException) as error:
+            await deadlines.run_cancellable(FakeRequest(), capped_session(connection), blocking_query, connection)
+
+        assert error.value.status_code == 504
+        assert metrics.snapshot()["counters"] == {"db.cancel.deadline": 1}
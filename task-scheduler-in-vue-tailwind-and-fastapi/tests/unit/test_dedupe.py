@@ -0,0 +1,62 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from backend.metrics import metrics
+from backend.tasks import schema, services
+from backend.tasks.dedupe import duplicate_statement, find_duplicates, rejecting_duplicate
+from tests.mocks import FakeSession
+
+
+class BrokenBind:
+    def begin(self):
+        raise RuntimeError("canceling statement due to statement timeout")
+
+
+CANDIDATES = [{"id": 7, "title": "Write weekly report", "status": "pending", "score": 0.92},
+              {"id": 3, "title": "Write report", "status": "pending", "score": 0.64}]
+
+
+@pytest.mark.unit
+class TestDedupe:
+    """Unit tests for near-duplicate detection on create"""
+
+    def test_statement_uses_trigram_operator_on_open_tasks(self):
+        """Test the lookup can use the partial trigram index"""
+        sql = str(duplicate_statement().compile(dialect=postgresql.dialect()))
+
+        assert "lower(task.title) %% %(title)s" in sql
+        assert "task.status != %(status_1)s" in sql
+        assert "similarity(lower(task.title), %(title)s) >= %(threshold)s" in sql
+
+    def test_short_titles_are_not_checked(self):
+        """Test titles without a full trigram skip the database"""
+        assert find_duplicates(" ab ", db=None) == []
+
+    def test_failed_lookup_lets_the_create_through(self):
+        """Test a timed out check reports no candidates instead of failing"""
+        skipped = metrics.snapshot()["counters"].get("tasks.dedupe.skipped", 0)
+
+        assert find_duplicates("Write weekly report", FakeSession(bind=BrokenBind())) == []
+        assert metrics.snapshot()["counters"]["tasks.dedupe.skipped"] == skipped + 1
+
+    def test_reject_threshold_applies_to_best_candidate(self):
+        """Test only a close enough match blocks the create"""
+        assert rejecting_duplicate(CANDIDATES, reject_threshold=0.9) == CANDIDATES[0]
+        assert rejecting_duplicate(CANDIDATES, reject_threshold=0.95) is None
+        assert rejecting_duplicate([], reject_threshold=0.0) is None
+
+    @pytest.mark.asyncio
+    async def test_create_is_rejected_above_threshold(self, monkeypatch):
+        """Test a near-identical open task turns the create into a 409"""
+        monkeypatch.setattr(services, "DEDUPE_ENABLED", True)
+        monkeypatch.setattr(services, "find_duplicates", lambda title, db: CANDIDATES)
+        monkeypatch.setattr(services, "rejecting_duplicate",
+                            lambda candidates: rejecting_duplicate(candidates, reject_threshold=0.9))
+        request = schema.TaskBase(title="Write weekly report", status="pending", priority="medium")
+
+        with pytest.raises(HTTPException) as error:
+            await services.create_new_task(request, database=None)
+
+        assert error.value.status_code == 409
+        assert error.value.detail["duplicates"] == CANDIDATES
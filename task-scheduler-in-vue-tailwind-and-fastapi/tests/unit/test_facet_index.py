@@ -0,0 +1,208 @@
+import time
+from collections import namedtuple
+
+import pytest
+from datetime import date, datetime, timedelta
+from unittest.mock import MagicMock
+
+from backend.tasks import model
+from backend import db as backend_db
+from backend.tasks.facet_index import FacetIndex, FacetIndexBuilder
+from backend.tasks.filter_schema import TaskFilterParams
+from tests.mocks import FakeResult, FakeSession
+
+
+def build_index(*tasks):
+    index = FacetIndex()
+    index.ready = True
+    index.built_at = time.monotonic()
+    for task in tasks:
+        index.add(task)
+    return index
+
+
+FacetRow = namedtuple("FacetRow", "id status priority tag_ids createdDate dueDate")
+
+
+def row(task):
+    return FacetRow(task.id, task.status, task.priority, task.tag_ids, task.createdDate, task.dueDate)
+
+
+def make_task(task_id, status="pending", priority=model.PriorityEnum.MEDIUM, tag_ids=None,
+              createdDate=None, dueDate=None):
+    return model.Task(id=task_id, title=f"Task {task_id}", status=status, priority=priority,
+                      tag_ids=tag_ids or [], createdDate=createdDate or datetime(2025, 1, task_id),
+                      dueDate=dueDate)
+
+
+@pytest.mark.unit
+class TestFacetIndex:
+    """Unit tests for the in-memory facet index"""
+
+    def test_status_and_priority_filters(self):
+        """Test intersecting status and priority bitmaps"""
+        index = build_index(
+            make_task(1, status="pending", priority=model.PriorityEnum.HIGH),
+            make_task(2, status="completed", priority=model.PriorityEnum.HIGH),
+            make_task(3, status="pending", priority=model.PriorityEnum.LOW),
+        )
+        filters = TaskFilterParams(status=["pending"], priority=["high"])
+
+        matched = index.match(None, filters)
+
+        assert index.count(matched) == 1
+        assert index.page(matched, filters) == [1]
+
+    def test_page_orders_by_created_date(self):
+        """Test pages follow the requested sort order"""
+        index = build_index(*(make_task(task_id) for task_id in range(1, 6)))
+
+        desc = TaskFilterParams(page_size=2, page=2)
+        asc = TaskFilterParams(page_size=2, sort_order="asc")
+
+        assert index.page(index.match(None, desc), desc) == [3, 2]
+        assert index.page(index.match(None, asc), asc) == [1, 2]
+
+    def test_undated_tasks_sort_like_postgres_nulls(self):
+        """Test tasks without a due date come first descending and last ascending"""
+        index = build_index(
+            make_task(1, dueDate=datetime(2025, 3, 1)),
+            make_task(2),
+            make_task(3, dueDate=datetime(2025, 2, 1)),
+        )
+        desc = TaskFilterParams(sort_by="dueDate")
+        asc = TaskFilterParams(sort_by="dueDate", sort_order="asc")
+
+        assert index.page(index.match(None, desc), desc) == [2, 1, 3]
+        assert index.page(index.match(None, asc), asc) == [3, 1, 2]
+
+    def test_due_date_range_and_overdue(self):
+        """Test due date ranges and the overdue quick filter"""
+        past = datetime.utcnow() - timedelta(days=3)
+        index = build_index(
+            make_task(1, dueDate=past),
+            make_task(2, dueDate=past, status="completed"),
+            make_task(3, dueDate=datetime.utcnow() + timedelta(days=3)),
+        )
+
+        overdue = index.match(None, TaskFilterParams(overdue_only=True))
+        ranged = index.match(None, TaskFilterParams(due_date_from=date.today()))
+
+        assert index.count(overdue) == 1
+        assert index.count(ranged) == 1
+
+    def test_update_and_remove(self):
+        """Test re-adding a task moves it between facets and remove drops it"""
+        task = make_task(1, status="pending", tag_ids=[5])
+        index = build_index(task, make_task(2, status="pending"))
+
+        task.status = "completed"
+        index.add(task)
+        index.remove(2)
+
+        assert index.facet_counts() == {
+            "statuses": {"completed": 1},
+            "priorities": {"medium": 1},
+            "tags": {5: 1},
+        }
+
+    def test_other_workers_writes_are_reloaded(self):
+        """Test notified task ids are re-read on the next refresh and missing ones dropped"""
+        index = build_index(make_task(1, status="pending"), make_task(2, status="pending"))
+        db = MagicMock()
+        db.execute.return_value.all.return_value = [make_task(1, status="completed")]
+
+        index.receive("0ther:1")
+        index.receive("0ther:2")
+        index.refresh(db)
+
+        assert index.facet_counts()["statuses"] == {"completed": 1}
+        index.refresh(db)
+        assert db.execute.call_count == 1
+
+    def test_lost_notifications_rebuild_in_the_background(self):
+        """Test a reconnect or a bulk write in another worker asks for a rebuild and keeps serving"""
+        index = build_index(make_task(1))
+
+        index.receive("0ther:*")
+        index.refresh(MagicMock())
+
+        assert index.is_stale()
+        assert index.rebuild_wanted.is_set()
+        assert index.supports(TaskFilterParams())
+        assert index.lookup(None, TaskFilterParams()) == ([1], 1)
+
+    def test_rebuild_swaps_in_and_keeps_writes_made_meanwhile(self):
+        """Test a rebuild replaces the index whole and re-reads tasks written while it ran"""
+        index = build_index(make_task(1, status="pending"))
+        written = make_task(2, status="pending")
+
+        class BuildSession(FakeSession):
+            def respond(self, sql, statement, params):
+                # A write commits after the rebuild's query read the table
+                index.add(written)
+                assert index.facet_counts()["statuses"] == {"pending": 2}
+                return FakeResult([row(make_task(1, status="completed"))])
+
+        index.rebuild(BuildSession())
+
+        assert index.facet_counts()["statuses"] == {"completed": 1}
+        db = FakeSession([FakeResult([row(written)])])
+        index.refresh(db)
+        assert index.facet_counts()["statuses"] == {"completed": 1, "pending": 1}
+        assert "IN" in db.executed[0][0]
+
+    def test_bulk_writes_fall_back_to_postgres_until_rebuilt(self):
+        """Test invalidate() stops answering from the index, even from a rebuild that began before it"""
+        index = build_index(make_task(1))
+
+        class BuildSession(FakeSession):
+            def respond(self, sql, statement, params):
+                # A bulk update commits after the rebuild's query read the table
+                index.invalidate()
+                return FakeResult([row(make_task(1))])
+
+        index.invalidate()
+        assert not index.supports(TaskFilterParams())
+        assert index.rebuild_wanted.is_set()
+
+        index.rebuild(BuildSession())
+        assert not index.ready and index.is_stale()
+
+        index.rebuild(FakeSession([FakeResult([row(make_task(1))])]))
+        assert index.ready and not index.is_stale()
+
+    def test_selective_pages_match_a_full_scan(self):
+        """Test pages chosen by selecting few matches agree with scanning the sorted dates"""
+        tasks = [make_task(task_id, status="completed" if task_id % 50 else "pending",
+                           createdDate=datetime(2025, 1, 1) + timedelta(hours=task_id % 97))
+                 for task_id in range(1, 2001)]
+        index = build_index(*tasks)
+        pending = sorted((task for task in tasks if task.status == "pending"),
+                         key=lambda task: (task.createdDate, task.id))
+
+        for sort_order, expected in (("asc", pending), ("desc", pending[::-1])):
+            filters = TaskFilterParams(status=["pending"], sort_order=sort_order, page_size=5, page=2)
+            assert index.lookup(None, filters) == ([task.id for task in expected[5:10]], 40)
+
+    def test_builder_builds_off_the_request_path(self, monkeypatch):
+        """Test the background builder makes the index ready from its own session"""
+        index = FacetIndex()
+        monkeypatch.setattr(backend_db, "SessionLocal", lambda: FakeSession([FakeResult([row(make_task(1))])]))
+        builder = FacetIndexBuilder(index, poll_interval=0.01)
+
+        builder.start()
+        deadline = time.monotonic() + 5
+        while not index.ready and time.monotonic() < deadline:
+            time.sleep(0.01)
+        builder.stop()
+
+        assert index.lookup(None, TaskFilterParams()) == ([1], 1)
+
+    def test_search_is_not_supported(self):
+        """Test text search falls back to Postgres"""
+        index = build_index(make_task(1))
+
+        assert index.supports(TaskFilterParams())
+        assert not index.supports(TaskFilterParams(search="report"))
+        assert not index.supports(TaskFilterParams(sort_by="title"))
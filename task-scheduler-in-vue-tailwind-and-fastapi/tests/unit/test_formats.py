@@ -0,0 +1,101 @@
+from datetime import datetime
+
+import pytest
+
+from backend.tasks import formats, model, services
+from backend.tasks.filter_schema import TaskFilterParams
+from backend.tasks.formats import ARROW, JSON, MSGPACK, accepted_media_types, negotiate, task_tuples, wire_rows
+from backend.tasks.tags import tag_dictionary
+from tests.mocks import FakeResult, FakeSession
+
+
+COLUMNS = ["id", "title", "priority", "tags", "dueDate"]
+ROWS = [(1, "Write report", "high", ["work"], datetime(2025, 3, 7, 17, 30)),
+        (2, "Plan sprint", "low", [], None)]
+
+
+@pytest.fixture
+def all_formats(monkeypatch):
+    monkeypatch.setattr(formats, "available_formats", lambda: [MSGPACK, ARROW])
+
+
+@pytest.mark.unit
+class TestFormats:
+    """Unit tests for binary task list encodings"""
+
+    def setup_method(self):
+        tag_dictionary.clear()
+        tag_dictionary._remember([(1, "work"), (2, "urgent")])
+
+    def teardown_method(self):
+        tag_dictionary.clear()
+
+    def test_accept_header_is_parsed_with_q_values(self):
+        """Test media types and their weights are read from Accept"""
+        assert accepted_media_types("application/msgpack, application/json;q=0.5") == {
+            "application/msgpack": 1.0, "application/json": 0.5}
+
+    def test_json_stays_the_default(self, all_formats):
+        """Test browsers and clients without a preference keep getting JSON"""
+        assert negotiate(None) == JSON
+        assert negotiate("*/*") == JSON
+        assert negotiate("application/json, application/msgpack") == JSON
+
+    def test_binary_formats_are_chosen_when_preferred(self, all_formats):
+        """Test an explicit preference selects the binary format"""
+        assert negotiate("application/x-msgpack") == MSGPACK
+        assert negotiate("application/json;q=0.5, application/vnd.apache.arrow.stream") == ARROW
+
+    def test_missing_library_falls_back_to_json(self, monkeypatch):
+        """Test a format that cannot be encoded here is never chosen"""
+        monkeypatch.setattr(formats, "available_formats", lambda: [])
+
+        assert negotiate("application/msgpack") == JSON
+
+    def test_projected_rows_become_api_values(self):
+        """Test priorities and tag ids are converted like the JSON response"""
+        rows = [(1, model.PriorityEnum.HIGH, [2, 1]), (2, None, None)]
+
+        assert wire_rows(rows, ["id", "priority", "tags"], db=None) == [
+            (1, "high", ["urgent", "work"]), (2, None, [])]
+
+    def test_filtered_page_is_read_as_wire_tuples(self):
+        """Test the binary filtered listing turns page rows into tuples in the requested order"""
+        # Selected in FIELD_COLUMNS order: id, title, priority
+        rows = [(1, "Write report", model.PriorityEnum.HIGH)]
+        db = FakeSession([FakeResult(value=1), FakeResult(rows)])
+        filters = TaskFilterParams(status=["pending"], fields=["priority", "id", "title"])
+
+        result = services._filtered_tasks(filters, db, wire=True)
+
+        assert result["tasks"] == [(1, "high", "Write report")]
+        assert result["totalCount"] == 1
+
+    def test_sparse_dicts_become_tuples(self):
+        """Test sparse service results keep the requested column order"""
+        tasks = [{"title": "Write report", "id": 1}]
+
+        assert task_tuples(tasks, ["id", "title"]) == [(1, "Write report")]
+
+    def test_msgpack_round_trip(self):
+        """Test MessagePack keeps the envelope, columns and timestamps"""
+        msgpack = pytest.importorskip("msgpack")
+
+        document = msgpack.unpackb(formats.encode_msgpack({"totalCount": 2}, COLUMNS, ROWS), timestamp=3)
+
+        assert document["totalCount"] == 2
+        assert document["columns"] == COLUMNS
+        assert document["rows"][0][:4] == [1, "Write report", "high", ["work"]]
+        assert document["rows"][0][4].replace(tzinfo=None) == datetime(2025, 3, 7, 17, 30)
+
+    def test_arrow_round_trip(self):
+        """Test Arrow IPC carries one typed column per field"""
+        pyarrow = pytest.importorskip("pyarrow")
+        import pyarrow.ipc
+
+        table = pyarrow.ipc.open_stream(formats.encode_arrow({"missing": [9]}, COLUMNS, ROWS)).read_all()
+
+        assert table.column_names == COLUMNS
+        assert table.column("tags").to_pylist() == [["work"], []]
+        assert table.column("dueDate").to_pylist() == [datetime(2025, 3, 7, 17, 30), None]
+        assert table.schema.metadata[b"missing"] == b"[9]"
@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+from backend.tasks.idset import ARRAY_MAX, IdSet
+
+
+@pytest.mark.unit
+class TestIdSet:
+    """Unit tests for the compressed task id sets"""
+
+    def test_sparse_ids_stay_small(self):
+        """Test a few ids far apart cost bytes, not a bitmap of the whole id range"""
+        ids = IdSet.from_ids([3, 5_000_000, 90_000_000])
+
+        assert list(ids) == [3, 5_000_000, 90_000_000]
+        assert ids.nbytes() == 6
+
+    def test_dense_chunks_become_bitmaps_and_back(self):
+        """Test a chunk switches to a bitmap above ARRAY_MAX members and intersections shrink it again"""
+        dense = IdSet.from_ids(range(ARRAY_MAX + 1))
+        assert dense.nbytes() == 8192
+
+        sparse = dense & IdSet.from_ids(range(0, ARRAY_MAX + 1, 2))
+        assert len(sparse) == ARRAY_MAX // 2 + 1
+        assert sparse.nbytes() == 2 * len(sparse)
+
+    def test_add_and_discard(self):
+        """Test single updates keep chunks sorted and drop empty ones"""
+        ids = IdSet()
+        for task_id in (70_000, 5, 3, 5):
+            ids.add(task_id)
+        ids.discard(70_000)
+        ids.discard(4)
+
+        assert list(ids) == [3, 5]
+        assert 5 in ids and 70_000 not in ids
+        assert ids._chunks.keys() == {0}
+
+    def test_operations_match_python_sets(self):
+        """Test &, |, len and membership against plain sets across array and bitmap chunks"""
+        rng = random.Random(7)
+        for _ in range(20):
+            first = {rng.randrange(200_000) for _ in range(rng.choice((10, 3000, 20_000)))}
+            second = {rng.randrange(200_000) for _ in range(rng.choice((10, 3000, 20_000)))}
+            a, b = IdSet.from_ids(first), IdSet.from_ids(second)
+            for task_id in list(first)[:50]:
+                a.discard(task_id)
+                first.discard(task_id)
+
+            assert list(a & b) == sorted(first & second)
+            assert list(a | b) == sorted(first | second)
+            assert len(a | b) == len(first | second)
+            assert all((task_id in a) == (task_id in first) for task_id in range(0, 200_000, 997))
+
+    def test_results_do_not_share_containers(self):
+        """Test changing an operand after | leaves the result alone"""
+        a, b = IdSet.from_ids([1, 2]), IdSet.from_ids([100_000])
+        union = a | b
+
+        a.add(3)
+        b.discard(100_000)
+
+        assert list(union) == [1, 2, 100_000]
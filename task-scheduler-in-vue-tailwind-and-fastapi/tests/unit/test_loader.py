@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+
+from backend.tasks import loader, model
+
+
+@pytest.mark.unit
+class TestTaskLoader:
+    """Unit tests for coalesced single-task lookups"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_lookups_share_one_query(self, monkeypatch):
+        """Test lookups in the same tick are answered by one batch"""
+        calls = []
+
+        def fake_fetch(ids, db):
+            calls.append(list(ids))
+            return {task_id: model.Task(id=task_id, title=f"Task {task_id}") for task_id in ids if task_id != 3}
+
+        monkeypatch.setattr(loader, "fetch_tasks", fake_fetch)
+        task_loader = loader.TaskLoader()
+
+        results = await asyncio.gather(*(task_loader.load(task_id, None) for task_id in [1, 2, 3, 1]))
+
+        assert calls == [[1, 2, 3]]
+        assert [task and task.id for task in results] == [1, 2, None, 1]
+
+    @pytest.mark.asyncio
+    async def test_callers_get_detached_copies(self, monkeypatch):
+        """Test the batch runs on its own session and no caller shares an instance"""
+        sessions = []
+
+        def fake_fetch(ids, db):
+            sessions.append(db)
+            return {task_id: model.Task(id=task_id, title="Shared", tag_ids=[1]) for task_id in ids}
+
+        monkeypatch.setattr(loader, "fetch_tasks", fake_fetch)
+        task_loader = loader.TaskLoader()
+        request_session = object()
+
+        first, second = await asyncio.gather(task_loader.load(5, request_session), task_loader.load(5, None))
+
+        assert sessions[0] is not request_session
+        assert first is not second and first.tag_ids is not second.tag_ids
+        assert (first.id, first.title, first.tag_ids) == (5, "Shared", [1])
+
+    @pytest.mark.asyncio
+    async def test_batch_errors_reach_every_waiter(self, monkeypatch):
+        """Test a failing batch query fails all coalesced lookups"""
+        def failing_fetch(ids, db):
+            raise RuntimeError("connection lost")
+
+        monkeypatch.setattr(loader, "fetch_tasks", failing_fetch)
+        task_loader = loader.TaskLoader()
+
+        results = await asyncio.gather(task_loader.load(1, None), task_loader.load(2, None),
+                                       return_exceptions=True)
+
+        assert all(isinstance(result, RuntimeError) for result in results)
@@ -0,0 +1,46 @@
+import importlib
+import sys
+
+import pytest
+
+from backend import online_migrations
+from backend.online_migrations import TableStats, describe, estimate_seconds
+
+
+@pytest.mark.unit
+class TestOnlineMigrations:
+    """Unit tests for the dry-run lock and duration estimates"""
+
+    def test_concurrent_index_scans_twice(self):
+        """Test a concurrent build is estimated as two table passes"""
+        assert estimate_seconds("create_index_concurrently", 1_000_000) == pytest.approx(4.0)
+        assert estimate_seconds("create_index_concurrently", 1_000_000, using="gin") == pytest.approx(20.0)
+
+    def test_backfill_includes_pauses(self):
+        """Test throttling pauses are part of the backfill estimate"""
+        seconds = estimate_seconds("backfill", 20_000, batch_size=1000, pause=0.5)
+
+        assert seconds == pytest.approx(1.0 + 20 * 0.5)
+
+    def test_report_names_lock_and_duration(self):
+        """Test the dry-run report shows the lock mode, size and estimate"""
+        lines = describe("validate_constraint", "task", TableStats(rows=4_000_000, size_bytes=512 * 1024 ** 2))
+
+        assert lines[0] == ("validate_constraint on task: SHARE UPDATE EXCLUSIVE lock, "
+                            "reads and writes continue during the scan")
+        assert "~4,000,000 rows, 512.0 MiB" in lines[1]
+        assert lines[2] == "  estimated duration ~2.0s"
+
+    def test_report_without_statistics(self):
+        """Test a missing table still reports the lock taken"""
+        lines = describe("add_constraint_not_valid", "task", None)
+
+        assert lines[1] == "  table statistics unavailable"
+
+    def test_imports_without_alembic(self, monkeypatch):
+        """Test the estimates can be imported outside a migration run"""
+        monkeypatch.setitem(sys.modules, "alembic", None)
+
+        module = importlib.reload(online_migrations)
+
+        assert module.estimate_seconds("validate_constraint", 2_000_000) == pytest.approx(1.0)
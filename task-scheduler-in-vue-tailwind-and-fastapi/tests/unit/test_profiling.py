@@ -0,0 +1,77 @@
+import time
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend import profiling
+from backend.profiling import CaptureRing, ProfilingMiddleware
+
+
+def busy_handler():
+    deadline = time.monotonic() + 0.05
+    while time.monotonic() < deadline:
+        pass
+    return {"ok": True}
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_ADMIN_TOKEN", "secret")
+    ring = CaptureRing(tmp_path, size=2)
+    monkeypatch.setattr(profiling, "capture_ring", ring)
+
+    app = FastAPI()
+
+    @app.get("/tasks/")
+    async def tasks():
+        return busy_handler()
+
+    app.add_middleware(ProfilingMiddleware, ring=ring, sample_rate=0)
+    app.include_router(profiling.router)
+    return app
+
+
+@pytest.mark.unit
+class TestProfiling:
+    """Unit tests for on-demand request profiling"""
+
+    def test_requests_are_not_profiled_by_default(self, app, tmp_path):
+        """Test only opted-in requests are profiled"""
+        response = TestClient(app).get("/tasks/", headers={"X-Profile": "wrong"})
+
+        assert "X-Profile-Capture" not in response.headers
+        assert list(tmp_path.iterdir()) == []
+
+    def test_admin_header_writes_collapsed_stacks(self, app, tmp_path):
+        """Test a profiled request leaves a flamegraph-ready capture"""
+        response = TestClient(app).get("/tasks/", headers={"X-Profile": "secret"})
+
+        capture = tmp_path / response.headers["X-Profile-Capture"]
+        lines = capture.read_text().splitlines()
+        assert lines
+        stack, count = lines[0].rsplit(" ", 1)
+        assert int(count) > 0
+        assert any("busy_handler" in line for line in lines)
+
+    def test_ring_keeps_newest_captures(self, app, tmp_path):
+        """Test old captures are dropped beyond the ring size"""
+        client = TestClient(app)
+        names = []
+        for _ in range(3):
+            names.append(client.get("/tasks/", headers={"X-Profile": "secret"}).headers["X-Profile-Capture"])
+            time.sleep(0.01)
+
+        assert sorted(path.name for path in tmp_path.iterdir()) == sorted(names[1:])
+
+    def test_admin_endpoints_list_and_download(self, app):
+        """Test captures can be listed and fetched with the admin token"""
+        client = TestClient(app)
+        name = client.get("/tasks/", headers={"X-Profile": "secret"}).headers["X-Profile-Capture"]
+
+        assert client.get("/admin/profiles/").status_code == 403
+        listed = client.get("/admin/profiles/", headers={"X-Admin-Token": "secret"}).json()
+        downloaded = client.get(f"/admin/profiles/{name}", headers={"X-Admin-Token": "secret"})
+
+        assert [capture["name"] for capture in listed["captures"]] == [name]
+        assert downloaded.status_code == 200
+        assert "busy_handler" in downloaded.text
@@ -0,0 +1,54 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from backend import query_stats
+from backend.query_stats import QueryStatsMiddleware, record_statements
+
+
+def make_engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    record_statements(engine)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE item (id INTEGER PRIMARY KEY, name TEXT)"))
+    return engine
+
+
+def test_capture_counts_statements_and_rows():
+    engine = make_engine()
+    with query_stats.capture() as stats:
+        with engine.begin() as connection:
+            connection.execute(text("INSERT INTO item (name) VALUES ('a'), ('b')"))
+            connection.execute(text("SELECT * FROM item")).all()
+    assert stats.statements == 2
+    assert stats.rows == 2
+    assert stats.seconds > 0
+    assert stats.executed[0].startswith("INSERT")
+
+
+def test_nothing_is_recorded_outside_a_capture():
+    engine = make_engine()
+    with query_stats.capture() as stats:
+        pass
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    assert stats.statements == 0
+
+
+def test_middleware_adds_request_headers():
+    engine = make_engine()
+    app = FastAPI()
+
+    @app.get("/items")
+    def items():
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            connection.execute(text("SELECT 2"))
+        return []
+
+    app.add_middleware(QueryStatsMiddleware)
+    response = TestClient(app).get("/items")
+    assert response.headers["X-DB-Statements"] == "2"
+    assert float(response.headers["X-DB-Time-Ms"]) >= 0
+    assert response.headers["Server-Timing"].startswith("db;dur=")
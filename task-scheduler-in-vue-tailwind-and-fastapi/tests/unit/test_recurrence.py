@@ -0,0 +1,168 @@
+import pytest
+from datetime import date, datetime
+from unittest.mock import MagicMock
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from backend.tasks import model, recurrence, services
+from backend.tasks.filter_schema import TaskFilterParams
+from backend.tasks.recurrence import (
+    Occurrence, collation_ranks, expand_window, is_occurrence, listing_window, merge_sorted, occurrences,
+    parse_rrule, series_statement, series_until,
+)
+
+
+def make_series(**overrides):
+    values = dict(id=1, title="Water plants", status="pending", priority=model.PriorityEnum.HIGH,
+                  tag_ids=[], createdDate=datetime(2025, 1, 1), rrule="FREQ=DAILY", dtstart=datetime(2025, 1, 1))
+    return model.TaskSeries(**{**values, **overrides})
+
+
+def expand(rule, dtstart, start=None, end=None):
+    return list(occurrences(parse_rrule(rule), dtstart, start, end))
+
+
+@pytest.mark.unit
+class TestRecurrence:
+    """Unit tests for recurring task expansion"""
+
+    def test_parse_rrule(self):
+        """Test the supported RRULE parts are parsed"""
+        rule = parse_rrule("RRULE:FREQ=WEEKLY;INTERVAL=2;BYDAY=TH,MO;COUNT=4")
+
+        assert (rule.freq, rule.interval, rule.count, rule.by_day) == ("WEEKLY", 2, 4, (0, 3))
+        assert parse_rrule("FREQ=DAILY;UNTIL=20250105").until == datetime(2025, 1, 5, 23, 59, 59, 999999)
+
+    @pytest.mark.parametrize("rule", [
+        "FREQ=HOURLY",
+        "FREQ=DAILY;COUNT=2;UNTIL=20250101",
+        "FREQ=MONTHLY;BYDAY=1MO",
+        "FREQ=WEEKLY;BYDAY=1MO",
+        "FREQ=MONTHLY;BYMONTHDAY=0",
+        "FREQ=DAILY;INTERVAL=0",
+        "FREQ=DAILY;BYSETPOS=1",
+    ])
+    def test_parse_rrule_rejects(self, rule):
+        """Test unsupported or invalid rules raise ValueError"""
+        with pytest.raises(ValueError):
+            parse_rrule(rule)
+
+    def test_weekly_by_day(self):
+        """Test weekly rules expand every listed weekday at the start time"""
+        result = expand("FREQ=WEEKLY;BYDAY=MO,WE;COUNT=4", datetime(2025, 1, 1, 9, 30))
+
+        assert result == [datetime(2025, 1, 1, 9, 30), datetime(2025, 1, 6, 9, 30),
+                          datetime(2025, 1, 8, 9, 30), datetime(2025, 1, 13, 9, 30)]
+
+    def test_monthly_skips_missing_days(self):
+        """Test a rule on the 31st skips shorter months and -1 means the last day"""
+        assert expand("FREQ=MONTHLY;COUNT=3", datetime(2025, 1, 31)) == [
+            datetime(2025, 1, 31), datetime(2025, 3, 31), datetime(2025, 5, 31)]
+        assert expand("FREQ=MONTHLY;BYMONTHDAY=-1;COUNT=2", datetime(2025, 1, 1)) == [
+            datetime(2025, 1, 31), datetime(2025, 2, 28)]
+
+    def test_window_skips_ahead(self):
+        """Test an unbounded rule only yields occurrences inside the window"""
+        result = expand("FREQ=DAILY;INTERVAL=3", datetime(2020, 1, 1),
+                        datetime(2025, 1, 1), datetime(2025, 1, 7))
+
+        assert result == [datetime(2025, 1, 1), datetime(2025, 1, 4), datetime(2025, 1, 7)]
+
+    def test_count_applies_from_dtstart(self):
+        """Test COUNT limits occurrences even when the window starts later"""
+        rule = "FREQ=WEEKLY;COUNT=3"
+        start = datetime(2025, 1, 6)
+
+        assert expand(rule, start, datetime(2025, 1, 10), datetime(2025, 12, 31)) == [
+            datetime(2025, 1, 13), datetime(2025, 1, 20)]
+        assert series_until(parse_rrule(rule), start) == datetime(2025, 1, 20)
+        assert series_until(parse_rrule("FREQ=WEEKLY"), start) is None
+
+    def test_is_occurrence(self):
+        """Test only dates produced by the rule are occurrences"""
+        rule = parse_rrule("FREQ=YEARLY")
+
+        assert is_occurrence(rule, datetime(2024, 2, 29), datetime(2028, 2, 29))
+        assert not is_occurrence(rule, datetime(2024, 2, 29), datetime(2025, 2, 28))
+
+    def test_listing_window(self):
+        """Test occurrences are only expanded for listings bounded by a due date"""
+        assert listing_window(TaskFilterParams()) is None
+        assert listing_window(TaskFilterParams(due_date_to=date(2025, 1, 31))) == (
+            datetime(1, 1, 1), datetime(2025, 1, 31))
+
+    def test_merge_sorted_matches_database_order(self):
+        """Test occurrences merge into sorted rows with NULLs last ascending"""
+        series = model.TaskSeries(id=1, title="Water plants", status="pending", priority=model.PriorityEnum.HIGH,
+                                  tag_ids=[], createdDate=datetime(2025, 1, 1))
+        occurrence = Occurrence(series, datetime(2025, 1, 2), [])
+        tasks = [{"id": 1, "dueDate": datetime(2025, 1, 1)}, {"id": 2, "dueDate": datetime(2025, 1, 3)},
+                 {"id": 3, "dueDate": None}]
+
+        ascending = merge_sorted(tasks, [occurrence], "dueDate", "asc")
+        descending = merge_sorted(tasks, [occurrence], "dueDate", "desc")
+
+        assert [getattr(task, "id", None) if not isinstance(task, dict) else task["id"]
+                for task in ascending] == [1, None, 2, 3]
+        assert descending[0]["id"] == 3 and descending[2] is occurrence
+
+    def test_title_merge_follows_database_collation(self):
+        """Test string sorts use the order Postgres returns, not Python's code point order"""
+        db = MagicMock()
+        # A case-insensitive collation, unlike Python's uppercase-first order
+        db.execute.return_value.scalars.return_value.all.return_value = ["apple", "Banana", "cherry"]
+        occurrence = Occurrence(make_series(title="Banana"), datetime(2025, 1, 2), [])
+        tasks = [{"id": 1, "title": "apple"}, {"id": 2, "title": "cherry"}]
+
+        ranks = collation_ranks(db, ["apple", "cherry", "Banana"])
+        merged = merge_sorted(tasks, [occurrence], "title", "asc", ranks)
+
+        assert db.execute.call_args.args[1] == {"values": ["Banana", "apple", "cherry"]}
+        assert merged[1] is occurrence
+
+    def test_capped_expansion_is_reported(self, monkeypatch):
+        """Test hitting the occurrence cap is reported to the caller, not only counted"""
+        monkeypatch.setattr(recurrence, "RECURRENCE_MAX_OCCURRENCES", 2)
+        db = MagicMock()
+        db.execute.return_value.scalars.return_value.all.return_value = [make_series()]
+        db.execute.return_value.all.return_value = []
+        filters = TaskFilterParams(due_date_to=date(2025, 1, 5))
+
+        expanded, truncated = expand_window(filters, datetime(2025, 1, 1), datetime(2025, 1, 5), db)
+        complete, not_truncated = expand_window(filters, datetime(2025, 1, 1), datetime(2025, 1, 2), db)
+
+        assert (len(expanded), truncated) == (2, True)
+        assert (len(complete), not_truncated) == (2, False)
+
+    def test_deep_pages_with_occurrences_are_rejected(self):
+        """Test merged listings stop before reading an unbounded number of rows"""
+        occurrence = Occurrence(make_series(), datetime(2025, 1, 2), [])
+        filters = TaskFilterParams(due_date_to=date(2025, 1, 31), page=1000, page_size=100)
+
+        with pytest.raises(HTTPException) as error:
+            services._tasks_with_occurrences(filters, [occurrence], db=None)
+
+        assert error.value.status_code == 422
+
+    @pytest.mark.asyncio
+    async def test_deleting_unknown_series_is_404(self):
+        """Test a missing series is reported instead of silently succeeding"""
+        db = MagicMock()
+        db.query.return_value.filter.return_value.delete.return_value = 0
+
+        with pytest.raises(HTTPException) as error:
+            await services.delete_task_series(404, db)
+
+        assert error.value.status_code == 404
+        db.commit.assert_not_called()
+
+    def test_series_statement_uses_series_columns(self):
+        """Test series are filtered by their own columns and the window"""
+        statement = series_statement(("status", "overdue_only"))
+
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+
+        assert "task_series.status IN" in sql
+        assert "task_series.status != " in sql
+        assert "task_series.until IS NULL" in sql
+        assert series_statement(("status", "overdue_only")) is statement
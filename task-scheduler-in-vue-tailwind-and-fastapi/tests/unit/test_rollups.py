@@ -0,0 +1,112 @@
+from datetime import date, datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from backend.tasks import rollups, services
+from backend.tasks.rollups import (TaskFacts, changes, contributions, fold_statement, stats_statement,
+                                    validate_stats_range)
+from tests.mocks import FakeSession
+
+
+def facts(**overrides):
+    values = dict(createdDate=datetime(2025, 3, 3, 9), completedDate=None, dueDate=datetime(2025, 3, 7),
+                  status="pending", priority="high", tag_ids=[2])
+    return TaskFacts(**{**values, **overrides})
+
+
+@pytest.mark.unit
+class TestRollups:
+    """Unit tests for the daily analytics rollups"""
+
+    def test_open_task_contributions(self):
+        """Test a new task counts as created and, until completed, as open on its due day"""
+        result = contributions(facts())
+
+        assert result[(date(2025, 3, 3), "status", "pending")] == [1, 0, 0.0, 0]
+        assert result[(date(2025, 3, 7), "priority", "high")] == [0, 0, 0.0, 1]
+        assert result[(date(2025, 3, 7), "tag", "2")] == [0, 0, 0.0, 1]
+
+    def test_completing_moves_counters(self):
+        """Test completion adds its duration and removes the open due count"""
+        before = facts()
+        after = facts(status="completed", completedDate=datetime(2025, 3, 5, 9))
+
+        delta = changes([(before, after)])
+
+        assert delta[(date(2025, 3, 3), "status", "pending")] == [-1, 0, 0.0, 0]
+        assert delta[(date(2025, 3, 3), "status", "completed")] == [1, 0, 0.0, 0]
+        assert delta[(date(2025, 3, 5), "status", "completed")] == [0, 1, 172800.0, 0]
+        assert delta[(date(2025, 3, 7), "tag", "2")] == [0, 0, 0.0, -1]
+        # Unchanged rows are not written
+        assert (date(2025, 3, 3), "tag", "2") not in delta
+
+    def test_create_then_delete_cancels_out(self):
+        """Test a deleted task leaves nothing behind"""
+        assert changes([(None, facts()), (facts(), None)]) == {}
+
+    def test_unflushed_task_uses_default_priority(self):
+        """Test a task without a priority yet counts under the column default"""
+        assert (date(2025, 3, 3), "priority", "medium") in contributions(facts(priority=None))
+
+    def test_ungrouped_stats_read_status_rows(self):
+        """Test totals come from one dimension so tasks are not counted per tag"""
+        sql = str(stats_statement("week", "none").compile(dialect=postgresql.dialect()))
+
+        assert "rollups.dimension = %(dimension_1)s" in sql
+        assert "date_trunc(%(date_trunc_1)s, rollups.day)" in sql
+        assert "rollups.value" not in sql.split("FROM")[0]
+
+    def test_stats_include_unfolded_deltas(self):
+        """Test stats read the delta rows that have not been folded yet"""
+        sql = str(stats_statement("day", "status").compile(dialect=postgresql.dialect()))
+
+        assert "FROM task_daily_stats UNION ALL SELECT" in sql
+        assert "FROM task_daily_stats_delta) AS rollups" in sql
+
+    def test_fold_moves_deltas_in_one_statement(self):
+        """Test folding deletes the deltas it adds, so none is counted twice"""
+        sql = str(fold_statement().compile(dialect=postgresql.dialect()))
+
+        assert sql.startswith("WITH moved AS \n(DELETE FROM task_daily_stats_delta RETURNING")
+        assert "INSERT INTO task_daily_stats (dimension, day, value" in sql
+        assert "created = (task_daily_stats.created + excluded.created)" in sql
+
+    def test_task_writes_append_deltas(self, monkeypatch):
+        """Test writes insert delta rows rather than updating the shared rollup rows"""
+        monkeypatch.setattr(rollups, "ROLLUPS_ENABLED", True)
+        db = FakeSession()
+
+        rollups.record_task_changes(db, [(None, facts())])
+
+        sql = db.executed[0][0]
+        assert sql.startswith("INSERT INTO task_daily_stats_delta")
+        assert "ON CONFLICT" not in sql
+
+    def test_range_is_validated(self):
+        """Test reversed and oversized ranges are rejected"""
+        with pytest.raises(ValueError):
+            validate_stats_range(date(2025, 2, 1), date(2025, 1, 1), "week", "none")
+        with pytest.raises(ValueError):
+            validate_stats_range(date(2000, 1, 1), date(2025, 1, 1), "month", "none")
+        with pytest.raises(ValueError):
+            validate_stats_range(date(2025, 1, 1), date(2025, 2, 1), "week", "assignee")
+
+    @pytest.mark.asyncio
+    async def test_invalid_stats_range_is_422(self):
+        """Test the service reports range errors as validation errors"""
+        with pytest.raises(HTTPException) as error:
+            await services.get_task_stats(date(2025, 2, 1), date(2025, 1, 1), "week", "none", db=None)
+
+        assert error.value.status_code == 422
+
+    @pytest.mark.asyncio
+    async def test_stats_are_404_unless_enabled(self, monkeypatch):
+        """Test stats are not served from rollups nothing keeps up to date"""
+        monkeypatch.setattr(services, "ROLLUPS_ENABLED", False)
+
+        with pytest.raises(HTTPException) as error:
+            await services.get_task_stats(date(2025, 1, 1), date(2025, 2, 1), "week", "none", db=None)
+
+        assert error.value.status_code == 404
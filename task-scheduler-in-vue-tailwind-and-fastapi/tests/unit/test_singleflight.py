@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+
+from backend.singleflight import SingleFlight
+
+
+class Retryable(Exception):
+    pass
+
+
+@pytest.mark.unit
+class TestSingleFlight:
+    """Unit tests for coalescing identical concurrent requests"""
+
+    @pytest.mark.asyncio
+    async def test_identical_calls_share_one_execution(self):
+        """Test concurrent callers with one key run the work once"""
+        flights = SingleFlight("test.flights")
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"tasks": []}
+
+        results = await asyncio.gather(*(flights.do("key", work) for _ in range(5)))
+
+        assert len(calls) == 1
+        assert all(result is results[0] for result in results)
+        assert flights.snapshot() == {"executed": 1, "coalesced": 4, "ratio": 0.8, "inFlight": 0}
+
+    @pytest.mark.asyncio
+    async def test_different_keys_run_separately(self):
+        """Test distinct filters are not coalesced"""
+        flights = SingleFlight("test.flights")
+
+        async def work():
+            await asyncio.sleep(0)
+            return object()
+
+        first, second = await asyncio.gather(flights.do("a", work), flights.do("b", work))
+
+        assert first is not second
+        assert flights.executed == 2
+
+    @pytest.mark.asyncio
+    async def test_errors_are_shared(self):
+        """Test followers receive the leader's failure"""
+        flights = SingleFlight("test.flights")
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("statement timeout")
+
+        results = await asyncio.gather(flights.do("key", work), flights.do("key", work),
+                                       return_exceptions=True)
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    @pytest.mark.asyncio
+    async def test_leader_specific_error_is_retried(self):
+        """Test followers run the work again when the leader's failure was its own"""
+        flights = SingleFlight("test.flights")
+        attempts = []
+
+        async def work():
+            attempts.append(1)
+            await asyncio.sleep(0.01)
+            if len(attempts) == 1:
+                raise Retryable()
+            return "ok"
+
+        leader, follower = await asyncio.gather(
+            flights.do("key", work, retry_on=lambda e: isinstance(e, Retryable)),
+            flights.do("key", work, retry_on=lambda e: isinstance(e, Retryable)),
+            return_exceptions=True,
+        )
+
+        assert isinstance(leader, Retryable)
+        assert follower == "ok"
+        assert len(attempts) == 2
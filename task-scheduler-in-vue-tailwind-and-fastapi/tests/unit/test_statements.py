@@ -0,0 +1,93 @@
+import pytest
+from pydantic import ValidationError
+from sqlalchemy import create_engine, select
+from sqlalchemy.dialects import postgresql
+
+from backend.metrics import metrics, record_compiled_cache
+from backend.tasks.filter_schema import TaskFilterParams
+from backend.tasks.statements import FilterStatementCache, canonical_fields, filter_shape
+
+
+@pytest.mark.unit
+class TestFilterStatementCache:
+    """Unit tests for the per-shape filter statement cache"""
+
+    def test_filter_shape_ignores_values(self):
+        """Test filters with the same active fields share a shape"""
+        first = TaskFilterParams(status=["pending"], search="report")
+        second = TaskFilterParams(status=["completed", "pending"], search="invoice")
+
+        assert filter_shape(first) == filter_shape(second) == ("search", "status")
+        assert filter_shape(TaskFilterParams()) == ()
+
+    def test_same_shape_reuses_statements(self):
+        """Test a repeated shape returns the cached statement objects"""
+        cache = FilterStatementCache()
+        first = cache.get(TaskFilterParams(status=["pending"]))
+        second = cache.get(TaskFilterParams(status=["completed"], page=3))
+
+        assert first is second
+        assert len(cache) == 1
+
+    def test_sort_is_part_of_the_shape(self):
+        """Test different sort orders get their own statements"""
+        cache = FilterStatementCache()
+
+        cache.get(TaskFilterParams(sort_order="asc"))
+        cache.get(TaskFilterParams(sort_order="desc"))
+        cache.get(TaskFilterParams(sort_by="title"))
+
+        assert len(cache) == 3
+
+    def test_field_order_is_not_part_of_the_shape(self):
+        """Test every permutation of a sparse fieldset shares one statement"""
+        cache = FilterStatementCache()
+        first = cache.get(TaskFilterParams(fields=["title", "dueDate"]))
+        second = cache.get(TaskFilterParams(fields=["dueDate", "title", "id"]))
+
+        assert first is second
+        assert len(cache) == 1
+        assert canonical_fields(["dueDate", "title", "id"]) == ("id", "title", "dueDate")
+
+    def test_engine_compiled_cache_is_counted(self):
+        """Test repeated statements are reported as compiled cache hits, first ones as timed misses"""
+        engine = create_engine("sqlite://")
+        record_compiled_cache(engine)
+        statement = select(1)
+
+        def counters():
+            counts = metrics.snapshot()["counters"]
+            return counts.get("db.compiled_cache.hits", 0), counts.get("db.compiled_cache.misses", 0)
+
+        hits, misses = counters()
+        compiles = metrics.snapshot()["timings"].get("db.compile", {}).get("count", 0)
+        with engine.connect() as connection:
+            connection.execute(statement).scalar()
+            connection.execute(statement).scalar()
+
+        assert counters() == (hits + 1, misses + 1)
+        assert metrics.snapshot()["timings"]["db.compile"]["count"] == compiles + 1
+
+    def test_values_are_bound_not_inlined(self):
+        """Test filter values stay out of the SQL text"""
+        statements = FilterStatementCache().get(TaskFilterParams(search="secret"))
+
+        sql = str(statements.page.compile(dialect=postgresql.dialect()))
+
+        assert "secret" not in sql
+        assert "%(search)s" in sql
+
+    def test_sparse_fields_are_projected(self):
+        """Test a sparse fieldset selects only the requested columns"""
+        filters = TaskFilterParams(fields=["title", "dueDate"])
+        statements = FilterStatementCache().get(filters)
+
+        sql = str(statements.page.compile(dialect=postgresql.dialect()))
+
+        assert filters.fields == ["id", "title", "dueDate"]
+        assert "description" not in sql.split("FROM")[0]
+
+    def test_unknown_sparse_field_is_rejected(self):
+        """Test fields outside the task schema fail validation"""
+        with pytest.raises(ValidationError):
+            TaskFilterParams(fields=["title", "password"])
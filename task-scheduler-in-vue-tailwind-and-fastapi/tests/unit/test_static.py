@@ -0,0 +1,86 @@
+import gzip
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.static import ApiPrefixMiddleware, ClientStaticFiles, accepted_encodings, precompress
+
+
+@pytest.fixture
+def dist(tmp_path):
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "index.html").write_text("<html>" + "x" * 2048 + "</html>")
+    (tmp_path / "assets" / "index-4f1c9a2b.js").write_text("console.log('app');" * 100)
+    precompress(str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def client(dist):
+    app = FastAPI()
+
+    @app.get("/tasks/")
+    def tasks():
+        return []
+
+    app.mount("/", ClientStaticFiles(str(dist)), name="client")
+    app.add_middleware(ApiPrefixMiddleware)
+    return TestClient(app)
+
+
+@pytest.mark.unit
+class TestStaticClient:
+    """Unit tests for serving the built client"""
+
+    def test_accepted_encodings(self):
+        """Test q-values are parsed and q=0 is kept as a refusal"""
+        assert accepted_encodings("gzip, br;q=0.5, identity;q=0") == {"gzip": 1.0, "br": 0.5, "identity": 0.0}
+        assert accepted_encodings(None) == {}
+
+    def test_precompressed_variant_is_served(self, client, dist):
+        """Test the gzip file is sent with the original media type"""
+        response = client.get("/assets/index-4f1c9a2b.js", headers={"Accept-Encoding": "gzip"})
+
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["content-type"].startswith(("application/javascript", "text/javascript"))
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert int(response.headers["content-length"]) == (dist / "assets" / "index-4f1c9a2b.js.gz").stat().st_size
+        assert response.text == "console.log('app');" * 100
+
+    def test_identity_when_encoding_refused(self, client):
+        """Test the plain file is sent when the client refuses compression"""
+        response = client.get("/assets/index-4f1c9a2b.js", headers={"Accept-Encoding": "gzip;q=0"})
+
+        assert "content-encoding" not in response.headers
+        assert response.headers["vary"] == "Accept-Encoding"
+
+    def test_cache_headers(self, client):
+        """Test hashed assets are immutable and index.html is revalidated"""
+        asset = client.get("/assets/index-4f1c9a2b.js")
+        index = client.get("/")
+
+        assert "immutable" in asset.headers["cache-control"]
+        assert index.headers["cache-control"] == "no-cache"
+        revalidated = client.get("/", headers={"If-None-Match": index.headers["etag"],
+                                               "Accept-Encoding": index.request.headers["accept-encoding"]})
+        assert revalidated.status_code == 304
+
+    def test_client_routes_fall_back_to_index(self, client):
+        """Test unknown paths without an extension serve the app, missing files 404"""
+        assert client.get("/tasks/board/settings").text.startswith("<html>")
+        assert client.get("/assets/missing-00000000.js").status_code == 404
+
+    def test_api_prefix_is_stripped(self, client):
+        """Test /api paths reach the API routes"""
+        assert client.get("/api/tasks/").json() == []
+
+    def test_precompress_skips_small_files(self, tmp_path):
+        """Test files below the size threshold are left alone"""
+        (tmp_path / "small.js").write_text("1")
+        (tmp_path / "large.css").write_text("a{}" * 1000)
+
+        written = precompress(str(tmp_path))
+
+        assert [path.rsplit("/", 1)[1] for path in written if path.endswith(".gz")] == ["large.css.gz"]
+        assert gzip.decompress((tmp_path / "large.css.gz").read_bytes()) == b"a{}" * 1000
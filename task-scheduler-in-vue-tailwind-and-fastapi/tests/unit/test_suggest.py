@@ -0,0 +1,68 @@
+import pytest
+from types import SimpleNamespace
+from sqlalchemy.dialects import postgresql
+
+from backend.tasks import model, services, suggest
+from backend.tasks.suggest import (SupersededQueries, escape_like, normalize_query, suggest_statement,
+                                   superseded_key)
+from tests.mocks import FakeResult, FakeSession
+
+
+@pytest.mark.unit
+class TestSuggest:
+    """Unit tests for type-ahead suggestions"""
+
+    def setup_method(self):
+        suggest.suggest_cache.clear()
+
+    def test_query_is_normalized(self):
+        """Test case and whitespace do not split the cache"""
+        assert normalize_query("  Weekly   REPORT ") == "weekly report"
+
+    def test_like_wildcards_are_escaped(self):
+        """Test user input cannot widen the prefix match"""
+        assert escape_like("100%_done") == "100\\%\\_done"
+
+    def test_short_queries_skip_trigram_matching(self):
+        """Test the fuzzy branch is only used from three characters on"""
+        prefix_only = str(suggest_statement(model.Task.title, fuzzy=False).compile(dialect=postgresql.dialect()))
+        fuzzy = str(suggest_statement(model.Task.title, fuzzy=True).compile(dialect=postgresql.dialect()))
+
+        assert "LIKE" in prefix_only and "%%" not in prefix_only.replace("LIKE", "")
+        assert "lower(task.title) %% %(query)s" in fuzzy
+
+    @pytest.mark.asyncio
+    async def test_hot_prefixes_are_cached(self):
+        """Test a repeated query is answered without the database"""
+        db = FakeSession([FakeResult(["Write report"]), FakeResult(["work"])])
+
+        first = await services.get_suggestions("Wor", 8, db)
+        second = await services.get_suggestions("wor ", 8, db)
+
+        assert first == {"query": "wor", "titles": ["Write report"], "tags": ["work"]}
+        assert second is first
+        assert len(db.executed) == 2
+        assert db.executed[0][1]["prefix"] == "wor%"
+
+    def test_newer_query_cancels_the_previous_one(self, monkeypatch):
+        """Test a client's superseded query is cancelled"""
+        cancelled = []
+        monkeypatch.setattr(suggest, "abandon_query", lambda session: cancelled.append(session) or True)
+        queries = SupersededQueries()
+        first, second = FakeSession(), FakeSession()
+
+        queries.start("search-box", first)
+        queries.start("search-box", second)
+        queries.finish("search-box", first)
+
+        assert cancelled == [first]
+        assert queries._running == {"search-box": second}
+
+    def test_client_ids_are_scoped_to_the_caller(self):
+        """Test another address sending the same client_id cannot cancel the query"""
+        mine = SimpleNamespace(client=SimpleNamespace(host="10.0.0.5"))
+        theirs = SimpleNamespace(client=SimpleNamespace(host="10.0.0.6"))
+
+        assert superseded_key(mine, "search-box") != superseded_key(theirs, "search-box")
+        assert superseded_key(mine, None) is None
+        assert superseded_key(None, "search-box") is None
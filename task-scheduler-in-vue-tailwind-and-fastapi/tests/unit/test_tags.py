@@ -0,0 +1,41 @@
+import pytest
+
+from backend.tasks import model
+from backend.tasks.tags import TagDictionary
+
+
+@pytest.mark.unit
+class TestTagDictionary:
+    """Unit tests for the interned tag dictionary"""
+
+    def test_names_for_preserves_order(self):
+        """Test resolving tag ids to names keeps the stored order"""
+        tags = TagDictionary()
+        tags._remember([(1, "work"), (2, "home")])
+
+        assert tags.names_for(None, [2, 1]) == ["home", "work"]
+
+    def test_names_for_drops_unknown_ids(self):
+        """Test ids missing from the dictionary are skipped without a session"""
+        tags = TagDictionary()
+        tags._remember([(1, "work")])
+
+        assert tags.names_for(None, [1, 42]) == ["work"]
+
+    def test_ids_for_known_names(self):
+        """Test resolving names uses the cache and drops duplicates"""
+        tags = TagDictionary()
+        tags._remember([(1, "work"), (2, "home")])
+
+        assert tags.ids_for(None, ["home", "work", "home"]) == [2, 1]
+        assert tags.ids_for(None, ["unknown"]) == []
+        assert tags.ids_for(None, None) == []
+
+    def test_task_tags_property(self):
+        """Test Task.tags exposes names for the stored tag ids"""
+        from backend.tasks.tags import tag_dictionary
+        tag_dictionary._remember([(7, "errands")])
+
+        task = model.Task(title="Groceries", tag_ids=[7])
+
+        assert task.tags == ["errands"]
@@ -0,0 +1,66 @@
+import gzip
+import json
+
+import pytest
+
+from scripts.task_backup import (
+    FORMAT_VERSION, MANIFEST, chunk_name, id_ranges, load_manifest, schema_ddl, sha256_file, verify,
+)
+
+
+def test_id_ranges_cover_every_id_once():
+    ranges = id_ranges(1, 1000, 1000, 300)
+    assert ranges[0][0] == 1 and ranges[-1][1] == 1001
+    assert all(end == next_start for (_, end), (next_start, _) in zip(ranges, ranges[1:]))
+    assert len(ranges) == 4
+
+
+def test_id_ranges_follow_row_count_not_id_span():
+    # Sparse ids: few rows spread over a wide range still make one chunk
+    assert id_ranges(1, 1_000_000, 10, 300) == [(1, 1_000_001)]
+
+
+def test_id_ranges_of_empty_table():
+    assert id_ranges(None, None, 0, 300) == []
+
+
+def test_schema_ddl_recreates_indexes_then_keys():
+    statements = schema_ddl(
+        [("idx_task_status", "CREATE INDEX idx_task_status ON public.task USING btree (status)")],
+        [("task", "task_seriesId_fkey", 'FOREIGN KEY ("seriesId") REFERENCES task_series(id)')],
+    )
+    assert statements == [
+        "CREATE INDEX IF NOT EXISTS idx_task_status ON public.task USING btree (status)",
+        'ALTER TABLE task ADD CONSTRAINT "task_seriesId_fkey" FOREIGN KEY ("seriesId") REFERENCES task_series(id)',
+    ]
+
+
+@pytest.fixture
+def backup_dir(tmp_path):
+    name = chunk_name("task", 1, 11)
+    with gzip.open(tmp_path / name, "wb") as file:
+        file.write(b"PGCOPY\n\xff\r\n\x00")
+    manifest = {"format": FORMAT_VERSION, "alembicRevision": "abc", "tables": [
+        {"name": "task", "columns": ["id"], "rows": 10,
+         "chunks": [{"file": name, "idFrom": 1, "idTo": 11, "rows": 10, "sha256": sha256_file(tmp_path / name)}]},
+    ]}
+    (tmp_path / MANIFEST).write_text(json.dumps(manifest))
+    return tmp_path
+
+
+def test_verify_accepts_intact_backup(backup_dir):
+    assert verify(backup_dir) == []
+
+
+def test_verify_reports_damaged_and_missing_chunks(backup_dir):
+    name = chunk_name("task", 1, 11)
+    (backup_dir / name).write_bytes(b"corrupt")
+    assert verify(backup_dir) == [name]
+    (backup_dir / name).unlink()
+    assert verify(backup_dir) == [name]
+
+
+def test_unknown_format_is_rejected(backup_dir):
+    (backup_dir / MANIFEST).write_text(json.dumps({"format": FORMAT_VERSION + 1, "tables": []}))
+    with pytest.raises(ValueError):
+        load_manifest(backup_dir)
@@ -0,0 +1,121 @@
+import pytest
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from backend.tasks import model, task_cache as task_cache_module
+from backend.tasks.task_cache import InvalidationPublisher, TaskCache
+
+
+def make_task(task_id=1, title="Write report"):
+    return model.Task(id=task_id, title=title, description=None, status="pending",
+                      priority=model.PriorityEnum.HIGH, tag_ids=[1, 2],
+                      createdDate=datetime(2025, 1, 1), dueDate=datetime(2025, 1, 5))
+
+
+@pytest.mark.unit
+class TestTaskCache:
+    """Unit tests for the per-task read-through cache"""
+
+    def test_hit_returns_detached_copy(self):
+        """Test hits are new instances that do not share mutable state"""
+        cache = TaskCache()
+        cache.put(make_task())
+
+        first, second = cache.get(1), cache.get(1)
+
+        assert (first.id, first.title, first.priority) == (1, "Write report", model.PriorityEnum.HIGH)
+        assert first is not second
+        first.tag_ids.append(3)
+        assert cache.get(1).tag_ids == [1, 2]
+
+    def test_put_replaces_entry(self):
+        """Test a write-through replaces the cached values"""
+        cache = TaskCache()
+        cache.put(make_task())
+        cache.put(make_task(title="Write final report"))
+
+        assert cache.get(1).title == "Write final report"
+
+    def test_fill_after_a_write_is_skipped(self):
+        """Test a read that started before a write does not replace the written values"""
+        cache = TaskCache()
+        generation = cache.generation(1)
+        cache.put(make_task(title="Write final report"))
+
+        assert not cache.fill(make_task(title="Write report"), generation)
+        assert cache.get(1).title == "Write final report"
+
+    def test_fill_after_a_drop_is_skipped(self):
+        """Test deletes, remote invalidations and clears all refuse earlier fills"""
+        cache = TaskCache()
+        for drop in (lambda: cache.discard(1), lambda: cache.receive("0ther:1"), cache.clear):
+            generation = cache.generation(1)
+            drop()
+            assert not cache.fill(make_task(), generation)
+            assert cache.get(1) is None
+
+        assert cache.fill(make_task(), cache.generation(1))
+        assert cache.get(1) is not None
+
+    def test_forgotten_generations_refuse_pending_fills(self):
+        """Test the generation table stays bounded without letting stale fills through"""
+        cache = TaskCache(max_entries=2)
+        generation = cache.generation(1)
+        for task_id in (2, 3, 4):
+            cache.discard(task_id)
+
+        assert not cache.fill(make_task(1), generation)
+
+    def test_remote_invalidation(self):
+        """Test notifications from other processes drop entries, own ones are ignored"""
+        cache = TaskCache()
+        cache.put(make_task(1))
+        cache.put(make_task(2))
+
+        cache.receive(f"{task_cache_module._INSTANCE}:1")
+        assert cache.get(1) is not None
+        cache.receive("0ther:1")
+        assert cache.get(1) is None and cache.get(2) is not None
+        cache.receive("0ther:*")
+        assert cache.get(2) is None
+
+    def test_publish_uses_one_dedicated_connection(self, monkeypatch):
+        """Test every NOTIFY goes out on the publisher's own autocommit connection"""
+        connection = MagicMock(closed=False)
+        connect = MagicMock(return_value=connection)
+        monkeypatch.setattr(task_cache_module, "invalidation_publisher", InvalidationPublisher(connect))
+
+        TaskCache().publish(7)
+        TaskCache().publish()
+
+        connect.assert_called_once()
+        assert connection.autocommit is True
+        cursor = connection.cursor.return_value.__enter__.return_value
+        payloads = [call.args[1][1] for call in cursor.execute.call_args_list]
+        assert payloads[0].endswith(":7") and payloads[1].endswith(":*")
+
+    def test_publisher_reconnects_after_a_failure(self, monkeypatch):
+        """Test a failed NOTIFY does not fail the write and the next one uses a new connection"""
+        broken, working = MagicMock(closed=False), MagicMock(closed=False)
+        broken.cursor.return_value.__enter__.return_value.execute.side_effect = OSError("gone")
+        connect = MagicMock(side_effect=[broken, working])
+        monkeypatch.setattr(task_cache_module, "invalidation_publisher", InvalidationPublisher(connect))
+
+        TaskCache().publish(7)
+        TaskCache().publish(8)
+
+        broken.close.assert_called_once()
+        working.cursor.return_value.__enter__.return_value.execute.assert_called_once()
+
+    def test_snapshot_reports_hit_rate_and_memory(self):
+        """Test the metrics snapshot"""
+        cache = TaskCache(max_entries=10)
+        cache.put(make_task())
+        cache.get(1)
+        cache.get(2)
+
+        snapshot = cache.snapshot()
+
+        assert (snapshot["entries"], snapshot["hits"], snapshot["misses"]) == (1, 1, 1)
+        assert snapshot["hitRate"] == 0.5
+        assert snapshot["approxBytes"] > 0
@@ -0,0 +1,45 @@
+import pytest
+from datetime import date
+from sqlalchemy.dialects import postgresql
+
+from backend.tasks.filter_schema import TaskFilterParams
+from backend.tasks.statements import canonical_filters
+from backend.tasks.timeline import calendar_statement, validate_range
+
+
+@pytest.mark.unit
+class TestTaskCalendar:
+    """Unit tests for the calendar aggregation"""
+
+    def test_validate_range_accepts_month(self):
+        """Test a month of daily buckets is accepted"""
+        validate_range(date(2025, 1, 1), date(2025, 1, 31), "day")
+
+    @pytest.mark.parametrize("start,end,bucket", [
+        (date(2025, 2, 1), date(2025, 1, 1), "day"),
+        (date(2020, 1, 1), date(2025, 1, 1), "day"),
+        (date(2025, 1, 1), date(2025, 1, 31), "month"),
+    ])
+    def test_validate_range_rejects(self, start, end, bucket):
+        """Test reversed ranges, too many buckets and unknown bucket sizes"""
+        with pytest.raises(ValueError):
+            validate_range(start, end, bucket)
+
+    def test_statement_joins_filters_on_due_date_range(self):
+        """Test filters go into the join so empty buckets are kept"""
+        statement = calendar_statement(("status",), "week")
+
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+
+        assert "generate_series" in sql
+        assert "LEFT OUTER JOIN task ON" in sql
+        assert "interval '1 week'" in sql
+        assert calendar_statement(("status",), "week") is statement
+
+    def test_canonical_filters_ignore_list_order(self):
+        """Test the cache key does not depend on the order of list filters"""
+        first = TaskFilterParams(status=["pending", "completed"], priority=["low", "high"])
+        second = TaskFilterParams(status=["completed", "pending"], priority=["high", "low"])
+
+        assert canonical_filters(first) == canonical_filters(second)
+        assert canonical_filters(first) != canonical_filters(TaskFilterParams(status=["pending"]))
@@ -0,0 +1,112 @@
+import pytest
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from backend import tracing
+from backend.tracing import SERVER, TracedRoute, Tracer, TracingMiddleware, instrument_engine, traced
+
+
+class CollectingProcessor:
+    def __init__(self):
+        self.spans = []
+
+    def on_end(self, span):
+        self.spans.append(span)
+
+    def named(self, prefix):
+        return [span for span in self.spans if span.name.startswith(prefix)]
+
+
+@pytest.fixture
+def spans(monkeypatch):
+    processor = CollectingProcessor()
+    monkeypatch.setattr(tracing, "tracer", Tracer(processor, sample_rate=1.0))
+    return processor
+
+
+@traced()
+async def load_task(task_id: int):
+    return {"id": task_id}
+
+
+@pytest.fixture
+def app():
+    router = APIRouter(prefix="/tasks", route_class=TracedRoute)
+
+    def page_size(limit: int = 10):
+        return limit
+
+    @router.get("/{task_id}")
+    async def read_task(task_id: int, limit: int = Depends(page_size)):
+        return await load_task(task_id)
+
+    app = FastAPI()
+    app.include_router(router)
+    app.add_middleware(TracingMiddleware)
+    return app
+
+
+@pytest.mark.unit
+class TestTracing:
+    """Unit tests for request tracing"""
+
+    def test_traceparent_parsing(self):
+        """Test valid W3C headers are accepted and malformed ones ignored"""
+        trace_id, span_id = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+        assert tracing.parse_traceparent(f"00-{trace_id}-{span_id}-01") == (trace_id, span_id, True)
+        assert tracing.parse_traceparent(f"00-{trace_id}-{span_id}-00") == (trace_id, span_id, False)
+        assert tracing.parse_traceparent(f"00-{'0' * 32}-{span_id}-01") is None
+        assert tracing.parse_traceparent("garbage") is None
+        assert tracing.parse_traceparent(None) is None
+
+    def test_request_spans_form_one_trace(self, app, spans):
+        """Test handler, dependency, service and serialization spans hang off the server span"""
+        response = TestClient(app).get("/tasks/7")
+
+        assert response.status_code == 200
+        server = spans.named("GET /tasks/{task_id}")[0]
+        assert server.kind == SERVER
+        assert server.attributes["http.status_code"] == 200
+        children = {span.name: span for span in spans.spans if span.parent_id == server.span_id}
+        assert set(children) == {"handler read_task", "dependency page_size", "serialize response"}
+        service = spans.named("test_tracing.load_task")[0]
+        assert service.parent_id == children["handler read_task"].span_id
+        assert {span.trace_id for span in spans.spans} == {server.trace_id}
+        assert response.headers["traceparent"] == server.traceparent
+
+    def test_incoming_trace_is_continued(self, app, spans):
+        """Test the server span joins the caller's trace"""
+        trace_id, parent_id = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+        TestClient(app).get("/tasks/7", headers={"traceparent": f"00-{trace_id}-{parent_id}-01"})
+
+        server = spans.named("GET /tasks/")[0]
+        assert (server.trace_id, server.parent_id) == (trace_id, parent_id)
+
+    def test_unsampled_trace_is_not_exported(self, app, spans):
+        """Test the caller's sampling decision is honored"""
+        TestClient(app).get("/tasks/7", headers={
+            "traceparent": "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-00"
+        })
+
+        assert spans.spans == []
+
+    def test_sql_statements_are_fingerprinted(self, spans):
+        """Test statements differing only in whitespace share a fingerprint"""
+        engine = create_engine("sqlite://")
+        instrument_engine(engine)
+        with tracing.tracer.span("request"), engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            connection.execute(text("SELECT   1"))
+
+        statements = spans.named("db SELECT")
+        assert len(statements) == 2
+        assert statements[0].attributes["db.statement.fingerprint"] == statements[1].attributes["db.statement.fingerprint"]
+        assert statements[0].parent_id == spans.named("request")[0].span_id
+
+    def test_disabled_tracer_records_nothing(self, monkeypatch):
+        """Test spans are no-ops without an exporter"""
+        monkeypatch.setattr(tracing, "tracer", Tracer(None))
+
+        with tracing.tracer.span("request") as span:
+            assert span is None
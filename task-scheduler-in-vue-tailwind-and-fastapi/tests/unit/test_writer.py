@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from backend.tasks import model
+from backend.tasks.writer import TaskWriteBatcher
+from tests.mocks import FakeResult, FakeSession
+
+
+class FakeRow:
+    def __init__(self, mapping):
+        self._mapping = mapping
+
+
+class WriterSession(FakeSession):
+    """Allocates ids and echoes inserted rows back in reverse order"""
+
+    def __init__(self, fail_titles=()):
+        super().__init__()
+        self.fail_titles = fail_titles
+        self.next_id = 1
+        self.inserts = []
+
+    def respond(self, sql, statement, params):
+        if params is not None:
+            ids = list(range(self.next_id, self.next_id + params["count"]))
+            self.next_id += params["count"]
+            return FakeResult(ids)
+        bound = statement.compile(dialect=postgresql.dialect()).params
+        count = sum(1 for key in bound if key.startswith("id_m"))
+        rows = [{column: bound.get(f"{column.key}_m{n}") for column in model.Task.__table__.columns}
+                for n in range(count)]
+        self.inserts.append(count)
+        if any(row[model.Task.__table__.c.title] in self.fail_titles for row in rows):
+            raise RuntimeError("value too long for type character varying(50)")
+        return FakeResult([FakeRow(row) for row in reversed(rows)])
+
+
+@pytest.mark.unit
+class TestTaskWriteBatcher:
+    """Unit tests for group-committed task creates"""
+
+    @pytest.mark.asyncio
+    async def test_creates_in_one_window_share_a_commit(self):
+        """Test concurrent creates become one insert and one commit"""
+        db = WriterSession()
+        writer = TaskWriteBatcher(window=0.001, max_rows=100, session_factory=lambda: db)
+
+        tasks = await asyncio.gather(*(writer.create({"title": f"Task {n}"}) for n in range(3)))
+
+        assert db.inserts == [3]
+        assert db.commits == 1
+        assert [(task.id, task.title) for task in tasks] == [(1, "Task 0"), (2, "Task 1"), (3, "Task 2")]
+
+    @pytest.mark.asyncio
+    async def test_full_batch_flushes_without_waiting(self):
+        """Test reaching max_rows flushes before the window closes"""
+        db = WriterSession()
+        writer = TaskWriteBatcher(window=60, max_rows=2, session_factory=lambda: db)
+
+        tasks = await asyncio.wait_for(asyncio.gather(writer.create({"title": "A"}), writer.create({"title": "B"})), 1)
+
+        assert db.inserts == [2]
+        assert [task.title for task in tasks] == ["A", "B"]
+
+    @pytest.mark.asyncio
+    async def test_bad_row_only_fails_its_own_request(self):
+        """Test a failing batch is retried row by row"""
+        db = WriterSession(fail_titles={"Broken"})
+        writer = TaskWriteBatcher(window=0.001, session_factory=lambda: db)
+
+        results = await asyncio.gather(writer.create({"title": "Good"}), writer.create({"title": "Broken"}),
+                                       return_exceptions=True)
+
+        assert results[0].title == "Good"
+        assert isinstance(results[1], RuntimeError)
+        assert db.inserts == [2, 1, 1]
+
+    @pytest.mark.asyncio
+    async def test_flush_runs_off_the_event_loop(self):
+        """Test the insert runs in a worker thread, not in the timer callback"""
+        threads = []
+        db = WriterSession()
+        writer = TaskWriteBatcher(window=0.001, session_factory=lambda: threads.append(threading.get_ident()) or db)
+
+        await writer.create({"title": "A"})
+
+        assert threads and threads[0] != threading.get_ident()